@@ -0,0 +1,212 @@
+import argparse
+import bisect
+import logging
+import math
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import PipelineConfig
+from directory import load_corrected
+import instrument
+from linkage import DIRECTIONS, address_words, town_key
+from geocache import normalize_query
+from utils import batch_geocode, geocode
+
+logger = logging.getLogger(__name__)
+
+# interpolated points get less confidence the further apart the known house numbers / points are
+MAX_NUMBER_GAP = 400
+MAX_SPAN_METERS = 1500
+SAME_SIDE_CONFIDENCE = 0.9
+OTHER_SIDE_CONFIDENCE = 0.7
+# the longest street name tried when splitting a query into street and town
+MAX_STREET_TOKENS = 6
+
+# (house number, lon, lat, address_formatted)
+AddressPoint = Tuple[int, float, float, str]
+
+
+def split_address(tokens: List[str]) -> Tuple[Optional[int], List[str]]:
+    # house number and the words after it; a unit letter after the number ("17 B") is dropped
+    for i, token in enumerate(tokens):
+        digits = re.match(r"\d+", token)
+        if digits:
+            rest = tokens[i + 1:]
+            if rest and len(rest[0]) == 1 and rest[0].isalpha() and rest[0] not in DIRECTIONS:
+                rest = rest[1:]
+            return int(digits.group()), rest
+    return None, []
+
+
+def distance_meters(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    (lon1, lat1), (lon2, lat2) = a, b
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return 6371000 * math.hypot(x, y)
+
+
+class AddressPointGeocoder:
+    # Geocoder built from addresses that were already resolved: points are indexed by street and
+    # town, sorted by house number. A query for a known house number is answered exactly, one
+    # between two known numbers is interpolated along the street, and anything resolved with less
+    # than min_confidence goes to the fallback geocoder (the remote service).
+    def __init__(self, fallback=geocode, min_confidence: float = 0.5, batch_fallback=batch_geocode):
+        self.fallback = fallback
+        self.batch_fallback = batch_fallback
+        self.min_confidence = min_confidence
+        # street -> town -> points sorted by house number
+        self.streets: Dict[str, Dict[str, List[AddressPoint]]] = {}
+        self.exact = 0
+        self.interpolated = 0
+        self.fallbacks = 0
+        # queries answered from the address points, their results are not checked again
+        self.answered: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def add(self, street: str, town: str, lon: float, lat: float, address_formatted: str = ""):
+        number, words = split_address(address_words(street))
+        if number is None or not words:
+            return
+        points = self.streets.setdefault(" ".join(words), {}).setdefault(town_key(town), [])
+        i = bisect.bisect_left(points, (number,))
+        # a later point for the same house number (from a map read later) replaces the earlier one
+        if i < len(points) and points[i][0] == number:
+            points[i] = (number, lon, lat, address_formatted)
+        else:
+            points.insert(i, (number, lon, lat, address_formatted))
+
+    def add_business(self, properties: Dict[str, Any], geometry: Dict[str, Any]):
+        if not geometry or geometry.get("type") != "Point" or not geometry.get("coordinates"):
+            return
+        lon, lat = geometry["coordinates"][:2]
+        address = properties.get("address", "")
+        formatted = properties.get("address_formatted", "")
+        # a result without a house number is a street or town centroid, not an address point
+        if formatted and not re.match(r"\s*\d", formatted):
+            return
+        parts = [part.strip() for part in address.split(",")]
+        formatted_parts = [part.strip() for part in formatted.split(",")]
+        # "Long Beach VFW, 675 W. Park Avenue, Long Beach": the street is the part with the number
+        street = next((i for i, part in enumerate(parts) if re.match(r"\d", part)), None)
+        towns = {properties.get("town", "")}
+        if street is not None and street + 1 < len(parts):
+            towns.add(parts[street + 1])
+        if len(formatted_parts) > 1:
+            towns.add(formatted_parts[1])
+        # index both the listing's and the geocoder's spelling of the street and the town
+        for town in filter(None, towns):
+            if street is not None:
+                self.add(parts[street], town, lon, lat, formatted)
+            if formatted_parts[0]:
+                self.add(formatted_parts[0], town, lon, lat, formatted)
+
+    @instrument.timed("load_address_points")
+    def load(self, patterns: List[str], maps: Dict[str, Tuple[str, str]] = {}) -> int:
+        # maps is output -> (map name, corrections), see PipelineConfig.map_files(); a map's
+        # corrections are layered over its output by id first, so their hand-placed points
+        # (mostly id-only features) replace the geocoded ones
+        count = 0
+        for _, map_data in load_corrected(patterns, maps):
+            default_town = map_data.name.split(",")[0] if "," in map_data.name else ""
+            for business in map_data.features.values():
+                properties = business.properties
+                if default_town and "town" not in properties:
+                    properties = {**properties, "town": default_town}
+                self.add_business(properties, business.geometry)
+                count += 1
+        logger.info("Address points: %d listings, %d streets", count, len(self.streets))
+        return count
+
+    def _street_points(self, rest: List[str]) -> Optional[List[AddressPoint]]:
+        # the longest known street name the query continues with, followed by a known town
+        for n in range(min(MAX_STREET_TOKENS, len(rest)), 0, -1):
+            towns = self.streets.get(" ".join(rest[:n]))
+            if not towns:
+                continue
+            remainder = " ".join(rest[n:]) + " "
+            for town, points in towns.items():
+                if remainder.startswith(town + " "):
+                    return points
+        return None
+
+    def locate(self, query: str) -> Tuple[float, str, Optional[Dict[str, Any]]]:
+        # (confidence, address_formatted, geometry) from the known points alone
+        number, rest = split_address(address_words(query))
+        if number is None:
+            return 0.0, "", None
+        points = self._street_points(rest)
+        if not points:
+            return 0.0, "", None
+        i = bisect.bisect_left(points, (number,))
+        if i < len(points) and points[i][0] == number:
+            _, lon, lat, formatted = points[i]
+            return 1.0, formatted, {"type": "Point", "coordinates": [lon, lat]}
+
+        # nearest known numbers on both sides, preferably on the same side of the street
+        below, above = points[:i], points[i:]
+        lo = next((p for p in reversed(below) if p[0] % 2 == number % 2), None)
+        hi = next((p for p in above if p[0] % 2 == number % 2), None)
+        confidence = SAME_SIDE_CONFIDENCE
+        if lo is None or hi is None:
+            if not below or not above:
+                return 0.0, "", None
+            lo, hi = below[-1], above[0]
+            confidence = OTHER_SIDE_CONFIDENCE
+        t = (number - lo[0]) / (hi[0] - lo[0])
+        lon, lat = lo[1] + t * (hi[1] - lo[1]), lo[2] + t * (hi[2] - lo[2])
+        confidence *= max(0.0, 1 - (hi[0] - lo[0]) / MAX_NUMBER_GAP)
+        confidence *= max(0.0, 1 - distance_meters(lo[1:3], hi[1:3]) / MAX_SPAN_METERS)
+        nearest = lo if t <= 0.5 else hi
+        formatted = re.sub(r"^\s*\d+[A-Za-z]?(?:\s+[A-Za-z](?=\s))?", str(number), nearest[3]) if nearest[3] else ""
+        return confidence, formatted, {"type": "Point", "coordinates": [lon, lat]}
+
+    def _local(self, query: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        confidence, formatted, geometry = self.locate(query)
+        if geometry and confidence >= self.min_confidence:
+            with self.lock:
+                if confidence == 1.0:
+                    self.exact += 1
+                else:
+                    self.interpolated += 1
+                self.answered.add(normalize_query(query))
+            logger.debug("%s: local %.2f", query, confidence)
+            return formatted, geometry
+        with self.lock:
+            self.fallbacks += 1
+        return None
+
+    def geocode(self, query: str) -> Tuple[str, Dict[str, Any]]:
+        return self._local(query) or self.fallback(query)
+
+    def batch_geocode(self, queries: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        # local answers first, the rest in one call to batch_fallback
+        results = [self._local(query) for query in queries]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            for i, result in zip(missing, self.batch_fallback([queries[i] for i in missing])):
+                results[i] = result
+        return results
+
+    def is_local(self, query: str) -> bool:
+        with self.lock:
+            return normalize_query(query) in self.answered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geocode queries from already resolved address points only")
+    parser.add_argument("queries", nargs="+")
+    parser.add_argument("--points", nargs="+", default=["data/*.geojson"], help="outputs and corrections to index")
+    parser.add_argument("--config", default="maps.json", help="map names and corrections of the outputs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    geocoder = AddressPointGeocoder()
+    geocoder.load(args.points, PipelineConfig(args.config).map_files() if os.path.isfile(args.config) else {})
+    for query in args.queries:
+        confidence, formatted, geometry = geocoder.locate(query)
+        print(f"  {confidence:.2f}  {query} -> {formatted} {geometry['coordinates'] if geometry else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.synthetic import generate_site
+from directory import LocationDirectory
+from fetch import Fetcher
+
+
+class SlowHandler(SimpleHTTPRequestHandler):
+    # static files with a fixed delay per request, like a remote server
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(root: str, latency: float) -> ThreadingHTTPServer:
+    handler = type("Handler", (SlowHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time LocationDirectory.crawl against a local fixture site")
+    parser.add_argument("--towns", type=int, default=30)
+    parser.add_argument("--businesses", type=int, default=100, help="per town")
+    parser.add_argument("--latency", type=float, default=0.1, help="server delay per request in seconds")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--rate", type=float, default=0, help="requests per second per host, 0 = unlimited")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench-crawl-")
+    generate_site(root, args.towns, args.businesses)
+    server = serve(root, args.latency)
+    url = f"http://127.0.0.1:{server.server_port}/index.html"
+    print(f"{args.towns} towns, {args.businesses} businesses each, {args.latency * 1000:.0f} ms per request ({url})")
+    try:
+        for workers in args.workers:
+            fetcher = Fetcher(cache_dir="", pool_size=workers, rate=args.rate)
+            start = time.perf_counter()
+            maps = LocationDirectory("").crawl(url, fetcher, workers)
+            seconds = time.perf_counter() - start
+            businesses = sum(len(m.features) for m in maps.values())
+            print(f"  {workers:3d} workers {seconds:8.3f} s  {len(maps)} towns, {businesses} businesses, {fetcher.stats['requests']} requests")
+            fetcher.close()
+    finally:
+        server.shutdown()
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from bs4 import BeautifulSoup
+
+from extract import extract_businesses, extract_locations
+from feature import Business, Location
+
+CLASSES = ["name", "category", "address", "phone", "hours", "info", "discount", "web", "email", "Town"]
+LINKS = [
+    "https://example.com/",
+    "https://www.facebook.com/somebusiness",
+    "https://www.instagram.com/somebusiness/",
+    "mailto:owner@example.com",
+    "#",
+    "",
+]
+WORDS = ["pizza", "&amp;", "caf&eacute;", "Main St.", "Phone:", "  spaced\n out  ", "&#169;", "Ave", "Hours: 9-5", "deli"]
+
+
+def _text(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 6)))
+
+
+def _tag(rng: random.Random, name: str) -> str:
+    cls = rng.choice(CLASSES)
+    attrs = f' class="{cls} extra"' if rng.random() < 0.9 else ""
+    if cls in ["web", "email"]:
+        href = rng.choice(LINKS)
+        body = f'<a href="{href}">{_text(rng)}</a>' if rng.random() < 0.9 else _text(rng)
+    else:
+        body = _text(rng)
+        if rng.random() < 0.2:
+            body += f"<span>{_text(rng)}<br>{_text(rng)}</span>"
+        if rng.random() < 0.1:
+            body += "<!-- hidden comment --><script>var x = '<p>';</script>"
+    return f"<{name}{attrs}>{body}</{name}>"
+
+
+def listing_page(listings: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    nodes = []
+    for i in range(listings):
+        tags = "".join(_tag(rng, rng.choice(["p", "p", "h3"])) for _ in range(rng.randint(3, 9)))
+        nodes.append(f'<div class="gear col" id="biz{i}"><img src="logo{i}.png">{tags}</div>')
+    return f"<html><head><title>Best of</title></head><body><nav>menu</nav>{''.join(nodes)}</body></html>"
+
+
+def index_page(articles: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    nodes = []
+    for i in range(articles):
+        year = rng.choice(["-2023", "-2024", "-2025", ""])
+        label = rng.choice(["Interactive Map", "Print edition", "interactive map "])
+        nodes.append(f'<article><div class="thumb"><a href="town-{i % 50}{year}.html">Town</a></div><p>{label}</p></article>')
+    return f'<html><body><div class="content">{"".join(nodes)}</div><div class="content"><article>x</article></div></body></html>'
+
+
+def soup_businesses(html_content: str) -> List[Dict]:
+    tree = BeautifulSoup(html_content, features="html.parser").find("body")
+    result = []
+    for node in tree.find_all("div", "gear"):
+        business = Business()
+        business.load_html(node)
+        result.append(business.properties)
+    return result
+
+
+def stream_businesses(html_content: str) -> List[Dict]:
+    result = []
+    for node_id, tags in extract_businesses(html_content):
+        business = Business()
+        business.load_tags(node_id, tags)
+        result.append(business.properties)
+    return result
+
+
+def soup_locations(html_content: str) -> List[Dict]:
+    tree = BeautifulSoup(html_content, features="html.parser").find("div", "content")
+    result = []
+    for node in tree.find_all("article"):
+        location = Location()
+        location.load_html(node)
+        result.append(location.properties)
+    return result
+
+
+def stream_locations(html_content: str) -> List[Dict]:
+    result = []
+    for href, strings in extract_locations(html_content):
+        location = Location()
+        location.load_link(href, strings)
+        result.append(location.properties)
+    return result
+
+
+def _check(label: str, html_content: str, soup_fn, stream_fn) -> int:
+    soup_result, stream_result = soup_fn(html_content), stream_fn(html_content)
+    mismatches = [i for i, (a, b) in enumerate(zip(soup_result, stream_result)) if a != b]
+    if len(soup_result) != len(stream_result) or mismatches:
+        i = mismatches[0] if mismatches else min(len(soup_result), len(stream_result))
+        raise AssertionError(f"{label}: parity failure at node {i}: {soup_result[i:i + 1]} != {stream_result[i:i + 1]}")
+    return len(soup_result)
+
+
+def _compare(label: str, html_content: str, soup_fn, stream_fn, repeat: int):
+    nodes = _check(label, html_content, soup_fn, stream_fn)
+    timings = {}
+    for name, fn in [("soup", soup_fn), ("stream", stream_fn)]:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(html_content)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    print(f"  {label:30s} {nodes:6d} nodes  soup {timings['soup'] * 1000:9.1f} ms"
+          f"  stream {timings['stream'] * 1000:9.1f} ms  ({timings['soup'] / timings['stream']:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the streaming extractor against BeautifulSoup and time both")
+    parser.add_argument("--listings", type=int, default=2000)
+    parser.add_argument("--seeds", type=int, default=20, help="extra small random pages checked for parity only")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("pages", nargs="*", help="saved maptoons listing pages (.html) to check as well")
+    args = parser.parse_args()
+
+    for seed in range(args.seeds):
+        _check(f"random listings #{seed}", listing_page(20, seed), soup_businesses, stream_businesses)
+        _check(f"random index #{seed}", index_page(20, seed), soup_locations, stream_locations)
+    print(f"  parity ok on {args.seeds} random listing and index pages")
+    _compare(f"{args.listings} listings", listing_page(args.listings), soup_businesses, stream_businesses, args.repeat)
+    _compare(f"{args.listings} articles", index_page(args.listings), soup_locations, stream_locations, args.repeat)
+    for page in args.pages:
+        with open(page, "rb") as f:
+            _compare(page, f.read().decode("utf-8", errors="replace"), soup_businesses, stream_businesses, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import math
+import random
+import timeit
+from typing import Any, Dict
+
+from geometry import area, bounds, centroid, contains, from_geojson
+from utils import bounding_box
+
+
+def legacy_bounding_box(geometry: Dict[str, Any]) -> Dict[str, Any]:
+    # utils.bounding_box before the geometry kernel, kept as the baseline
+    min_pt, max_pt = [], []
+    for poly in geometry.get("coordinates", []):
+        for pt in poly[0]:
+            if not min_pt:
+                min_pt = pt
+                max_pt = pt
+                continue
+            lon, lat = pt
+            min_lon, min_lat = min_pt
+            max_lon, max_lat = max_pt
+            min_pt = [min(lon, min_lon), min(lat, min_lat)]
+            max_pt = [max(lon, max_lon), max(lat, max_lat)]
+    return {"type": "MultiPoint", "coordinates": [min_pt, max_pt]}
+
+
+def synthetic_multipolygon(parts: int, vertices: int, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    polygons = []
+    for _ in range(parts):
+        cx, cy = rng.uniform(-79, -72), rng.uniform(40.5, 45)
+        ring = []
+        for k in range(vertices):
+            t = 2 * math.pi * k / vertices
+            r = 0.05 * (1 + 0.3 * rng.random())
+            ring.append([cx + r * math.cos(t), cy + r * math.sin(t)])
+        ring.append(ring[0])
+        polygons.append([ring])
+    return {"type": "MultiPolygon", "coordinates": polygons}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the geometry kernel against the legacy bounding_box")
+    parser.add_argument("--parts", type=int, default=20)
+    parser.add_argument("--vertices", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    geometry = synthetic_multipolygon(args.parts, args.vertices)
+    shape = from_geojson(geometry)
+    assert legacy_bounding_box(geometry) == bounding_box(geometry)
+
+    x, y = centroid(shape)
+    timings = {
+        "legacy bounding_box": lambda: legacy_bounding_box(geometry),
+        "utils.bounding_box (convert + bounds)": lambda: bounding_box(geometry),
+        "from_geojson": lambda: from_geojson(geometry),
+        "bounds": lambda: bounds(shape),
+        "centroid": lambda: centroid(shape),
+        "area": lambda: area(shape),
+        "contains": lambda: contains(shape, x, y),
+    }
+    print(f"{args.parts} polygons x {args.vertices} vertices")
+    for name, fn in timings.items():
+        best = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        print(f"  {name:40s} {best * 1000:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
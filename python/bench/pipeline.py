@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from bench.synthetic import FakeGeocoder, LocalFetcher, generate
+from census import CensusPlaces
+from directory import BusinessDirectory
+from utils import load_json
+
+MAP_NAME = "Benchville, NY"
+LISTING_URL = "https://maptoons.example/benchville.html"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _measure(fn: Callable[[], Any], memory: bool) -> Dict[str, float]:
+    if memory:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    fn()
+    result = {"seconds": round(time.perf_counter() - start, 4)}
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        result["peak_mb"] = round((peak - before) / 2 ** 20, 2)
+        result["retained_mb"] = round((current - before) / 2 ** 20, 2)
+    return result
+
+
+def run(paths: Dict[str, str], out_dir: str, workers: int = 8, latency: float = 0, memory: bool = True) -> Dict[str, Dict[str, float]]:
+    geocoder = FakeGeocoder(latency)
+    fetcher = LocalFetcher({LISTING_URL: paths["html"]})
+    shared: Dict[str, Any] = {}
+    # the later phases run on the scraped listings, which (unlike csv rows) have no town yet
+    from_csv = BusinessDirectory(MAP_NAME)
+    map_data = BusinessDirectory(MAP_NAME)
+
+    def load_shared():
+        shared["places"] = CensusPlaces.load(paths["census"], cache_filename=os.path.join(out_dir, "census.places.bin"))
+        shared["categories"] = load_json(paths["categories"])
+
+    phases = [
+        ("load_census", load_shared),
+        ("load_csv", lambda: from_csv.load_csv(paths["csv"])),
+        ("scrape", lambda: map_data.scrape(LISTING_URL, fetcher=fetcher, streaming=True)),
+        ("match_categories", lambda: map_data.match_categories(shared["categories"])),
+        ("match_towns", lambda: map_data.match_towns(shared["places"])),
+        ("geocode", lambda: map_data.geocode(geocoder.geocode, workers=workers)),
+        ("validate_geocodes", lambda: map_data.validate_geocodes(shared["places"], review_filename=os.path.join(out_dir, "benchville.review.geojson"))),
+        ("locate_towns", lambda: map_data.locate_towns(shared["places"])),
+        ("load_loc_from_csv", lambda: map_data.load_loc_from_csv(paths["loc_csv"])),
+        ("load_img", lambda: map_data.load_img(paths["img"])),
+        ("load_corrections", lambda: map_data.load_geojson(paths["corrections"], keep_name=True)),
+        ("save_geojson", lambda: map_data.save_geojson(os.path.join(out_dir, "benchville.geojson"))),
+    ]
+    results = {}
+    for name, fn in phases:
+        results[name] = _measure(fn, memory)
+        print(f"  {name:20s} {results[name]['seconds']:9.3f} s" + (f"  peak {results[name]['peak_mb']:9.2f} MB" if memory else ""))
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]):
+    base_runs = {run["businesses"]: run["phases"] for run in baseline.get("runs", [])}
+    print(f"Compared with {baseline.get('commit') or 'baseline'}:")
+    for run_result in results["runs"]:
+        base = base_runs.get(run_result["businesses"])
+        if not base:
+            continue
+        print(f"  {run_result['businesses']} businesses")
+        for name, phase in run_result["phases"].items():
+            if name in base and base[name]["seconds"]:
+                ratio = phase["seconds"] / base[name]["seconds"]
+                print(f"    {name:20s} {base[name]['seconds']:9.3f} s -> {phase['seconds']:9.3f} s  ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and measure each pipeline phase on synthetic maps")
+    parser.add_argument("--businesses", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--towns", type=int, default=100)
+    parser.add_argument("--images", type=int, default=20000, help="logo files generated at most")
+    parser.add_argument("--workers", type=int, default=8, help="geocoder threads")
+    parser.add_argument("--latency", type=float, default=0, help="fake geocoder latency per call in seconds")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc, which slows everything down")
+    parser.add_argument("--data-dir", default="", help="keep the generated inputs here instead of a temporary directory")
+    parser.add_argument("--output", default="bench-pipeline.json")
+    parser.add_argument("--compare", default="", help="results file from an earlier commit")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": [],
+    }
+    memory = not args.no_memory
+    for businesses in args.businesses:
+        data_dir = os.path.join(args.data_dir, str(businesses)) if args.data_dir else tempfile.mkdtemp(prefix="bench-")
+        print(f"{businesses} businesses, {args.towns} towns ({data_dir})")
+        paths = generate(data_dir, businesses, args.towns, min(businesses, args.images))
+        if memory:
+            tracemalloc.start()
+        phases = run(paths, data_dir, args.workers, args.latency, memory)
+        tracemalloc.stop()
+        results["runs"].append({"businesses": businesses, "towns": args.towns, "phases": phases})
+        if not args.data_dir:
+            shutil.rmtree(data_dir)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"Results saved to {args.output}")
+    if args.compare:
+        compare(results, load_json(args.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+from utils import ascii_only, make_geojson
+
+# a box over central Long Island, tiled by the synthetic census places
+WEST, SOUTH, EAST, NORTH = -73.75, 40.6, -73.0, 40.95
+STREETS = ["Main", "Deer Park", "Broadway", "Oak", "Maple", "Park", "Sunrise", "Jericho", "Merrick", "Elm"]
+STREET_TYPES = ["Ave.", "Rd.", "St.", "Pl.", "Blvd.", "Dr.", "Ln."]
+WORDS = ["Golden", "Family", "Island", "Village", "Bay", "Harbor", "Sunny", "Royal", "Green", "Corner"]
+NOUNS = ["Pizza", "Deli", "Bakery", "Salon", "Auto", "Dental", "Fitness", "Florist", "Tax", "Cleaners"]
+PRIORITIES = ["S", "D", "T", "Q", "P"]
+CSV_HEADER = ["LOC", "Business", "Phone", "Address", "Town", "Website", "Category", "DL Info", "HDL?", "Shoppers Discount", "Exp."]
+
+
+def letters(i: int) -> str:
+    # business ids keep letters only (utils.ascii_only), so names are numbered in letters
+    text = ""
+    while True:
+        text = chr(ord("a") + i % 26) + text
+        i = i // 26 - 1
+        if i < 0:
+            return text.title()
+
+
+def town_names(towns: int) -> List[str]:
+    return [f"{WORDS[i % len(WORDS)]} {NOUNS[i // len(WORDS) % len(NOUNS)]} {i}" for i in range(towns)]
+
+
+def census_places(towns: int, vertices: int = 200) -> Dict[str, Any]:
+    # towns tile the box as a grid of squares whose edges are split into vertices / 4 points each
+    cols = math.ceil(math.sqrt(towns))
+    rows = math.ceil(towns / cols)
+    w, h = (EAST - WEST) / cols, (NORTH - SOUTH) / rows
+    per_edge = max(1, vertices // 4)
+    features = []
+    for i, name in enumerate(town_names(towns)):
+        x0, y0 = WEST + (i % cols) * w, SOUTH + (i // cols) * h
+        corners = [(x0, y0), (x0 + w, y0), (x0 + w, y0 + h), (x0, y0 + h)]
+        ring = []
+        for (ax, ay), (bx, by) in zip(corners, corners[1:] + corners[:1]):
+            ring.extend([ax + (bx - ax) * k / per_edge, ay + (by - ay) * k / per_edge] for k in range(per_edge))
+        ring.append(ring[0])
+        features.append({"type": "Feature", "properties": {"NAME": name}, "geometry": {"type": "Polygon", "coordinates": [ring]}})
+    return {"type": "FeatureCollection", "features": features}
+
+
+class FakeGeocoder:
+    # deterministic stand-in for the geoapify API: a point in the box derived from the query hash
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.calls = 0
+
+    def geocode(self, query: str) -> Tuple[str, Dict[str, Any]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        h = int.from_bytes(hashlib.sha1(query.encode()).digest()[:8], "big")
+        lon = WEST + (EAST - WEST) * (h & 0xFFFFFFFF) / 0xFFFFFFFF
+        lat = SOUTH + (NORTH - SOUTH) * (h >> 32) / 0xFFFFFFFF
+        return f"{query}, United States of America", {"type": "Point", "coordinates": [lon, lat]}
+
+
+class LocalFetcher:
+    # Fetcher stand-in that serves generated pages from disk
+    def __init__(self, pages: Dict[str, str]):
+        self.pages = pages
+
+    def get(self, url: str) -> bytes:
+        with open(self.pages[url], "rb") as f:
+            return f.read()
+
+
+def _business(i: int, rng: random.Random, towns: List[str], categories: List[str]) -> Dict[str, str]:
+    name = f"{rng.choice(WORDS)} {rng.choice(NOUNS)} {letters(i)}"
+    address = f"{rng.randint(1, 3000)} {rng.choice(STREETS)} {rng.choice(STREET_TYPES)}"
+    town = rng.choice(towns)
+    category = rng.choice(categories)
+    r = rng.random()
+    if r < 0.1:
+        category = category.lower() # matched after normalization
+    elif r < 0.15:
+        category = category[:-1] # fuzzy match
+    return {
+        "LOC": f"{i + 1}{rng.choice(PRIORITIES)}",
+        "Business": name,
+        "Phone": f"516-{i // 10000 % 1000:03d}-{i % 10000:04d}",
+        # a third of the rows only name the town in the address, for match_towns
+        "Address": f"{address}, {town}" if i % 3 == 0 else address,
+        "Town": "" if i % 3 == 0 else town,
+        "Website": f"{name.replace(' ', '')}.com" if rng.random() < 0.7 else "",
+        "Category": category,
+        "DL Info": " ".join(rng.choice(WORDS + NOUNS).lower() for _ in range(rng.randint(5, 30))),
+        "HDL?": "Yes" if rng.random() < 0.3 else "",
+        "Shoppers Discount": "10% off" if rng.random() < 0.2 else "",
+        "Exp.": "12/31/2026" if rng.random() < 0.2 else "",
+    }
+
+
+def _listing_html(rows: List[Dict[str, str]]) -> str:
+    nodes = []
+    for row in rows:
+        nodes.append(
+            f'<div class="gear" id="{ascii_only(row["Business"], space="")}"><img src="logo.png">'
+            f'<h3 class="name">{row["Business"]}</h3><p class="category">{row["Category"].replace("&", "&amp;")}</p>'
+            f'<p class="address">{row["Address"]}</p><p class="phone">Phone: {row["Phone"]}</p>'
+            f'<p class="web"><a href="https://{row["Website"] or "example.com"}">Website</a></p>'
+            f'<p class="info">{row["DL Info"]}</p></div>'
+        )
+    return f"<html><head><title>Best of</title></head><body><nav>menu</nav>{''.join(nodes)}</body></html>"
+
+
+def generate(out_dir: str, businesses: int, towns: int = 100, images: int = None, seed: int = 0, vertices: int = 200) -> Dict[str, str]:
+    # Writes a synthetic map's inputs to out_dir and returns their paths by name
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(os.path.dirname(__file__), "..", "..", "data", "subcategories.json"), "r") as f:
+        subcategories = json.load(f)
+    names = town_names(towns)
+    rows = [_business(i, rng, names, list(subcategories)) for i in range(businesses)]
+
+    paths = {name: os.path.join(out_dir, filename) for name, filename in [
+        ("csv", "listings.csv"), ("html", "listings.html"), ("census", "census.geojson"),
+        ("categories", "subcategories.json"), ("loc_csv", "loc.csv"), ("corrections", "corrections.geojson"),
+        ("img", "img"),
+    ]}
+    with open(paths["csv"], "w", newline="") as f:
+        writer = csv.DictWriter(f, CSV_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(paths["html"], "w") as f:
+        f.write(_listing_html(rows))
+    with open(paths["census"], "w") as f:
+        json.dump(census_places(towns, vertices), f)
+    with open(paths["categories"], "w") as f:
+        json.dump(subcategories, f)
+
+    # LOC spreadsheet with the kind of differences the record linkage has to absorb
+    with open(paths["loc_csv"], "w", newline="") as f:
+        writer = csv.DictWriter(f, ["LOC", "Business", "Phone", "Address"])
+        writer.writeheader()
+        for row in rows:
+            name, phone = row["Business"], row["Phone"]
+            if rng.random() < 0.2:
+                name = name.upper() + " Inc."
+            if rng.random() < 0.2:
+                phone = "(" + phone[:3] + ") " + phone[4:]
+            writer.writerow({"LOC": row["LOC"], "Business": name, "Phone": phone, "Address": row["Address"].split(",")[0]})
+
+    corrections = []
+    for row in rng.sample(rows, businesses // 20):
+        lon, lat = rng.uniform(WEST, EAST), rng.uniform(SOUTH, NORTH)
+        properties = {"id": ascii_only(row["Business"], space="")}
+        corrections.append({"type": "Feature", "properties": properties, "geometry": {"type": "Point", "coordinates": [lon, lat]}})
+    make_geojson("Synthetic Corrections", corrections, paths["corrections"])
+
+    # load_img only looks at the file names, so the logos are empty files
+    os.makedirs(paths["img"], exist_ok=True)
+    for row in rows[:businesses if images is None else images]:
+        open(os.path.join(paths["img"], f"SY-{row['LOC']}.png"), "wb").close()
+    paths["img"] = os.path.join(paths["img"], "SY-*png")
+    return paths
+
+
+def generate_site(out_dir: str, towns: int = 20, businesses: int = 50, seed: int = 0) -> str:
+    # A maptoons-like site for LocationDirectory.crawl: index.html links every town's listings
+    # page, some towns twice with an older year that the crawl must skip. Returns the index path.
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(os.path.dirname(__file__), "..", "..", "data", "subcategories.json"), "r") as f:
+        categories = list(json.load(f))
+    names = town_names(towns)
+    articles = []
+    for t, town in enumerate(names):
+        slug = ascii_only(town, alphabet="abcdefghijklmnopqrstuvwxyz-", space="-").strip("-")
+        rows = [_business(t * businesses + i, rng, [town], categories) for i in range(businesses)]
+        with open(os.path.join(out_dir, f"{slug}-2025.html"), "w") as f:
+            f.write(_listing_html(rows))
+        articles.append(f'<article><div><a href="{slug}-2025.html">{town}</a></div><p>Interactive Map</p></article>')
+        if t % 3 == 0:
+            with open(os.path.join(out_dir, f"{slug}-2023.html"), "w") as f:
+                f.write(_listing_html(rows[:businesses // 2]))
+            articles.append(f'<article><div><a href="{slug}-2023.html">{town}</a></div><p>Map</p></article>')
+    filename = os.path.join(out_dir, "index.html")
+    with open(filename, "w") as f:
+        f.write(f'<html><body><div class="content">{"".join(articles)}</div></body></html>')
+    return filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic pipeline inputs")
+    parser.add_argument("out_dir")
+    parser.add_argument("--businesses", type=int, default=1000)
+    parser.add_argument("--towns", type=int, default=100)
+    parser.add_argument("--images", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for name, path in generate(args.out_dir, args.businesses, args.towns, args.images, args.seed).items():
+        print(f"  {name:12s} {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+def normalize_key(text: str) -> str:
+    text = text.lower().replace("&", " and ")
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return text.strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a: Set[str], b: Set[str]) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def words(norm: str) -> Set[str]:
+    return set(norm.split()) - WORD_STOPWORDS
+
+
+# words every category name can have, they don't tell categories apart
+WORD_STOPWORDS = {"and", "of", "the"}
+# a misspelled word still agrees with the category word this close to it
+WORD_MIN_SCORE = 0.7
+
+
+class CategoryMatcher:
+    # Index over subcategories.json: exact key, then normalized key (case, punctuation, "&"),
+    # then trigram similarity (Dice coefficient) for anything still unmatched. A trigram match
+    # also has to agree on the query's rarest word ("Tax Preparation" is not "Meal Preparation",
+    # "Dog Grooming" is not "Pet Grooming"); a word no category has must be an abbreviation or
+    # misspelling of one of the candidate's words.
+    def __init__(self, category_json: Dict[str, Any], min_score: float = 0.7):
+        self.category_json = category_json
+        self.min_score = min_score
+        self.normalized: Dict[str, str] = {}
+        self.grams: Dict[str, List[str]] = {}
+        self.gram_counts: Dict[str, int] = {}
+        # how many categories use each word
+        self.word_counts: Counter = Counter()
+        for key in category_json:
+            norm = normalize_key(key)
+            if not norm or norm in self.normalized:
+                continue
+            self.normalized[norm] = key
+            grams = trigrams(norm)
+            self.gram_counts[norm] = len(grams)
+            for gram in grams:
+                self.grams.setdefault(gram, []).append(norm)
+            self.word_counts.update(words(norm))
+
+    def _agrees(self, word: str, candidate: str) -> bool:
+        if word in words(candidate):
+            return True
+        # abbreviated ("Prep") or misspelled
+        grams = trigrams(word)
+        return any((len(word) >= 3 and w.startswith(word)) or dice(grams, trigrams(w)) >= WORD_MIN_SCORE for w in words(candidate))
+
+    def match(self, business: str) -> Tuple[Optional[str], float]:
+        if business in self.category_json:
+            return business, 1.0
+        norm = normalize_key(business)
+        if norm in self.normalized:
+            return self.normalized[norm], 1.0
+        if not norm:
+            return None, 0.0
+
+        grams = trigrams(norm)
+        shared = Counter(candidate for gram in grams for candidate in self.grams.get(gram, []))
+        scored = sorted(((2 * count / (len(grams) + self.gram_counts[candidate]), candidate) for candidate, count in shared.items()), key=lambda item: (-item[0], item[1]))
+        query_words = words(norm)
+        rarest = min(query_words, key=lambda w: (self.word_counts[w], -len(w), w)) if query_words else None
+        for score, candidate in scored:
+            if score < self.min_score:
+                break
+            if rarest is None or self._agrees(rarest, candidate):
+                return self.normalized[candidate], score
+        return None, scored[0][0] if scored else 0.0
+
+    def lookup(self, business: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        key, score = self.match(business)
+        return (self.category_json[key] if key is not None else None), score
+
+
+def as_category_matcher(categories) -> CategoryMatcher:
+    if isinstance(categories, CategoryMatcher):
+        return categories
+    return CategoryMatcher(categories)
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from geometry import BBox, Shape, bounds, contains, from_geojson, to_geojson
+from utils import load_json
+
+logger = logging.getLogger(__name__)
+
+EMPTY_BBOX = (1.0, 1.0, -1.0, -1.0)
+
+
+def _box_contains(box: BBox, x: float, y: float) -> bool:
+    min_x, min_y, max_x, max_y = box
+    return min_x <= x <= max_x and min_y <= y <= max_y
+
+
+class STRTree:
+    # Sort-Tile-Recursive packed R-tree over bounding boxes, built once and queried by point
+    def __init__(self, boxes: List[BBox], node_size: int = 16):
+        self.node_size = node_size
+        self.boxes = boxes
+        self.levels: List[List[Tuple[BBox, List[int]]]] = []
+        entries = [(box, [i]) for i, box in enumerate(boxes)]
+        while entries:
+            entries = self._pack(entries)
+            self.levels.append(entries)
+            if len(entries) == 1:
+                break
+
+    def _pack(self, entries: List[Tuple[BBox, List[int]]]) -> List[Tuple[BBox, List[int]]]:
+        indexed = list(enumerate(entries))
+        node_count = -(-len(indexed) // self.node_size)
+        slice_count = max(1, round(node_count ** 0.5))
+        slice_size = -(-len(indexed) // slice_count)
+        indexed.sort(key=lambda e: e[1][0][0] + e[1][0][2])
+        nodes = []
+        for s in range(0, len(indexed), slice_size):
+            vertical = sorted(indexed[s:s + slice_size], key=lambda e: e[1][0][1] + e[1][0][3])
+            for n in range(0, len(vertical), self.node_size):
+                children = vertical[n:n + self.node_size]
+                box = (
+                    min(e[1][0][0] for e in children),
+                    min(e[1][0][1] for e in children),
+                    max(e[1][0][2] for e in children),
+                    max(e[1][0][3] for e in children),
+                )
+                nodes.append((box, [i for i, _ in children]))
+        return nodes
+
+    def query(self, x: float, y: float) -> List[int]:
+        if not self.levels:
+            return []
+        # walk down from the root; level 0 children are the original box indices
+        candidates = list(range(len(self.levels[-1])))
+        for level in reversed(self.levels):
+            next_candidates = []
+            for i in candidates:
+                box, children = level[i]
+                if _box_contains(box, x, y):
+                    next_candidates.extend(children)
+            candidates = next_candidates
+        return sorted(i for i in candidates if _box_contains(self.boxes[i], x, y))
+
+
+class CensusPlaces:
+    def __init__(self, geojson: Dict[str, Any], name_key: str = "NAME"):
+        self.shapes: List[Optional[Shape]] = []
+        names = []
+        for feature in geojson["features"]:
+            geometry = feature["geometry"]
+            names.append(feature["properties"][name_key])
+            self.shapes.append(from_geojson(geometry) if geometry else None)
+        self._index(names, [bounds(shape) if shape else EMPTY_BBOX for shape in self.shapes])
+
+    def _index(self, names: List[str], boxes: List[BBox]):
+        self.names = names
+        self.by_name: Dict[str, int] = {}
+        for i, name in enumerate(names):
+            self.by_name.setdefault(name, i)
+        self.tree = STRTree(boxes)
+
+    def shape(self, i: int) -> Optional[Shape]:
+        return self.shapes[i]
+
+    def _geometry(self, i: int) -> Optional[Dict[str, Any]]:
+        shape = self.shape(i)
+        return to_geojson(shape) if shape else None
+
+    def find(self, name: str) -> Optional[Dict[str, Any]]:
+        if name in self.by_name:
+            return self._geometry(self.by_name[name])
+        for i, place_name in enumerate(self.names):
+            if name in place_name:
+                return self._geometry(i)
+        return None
+
+    def locate(self, lon: float, lat: float) -> Optional[str]:
+        for i in self.tree.query(lon, lat):
+            if contains(self.shape(i), lon, lat):
+                return self.names[i]
+        return None
+
+    @staticmethod
+    def load(filename: str, name_key: str = "NAME", cache_filename: str = "") -> "CensusPlaces":
+        cache_filename = cache_filename or os.path.splitext(filename)[0] + ".places.bin"
+        if not PackedCensusPlaces.is_current(cache_filename, filename):
+            logger.info("Packing census places: %s -> %s", filename, cache_filename)
+            pack_places(filename, cache_filename, name_key)
+        return PackedCensusPlaces(cache_filename)
+
+
+# Packed layout: header, then 8-byte aligned sections
+#   coords   float64 [2 * points]      rings    int64 [rings + 1]  (point offsets)
+#   parts    int64 [parts + 1]         features int64 [features + 1] (part offsets)
+#   bboxes   float64 [4 * features]    types    uint8 [features]
+#   names    JSON list                 properties JSON list
+PACK_MAGIC = b"MTPL"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<4sI32sqq6Q")
+GEOMETRY_TYPES = ["Point", "MultiPoint", "LineString", "MultiLineString", "Polygon", "MultiPolygon"]
+NO_GEOMETRY = 255
+
+
+def _file_sha256(filename: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _padded(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 8)
+
+
+def pack_places(filename: str, cache_filename: str, name_key: str = "NAME"):
+    coords, rings, parts, features = array("d"), array("q", [0]), array("q", [0]), array("q", [0])
+    bboxes, types = array("d"), bytearray()
+    names, properties = [], []
+    for feature in load_json(filename)["features"]:
+        geometry = feature["geometry"]
+        names.append(feature["properties"][name_key])
+        properties.append(feature["properties"])
+        if geometry:
+            shape = from_geojson(geometry)
+            point_offset, ring_offset = len(coords) // 2, len(rings) - 1
+            coords.extend(shape.coords)
+            rings.extend(r + point_offset for r in shape.rings[1:])
+            parts.extend(p + ring_offset for p in shape.parts[1:])
+            bboxes.extend(bounds(shape))
+            types.append(GEOMETRY_TYPES.index(shape.type))
+        else:
+            bboxes.extend(EMPTY_BBOX)
+            types.append(NO_GEOMETRY)
+        features.append(len(parts) - 1)
+
+    names_json = json.dumps(names, ensure_ascii=False).encode()
+    properties_json = json.dumps(properties, ensure_ascii=False).encode()
+    stat = os.stat(filename)
+    header = PACK_HEADER.pack(
+        PACK_MAGIC, PACK_VERSION, _file_sha256(filename), stat.st_size, stat.st_mtime_ns,
+        len(names), len(parts) - 1, len(rings) - 1, len(coords) // 2, len(names_json), len(properties_json),
+    )
+    tmp_filename = cache_filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        f.write(header)
+        for section in [coords, rings, parts, features, bboxes]:
+            f.write(section.tobytes())
+        f.write(_padded(bytes(types)))
+        f.write(_padded(names_json))
+        f.write(properties_json)
+    os.replace(tmp_filename, cache_filename)
+
+
+class PackedCensusPlaces(CensusPlaces):
+    # Memory-mapped view of a pack_places() file; shapes are sliced out of the mapping on demand
+    def __init__(self, cache_filename: str):
+        self.file = open(cache_filename, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = PACK_HEADER.unpack_from(self.mmap)
+        _, _, _, _, _, n_features, n_parts, n_rings, n_points, names_len, properties_len = header
+
+        view = memoryview(self.mmap)
+        offset = PACK_HEADER.size
+
+        def section(size: int, fmt: str = ""):
+            nonlocal offset
+            data = view[offset:offset + size]
+            offset += size + (-size % 8)
+            return data.cast(fmt) if fmt else data
+
+        self.coords = section(16 * n_points, "d")
+        self.rings = section(8 * (n_rings + 1), "q")
+        self.parts = section(8 * (n_parts + 1), "q")
+        self.features = section(8 * (n_features + 1), "q")
+        bboxes = section(32 * n_features, "d")
+        self.types = section(n_features)
+        names = json.loads(bytes(section(names_len)))
+        self._properties = section(properties_len)
+        self._shapes: Dict[int, Optional[Shape]] = {}
+        self._index(names, [tuple(bboxes[4 * i:4 * i + 4]) for i in range(n_features)])
+
+    @staticmethod
+    def is_current(cache_filename: str, filename: str) -> bool:
+        if not os.path.isfile(cache_filename):
+            return False
+        with open(cache_filename, "rb") as f:
+            header = f.read(PACK_HEADER.size)
+        if len(header) < PACK_HEADER.size:
+            return False
+        magic, version, sha256, size, mtime_ns = PACK_HEADER.unpack(header)[:5]
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            return False
+        stat = os.stat(filename)
+        if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+            return True
+        return _file_sha256(filename) == sha256
+
+    def shape(self, i: int) -> Optional[Shape]:
+        if i not in self._shapes:
+            geo_type = self.types[i]
+            if geo_type == NO_GEOMETRY:
+                self._shapes[i] = None
+            else:
+                part_start, part_end = self.features[i], self.features[i + 1]
+                ring_start, ring_end = self.parts[part_start], self.parts[part_end]
+                point_start, point_end = self.rings[ring_start], self.rings[ring_end]
+                self._shapes[i] = Shape(
+                    GEOMETRY_TYPES[geo_type],
+                    self.coords[2 * point_start:2 * point_end],
+                    array("q", (r - point_start for r in self.rings[ring_start:ring_end + 1])),
+                    array("q", (p - ring_start for p in self.parts[part_start:part_end + 1])),
+                )
+        return self._shapes[i]
+
+    def properties(self, i: int) -> Dict[str, Any]:
+        if not hasattr(self, "_properties_list"):
+            self._properties_list = json.loads(bytes(self._properties))
+        return self._properties_list[i]
+
+
+def as_census_places(census_places) -> CensusPlaces:
+    if isinstance(census_places, CensusPlaces):
+        return census_places
+    return CensusPlaces(census_places)
@@ -0,0 +1,137 @@
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils import make_geojson
+
+# defaults as in supercluster: 40px radius on 512px tiles
+CLUSTER_RADIUS = 40
+TILE_EXTENT = 512
+
+
+def lon_x(lon: float) -> float:
+    return lon / 360 + 0.5
+
+
+def lat_y(lat: float) -> float:
+    sin = math.sin(math.radians(lat))
+    y = 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi
+    return min(max(y, 0.0), 1.0)
+
+
+def x_lon(x: float) -> float:
+    return (x - 0.5) * 360
+
+
+def y_lat(y: float) -> float:
+    return math.degrees(2 * math.atan(math.exp(math.pi * (1 - 2 * y)))) - 90
+
+
+class ClusterIndex:
+    # Hierarchical point clusters for zooms min_zoom..max_zoom. Each zoom is built from the one
+    # above it with a grid of cells one cluster radius wide, so only the 3x3 neighbouring cells
+    # are searched per point. Nodes are rows in flat arrays; leaves are the input points.
+    def __init__(
+        self,
+        features: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]],
+        min_zoom: int = 0,
+        max_zoom: int = 16,
+        radius: float = CLUSTER_RADIUS,
+        extent: int = TILE_EXTENT,
+        category_key: str = "category",
+    ):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.radius = radius
+        self.extent = extent
+        self.xs = array("d")
+        self.ys = array("d")
+        self.counts = array("l")
+        self.zooms = array("b") # zoom a cluster was formed at, max_zoom + 1 for leaves
+        self.categories: List[Dict[str, int]] = []
+        self.properties: List[Optional[Dict[str, Any]]] = []
+
+        leaves = []
+        for properties, geometry in features:
+            if not geometry or geometry.get("type") != "Point":
+                continue
+            lon, lat = geometry["coordinates"][:2]
+            category = (properties or {}).get(category_key) or ""
+            leaves.append(self._node(lon_x(lon), lat_y(lat), 1, max_zoom + 1, {category: 1}, properties))
+
+        self.levels: Dict[int, List[int]] = {max_zoom + 1: leaves}
+        for z in range(max_zoom, min_zoom - 1, -1):
+            self.levels[z] = self._cluster(self.levels[z + 1], z)
+
+    def _node(self, x: float, y: float, count: int, zoom: int, categories: Dict[str, int], properties=None) -> int:
+        self.xs.append(x)
+        self.ys.append(y)
+        self.counts.append(count)
+        self.zooms.append(zoom)
+        self.categories.append(categories)
+        self.properties.append(properties)
+        return len(self.xs) - 1
+
+    def _cluster(self, nodes: List[int], z: int) -> List[int]:
+        r = self.radius / (self.extent * 2 ** z)
+        grid: Dict[Tuple[int, int], List[int]] = {}
+        for node in nodes:
+            grid.setdefault((int(self.xs[node] / r), int(self.ys[node] / r)), []).append(node)
+
+        visited = set()
+        clustered = []
+        for node in nodes:
+            if node in visited:
+                continue
+            visited.add(node)
+            x, y = self.xs[node], self.ys[node]
+            cx, cy = int(x / r), int(y / r)
+            neighbours = [
+                other
+                for i in (cx - 1, cx, cx + 1)
+                for j in (cy - 1, cy, cy + 1)
+                for other in grid.get((i, j), [])
+                if other not in visited and (self.xs[other] - x) ** 2 + (self.ys[other] - y) ** 2 <= r * r
+            ]
+            if not neighbours:
+                clustered.append(node)
+                continue
+
+            count, wx, wy, categories = 0, 0.0, 0.0, {}
+            for member in [node] + neighbours:
+                visited.add(member)
+                n = self.counts[member]
+                count += n
+                wx += self.xs[member] * n
+                wy += self.ys[member] * n
+                for category, c in self.categories[member].items():
+                    categories[category] = categories.get(category, 0) + c
+            clustered.append(self._node(wx / count, wy / count, count, z, categories))
+        return clustered
+
+    def feature(self, node: int) -> Dict[str, Any]:
+        geometry = {"type": "Point", "coordinates": [x_lon(self.xs[node]), y_lat(self.ys[node])]}
+        if self.counts[node] == 1:
+            return {"type": "Feature", "properties": self.properties[node], "geometry": geometry}
+        properties = {
+            "cluster": True,
+            "cluster_id": node,
+            "point_count": self.counts[node],
+            # clicking a cluster zooms to where it splits up
+            "expansion_zoom": self.zooms[node] + 1,
+            "categories": dict(sorted(self.categories[node].items())),
+        }
+        return {"type": "Feature", "properties": properties, "geometry": geometry}
+
+    def features(self, z: int) -> Iterable[Dict[str, Any]]:
+        z = min(max(z, self.min_zoom), self.max_zoom + 1)
+        return (self.feature(node) for node in self.levels[z])
+
+    def save(self, prefix: str, name: str = "", precision: int = 6) -> List[str]:
+        # one compact FeatureCollection per zoom: <prefix>-<zoom>.geojson
+        filenames = []
+        for z in range(self.min_zoom, self.max_zoom + 1):
+            filename = f"{prefix}-{z}.geojson"
+            make_geojson(f"{name} z{z}", self.features(z), filename, compact=True, precision=precision)
+            filenames.append(filename)
+        return filenames
@@ -0,0 +1,114 @@
+import copy
+import os
+from typing import Any, Dict, List, Tuple
+
+from utils import GEOAPIFY_URL, load_json
+
+
+class DataSource:
+    def __init__(self, name: str, geojson: str, url: str  = "", csv: str  = "", incremental: bool = False):
+        self.name = name
+        self.geojson = geojson
+        self.url = url
+        self.csv = csv
+        self.incremental = incremental
+
+
+class Corrections:
+    def __init__(self, filename: str, corrections: str = "", csv: str = "", img: str = ""):
+        self.filename = filename
+        self.corrections = corrections
+        self.csv = csv
+        self.img = img
+
+
+# pipeline keys a map can set for itself, e.g. "tile_dir" to export only that map's tiles
+MAP_OPTIONS = ["validate_geocodes", "batch_geocode", "logo_dir", "cluster_dir", "tile_dir", "outline_dir", "feature_db", "publish_dir"]
+
+
+class MapConfig:
+    def __init__(self, source: DataSource, corrections: Corrections, enabled: bool = True, options: Dict[str, Any] = None):
+        self.name = source.name
+        self.source = source
+        self.corrections = corrections
+        self.enabled = enabled
+        self.options = options or {}
+
+    @staticmethod
+    def from_json(m: Dict[str, Any]) -> "MapConfig":
+        source = DataSource(
+            name=m["name"],
+            geojson=m["geojson"],
+            url=m.get("url", ""),
+            csv=m.get("csv", ""),
+            incremental=m.get("incremental", False),
+        )
+        corrections = Corrections(
+            filename=m["geojson"],
+            corrections=m.get("corrections", ""),
+            csv=m.get("loc_csv", ""),
+            img=m.get("img", ""),
+        )
+        options = {key: m[key] for key in MAP_OPTIONS if key in m}
+        return MapConfig(source, corrections, m.get("enabled", True), options)
+
+
+class PipelineConfig:
+    def __init__(self, filename: str):
+        config = load_json(filename)
+        self.census_places: str = config["census_places"]
+        self.business_categories: str = config["business_categories"]
+        self.geocode_cache: str = config.get("geocode_cache", "data/geocode_cache.sqlite")
+        self.geocode_offline: bool = config.get("geocode_offline", False)
+        self.geocode_ttl: float = config.get("geocode_ttl", 0)
+        self.geocode_negative_ttl: float = config.get("geocode_negative_ttl", 86400)
+        self.http_cache: str = config.get("http_cache", "data/http_cache")
+        self.http_offline: bool = config.get("http_offline", False)
+        self.http_rate: float = config.get("http_rate", 0)
+        self.streaming_html: bool = config.get("streaming_html", False)
+        self.geocode_url: str = config.get("geocode_url", GEOAPIFY_URL)
+        self.geocode_rate: float = config.get("geocode_rate", 5)
+        self.geocode_workers: int = config.get("geocode_workers", 8)
+        self.batch_geocode: bool = config.get("batch_geocode", False)
+        self.address_points: List[str] = config.get("address_points", [])
+        self.address_point_confidence: float = config.get("address_point_confidence", 0.5)
+        self.validate_geocodes: bool = config.get("validate_geocodes", False)
+        self.town_tolerance: float = config.get("town_tolerance", 500)
+        self.logo_dir: str = config.get("logo_dir", "")
+        self.logo_sizes: List[int] = config.get("logo_sizes", [32, 64, 128])
+        self.logo_workers: int = config.get("logo_workers", os.cpu_count() or 1)
+        self.cluster_dir: str = config.get("cluster_dir", "")
+        self.cluster_zooms: List[int] = config.get("cluster_zooms", [0, 16])
+        self.cluster_radius: float = config.get("cluster_radius", 40)
+        self.tile_dir: str = config.get("tile_dir", "")
+        self.tile_zooms: List[int] = config.get("tile_zooms", [12])
+        self.outline_dir: str = config.get("outline_dir", "")
+        self.outline_tolerance: float = config.get("outline_tolerance", 0.0001)
+        self.outline_max_vertices: int = config.get("outline_max_vertices", None)
+        self.outline_precision: int = config.get("outline_precision", 5)
+        self.feature_db: str = config.get("feature_db", "")
+        self.publish_dir: str = config.get("publish_dir", "")
+        self.publish_keep: int = config.get("publish_keep", 10)
+        self.log_level: str = config.get("log_level", "INFO")
+        self.profile_dir: str = config.get("profile_dir", "")
+        self.trace_memory: bool = config.get("trace_memory", False)
+        self.maps: List[MapConfig] = [MapConfig.from_json(m) for m in config["maps"]]
+
+    def for_map(self, m: MapConfig) -> "PipelineConfig":
+        # this config with the map's own options over the pipeline-wide ones
+        config = copy.copy(self)
+        for key, value in m.options.items():
+            setattr(config, key, value)
+        return config
+
+    def map_files(self) -> Dict[str, Tuple[str, str]]:
+        # output -> (map name, corrections file) of every map, enabled or not
+        return {m.source.geojson: (m.name, m.corrections.corrections) for m in self.maps}
+
+    def select(self, names: List[str] = []) -> List[MapConfig]:
+        if not names:
+            return [m for m in self.maps if m.enabled]
+        unknown = set(names) - {m.name for m in self.maps}
+        if unknown:
+            raise KeyError(f"Unknown map(s): {', '.join(sorted(unknown))}")
+        return [m for m in self.maps if m.name in names]
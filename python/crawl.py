@@ -0,0 +1,41 @@
+import argparse
+import logging
+import os
+from pathlib import Path
+
+from config import PipelineConfig
+from directory import LocationDirectory
+from fetch import Fetcher
+from runner import LOG_FORMAT
+
+logger = logging.getLogger("crawl")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape a location index and the business listings of every town it links to")
+    parser.add_argument("url", help="location index page, e.g. https://maptoons.com/")
+    parser.add_argument("--config", default="maps.json", help="http cache settings")
+    parser.add_argument("--out-dir", default="data/crawl", help="one scraped .geojson per town")
+    parser.add_argument("--workers", type=int, default=4, help="pages fetched at the same time")
+    parser.add_argument("--rate", type=float, default=1, help="requests per second per host, 0 = unlimited")
+    parser.add_argument("--state", default="NY")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format=LOG_FORMAT)
+    config = PipelineConfig(args.config)
+    fetcher = Fetcher(config.http_cache, offline=config.http_offline, pool_size=args.workers, rate=args.rate)
+    locations = LocationDirectory("")
+    maps = locations.crawl(args.url, fetcher, args.workers, args.state, streaming=config.streaming_html)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for name, map_data in maps.items():
+        filename = os.path.join(args.out_dir, Path(locations.features[name].properties["data"]).name)
+        map_data.save_geojson(filename)
+        logger.info("%s: %d businesses -> %s", map_data.name, len(map_data.features), filename)
+    logger.info("%d of %d towns crawled, %d requests", len(maps), len(locations.features), fetcher.stats["requests"])
+    fetcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,197 @@
 import csv
+import json
+import logging
+import os
 import re
 import glob
-from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 from pathlib import Path
+from urllib.parse import urljoin
 
 from bs4 import BeautifulSoup
 
-from feature import Business, Feature, Location
-from utils import load_json, make_geojson, scrape_html
+from categories import as_category_matcher
+from census import as_census_places
+from cluster import CLUSTER_RADIUS, ClusterIndex
+from extract import extract_businesses, extract_locations
+from feature import Business, Feature, Location, intern_properties
+from geojson_stream import FeatureReader
+from geovalidate import as_geocode_validator, point_of
+import instrument
+from linkage import LinkRecord, RecordLinker
+from manifest import Manifest, digest
+from tiles import save_tiles
+from utils import batch_geocode, geocode, make_geojson, scrape, scrape_html
 
+logger = logging.getLogger(__name__)
 
 class FeatureDirectory:
+    feature_type = Feature
+
     def __init__(self, name: str = ""):
         self.name = name
         self.features: Dict[str, Feature] = {}
 
+    def update_feature(self, feature_id: str, properties: Dict[str, Any], geometry: Dict[str, Any], obj_type=None):
+        if feature_id in self.features:
+            self.features[feature_id].update(properties, geometry)
+        else:
+            self.features[feature_id] = (obj_type or self.feature_type)(properties, geometry)
+
+    @instrument.timed()
     def load_geojson(self, filename: str, obj_type=Feature, keep_name = False):
-        geo_json = load_json(filename)
-        name = geo_json["name"]
-        if name and not keep_name:
-            self.name = name
-        for feature in geo_json["features"]:
-            properties = feature.get("properties", {})
+        reader = FeatureReader(filename)
+        for feature in reader:
+            properties = intern_properties(feature.get("properties", {}))
             geometry = feature.get("geometry", {})
             feature_id = properties.get("id", None)
             if feature_id:
-                if feature_id in self.features:
-                    self.features[feature_id].update(properties, geometry)
-                else:
-                    self.features[feature_id] = obj_type(properties, geometry)
+                self.update_feature(feature_id, properties, geometry, obj_type)
+        name = reader.members.get("name")
+        if name and not keep_name:
+            self.name = name
+
+    @instrument.timed()
+    def save_geojson(self, filename: str, compact: bool = False, precision: int = None):
+        features = (item.feature for item in self.features.values())
+        make_geojson(self.name, features, filename, compact, precision)
 
+    @instrument.timed()
+    def save_clusters(self, prefix: str, min_zoom: int = 0, max_zoom: int = 16, radius: float = CLUSTER_RADIUS) -> List[str]:
+        index = ClusterIndex(((f.properties, f.geometry) for f in self.features.values()), min_zoom, max_zoom, radius)
+        return index.save(prefix, self.name)
 
-    def save_geojson(self, filename: str):
-        features = [item.feature for item in self.features.values()]
-        make_geojson(self.name, features, filename)
+    @instrument.timed()
+    def save_tiles(self, out_dir: str, zooms: List[int] = [12], precision: int = 6) -> Dict[str, Any]:
+        features = (item.feature for item in self.features.values())
+        return save_tiles(self.name, features, out_dir, zooms, precision)
 
 
 class LocationDirectory(FeatureDirectory):
-    def __init__(self, name: str, census_places: Dict[str, Any]):
+    feature_type = Location
+
+    def __init__(self, name: str, census_places: Dict[str, Any] = None):
         super().__init__(name)
-        self.census_places = census_places
+        # only process() and outlines() need the census layer, a crawl doesn't
+        self.census_places = as_census_places(census_places) if census_places is not None else None
 
-    def scrape(self, url: str, root_tag=["div", "content"], target_tag=["article"]):
+    def scrape(self, url: str, root_tag=["div", "content"], target_tag=["article"], fetcher=None, streaming=False):
         last_update: Dict[str, int] = {}
         locations: Dict[str, Location] = {}
 
-        print(f"Processing: {url}")
-        parse_tree: BeautifulSoup = scrape_html(url, root_tag)
-        for node in parse_tree.find_all(*target_tag):
-            loc = Location()
-            loc.load_html(node)
+        logger.info("Processing: %s", url)
+        for loc in self._scrape_locations(url, root_tag, target_tag, fetcher, streaming):
             loc_name = loc.properties.get("name")
             loc_year = loc.properties.get("year")
             if loc_name not in last_update or loc_year > last_update[loc_name]:
-                print(f"  {loc_name}")
+                logger.debug("  %s", loc_name)
                 last_update[loc_name] = loc_year
                 locations[loc_name] = loc
 
         self.features.update(locations)
+
+    def _scrape_locations(self, url: str, root_tag, target_tag, fetcher, streaming) -> Iterator[Location]:
+        if streaming:
+            for href, strings in extract_locations(scrape(url, fetcher=fetcher), root_tag, target_tag):
+                loc = Location()
+                loc.load_link(href, strings)
+                yield loc
+        else:
+            parse_tree: BeautifulSoup = scrape_html(url, root_tag, fetcher=fetcher)
+            for node in parse_tree.find_all(*target_tag):
+                loc = Location()
+                loc.load_html(node)
+                yield loc
     
+    @instrument.timed()
+    def crawl(self, url: str, fetcher=None, workers: int = 4, state: str = "NY", streaming=True) -> Dict[str, "BusinessDirectory"]:
+        # The index page (newest year per town, as scrape() keeps it), then every town's listings
+        # page on a bounded thread pool; politeness is the fetcher's per-host rate. Returns a
+        # "Town, ST" BusinessDirectory per location name; a page that fails is logged and skipped.
+        self.scrape(url, fetcher=fetcher, streaming=streaming)
+
+        def crawl_location(location: Location) -> "BusinessDirectory":
+            map_data = BusinessDirectory(f"{location.properties['name']}, {state}")
+            map_data.scrape(urljoin(url, location.properties["source"]), fetcher=fetcher, streaming=streaming)
+            return map_data
+
+        maps: Dict[str, BusinessDirectory] = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(crawl_location, location): name for name, location in self.features.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    maps[name] = future.result()
+                    logger.info("  %s: %d businesses", name, len(maps[name].features))
+                except Exception as e:
+                    logger.warning("  %s: %s failed: %r", name, self.features[name].properties["source"], e)
+                    instrument.count("crawl_failed")
+        instrument.count("crawl_pages", len(maps))
+        # in index order, not completion order
+        return {name: maps[name] for name in self.features if name in maps}
+
     def process(self):
         for location in self.features.values():
             location.bounding_box(self.census_places)
 
+    @instrument.timed()
+    def outlines(self, tolerance: float = None, max_vertices: int = None, precision: int = 5) -> Dict[str, Tuple[int, int, int, int]]:
+        # simplified census outlines instead of bounding boxes: name -> (vertices, bytes) before and after
+        report = {}
+        for location in self.features.values():
+            location.match_geometry(self.census_places)
+            size = len(json.dumps(location.geometry, separators=(",", ":")))
+            before, after = location.simplify_geometry(tolerance, max_vertices, precision)
+            if before:
+                new_size = len(json.dumps(location.geometry, separators=(",", ":")))
+                report[location.properties.get("name")] = (before, after, size, new_size)
+                logger.debug("  %s: %d -> %d vertices, %d -> %d bytes", location.properties.get("name"), before, after, size, new_size)
+        if report:
+            before, after, size, new_size = [sum(column) for column in zip(*report.values())]
+            logger.info("Town outlines: %d -> %d vertices, %d -> %d bytes (%.1f%%)", before, after, size, new_size, 100 * new_size / size)
+        return report
+
 
 class BusinessDirectory(FeatureDirectory):
+    feature_type = Business
+
     def __init__(self, name: str = ""):
         super().__init__(name)
+        self.sources: Dict[str, str] = {} # feature id -> digest of the html node / csv row it came from
 
-    def scrape(self, url: str, root_tag=["body"], target_tag=["div", "gear"]):
-        parse_tree: BeautifulSoup = scrape_html(url, root_tag)
-        for node in parse_tree.find_all(*target_tag):
-            node_id = node["id"]
-            business = Business()
-            business.load_html(node)
+    @instrument.timed()
+    def save_outlines(self, filename: str, census_places, tolerance: float = None, max_vertices: int = None, precision: int = 5) -> Dict[str, Tuple[int, int, int, int]]:
+        # the simplified census outline of every town with listings, as LocationDirectory.outlines()
+        towns = LocationDirectory(self.name, census_places)
+        for town in sorted({b.properties["town"] for b in self.features.values() if b.properties.get("town")}):
+            towns.update_feature(town, {"id": town, "name": town}, None)
+        report = towns.outlines(tolerance, max_vertices, precision)
+        towns.save_geojson(filename)
+        return report
+
+    @instrument.timed()
+    def scrape(self, url: str, root_tag=["body"], target_tag=["div", "gear"], fetcher=None, streaming=False):
+        for node_id, business in self._scrape_businesses(url, root_tag, target_tag, fetcher, streaming):
             # business.scrape_favico(folder="data/logos")
             self.features[node_id] = business
+            # digest what was extracted so both parsers produce the same fingerprints
+            self.sources[node_id] = digest(json.dumps(business.properties, sort_keys=True))
+
+    def _scrape_businesses(self, url: str, root_tag, target_tag, fetcher, streaming) -> Iterator[Tuple[str, Business]]:
+        if streaming:
+            for node_id, tags in extract_businesses(scrape(url, fetcher=fetcher), root_tag, target_tag):
+                business = Business()
+                business.load_tags(node_id, tags)
+                yield node_id, business
+        else:
+            parse_tree: BeautifulSoup = scrape_html(url, root_tag, fetcher=fetcher)
+            for node in parse_tree.find_all(*target_tag):
+                business = Business()
+                business.load_html(node)
+                yield node["id"], business
 
+    @instrument.timed()
     def load_csv(self, filename: str):
         with open(filename, "r") as f:
             for row in csv.DictReader(f):
@@ -84,40 +199,70 @@ class BusinessDirectory(FeatureDirectory):
                 business.load_csv(row)
                 b_id = business.properties.get("id")
                 self.features[b_id] = business
+                self.sources[b_id] = digest(json.dumps(row, sort_keys=True))
 
-    def load_loc_from_csv(self, filename: str):
-        name_map: Dict[str,int] = {}
-        phone_map: Dict[str,int] = {}
-        addr_map: Dict[str,int] = {}
-        with open(filename, "r") as f:
-            for row in csv.DictReader(f):
-                loc = int(re.search(r"\d+", row["LOC"]).group())
-                name = row["Business"]
-                phone = row["Phone"]
-                addr = row["Address"]
-                if addr:
-                    addr_ = addr[:-1] if addr[-1] == "." else addr + "."
-                    addr_map[addr_] = loc
-                    addr_map[addr] = loc
-                name_map[name] = loc
-                phone_map[phone] = loc
-        
-        for feature in self.features.values():
-            feature_name = feature.properties.get("mapname", None)
-            feature_phone = feature.properties.get("phone", None)
-            feature_addr = feature.properties.get("address", None)
-            if feature_name and feature_name in name_map:
-                loc = name_map[feature_name]
-            elif feature_phone and feature_phone in phone_map:
-                loc = phone_map[feature_phone]
-            elif feature_addr and feature_addr in addr_map:
-                loc = addr_map[feature_addr]
+    @instrument.timed()
+    def changed_since(self, filename: str, manifest: Manifest) -> "BusinessDirectory":
+        # Swap in the previous output for every feature whose source and inputs are unchanged
+        # and return the rest, sharing the same Business objects, for reprocessing.
+        previous = BusinessDirectory()
+        if os.path.isfile(filename):
+            previous.load_geojson(filename)
+
+        changed = BusinessDirectory(self.name)
+        feature_digests: Dict[str, str] = {}
+        for feature_id, business in self.features.items():
+            feature_digest = manifest.feature_digest(self.sources.get(feature_id, ""))
+            feature_digests[feature_id] = feature_digest
+            old = previous.features.get(feature_id)
+            if manifest.features.get(feature_id) == feature_digest and old is not None:
+                self.features[feature_id] = old
             else:
-                continue # skip feature if we can't match by name, phone or address
-            properties = {}
-            properties["loc"] = loc
-            feature.update(properties=properties)
+                # Reprocessed, e.g. on the first run without a manifest. With the same address the
+                # previous point is the starting one, geocode() only replaces it with a result.
+                if old is not None and old.geometry and old.properties.get("address") == business.properties.get("address"):
+                    business.geometry = old.geometry
+                    business.properties["address_formatted"] = old.properties.get("address_formatted", "")
+                changed.features[feature_id] = business
+        if previous.features and not manifest.features:
+            logger.info("%s: no manifest yet, every feature is reprocessed", filename)
+        removed = len(set(manifest.features) - set(feature_digests))
+        manifest.features = feature_digests
+        unchanged = len(self.features) - len(changed.features)
+        logger.info("%d new or changed, %d unchanged, %d removed", len(changed.features), unchanged, removed)
+        instrument.count("features_changed", len(changed.features))
+        instrument.count("features_unchanged", unchanged)
+        instrument.count("features_removed", removed)
+        return changed
+
+    @instrument.timed()
+    def load_loc_from_csv(self, filename: str, min_score: float = 0.8) -> Dict[str, List[Tuple]]:
+        linker = RecordLinker.load_csv(filename, min_score)
+        report = {"matches": [], "unmatched": []}
+        matched_locs = set()
+        for feature_id, feature in self.features.items():
+            properties = feature.properties
+            record = LinkRecord(
+                None, properties.get("mapname") or properties.get("name"), properties.get("phone"), properties.get("address")
+            )
+            row, score = linker.match(record)
+            if row is None:
+                continue # skip feature if no row is close enough by name, phone or address
+            feature.update(properties={"loc": row.loc})
+            matched_locs.add(row.loc)
+            report["matches"].append((feature_id, row.loc, round(score, 3)))
 
+        report["unmatched"] = [row.loc for row in linker.records if row.loc not in matched_locs]
+        for feature_id, loc, score in report["matches"]:
+            if score < 1.0:
+                logger.debug("LOC %s -> %s (%s)", loc, feature_id, score)
+        for loc in report["unmatched"]:
+            logger.info("No listing for LOC %s", loc)
+        instrument.count("loc_matched", len(report["matches"]))
+        instrument.count("loc_rows_unmatched", len(report["unmatched"]))
+        return report
+
+    @instrument.timed()
     def load_img(self, pattern: str):
         loc_map = {}
         for input_path in glob.glob(pattern):
@@ -128,7 +273,7 @@ class BusinessDirectory(FeatureDirectory):
                 priority = re.search(r"[a-zA-Z]+", file_id).group()
                 loc_map[loc] = (priority, file_stem)
             except AttributeError as e:
-                print("Error processing", file_stem, e)
+                logger.warning("Error processing %s: %s", file_stem, e)
 
         for feature in self.features.values():
             loc = feature.properties.get("loc")
@@ -136,22 +281,167 @@ class BusinessDirectory(FeatureDirectory):
                 priority, file_stem = loc_map[loc]
                 feature.properties["priority"] = priority
                 feature.properties["img"] = file_stem
+                instrument.count("logos_assigned")
 
-    def match_categories(self, categories: Dict[str, str] = {}):
-        print("Matching business categories ...")
-        for business in self.features.values():
-            business.match_category(categories)
+    def load_sprites(self, sprites: Dict[str, Dict[str, List[Any]]]):
+        # atlas coordinates of the logo assigned by load_img, per thumbnail size
+        for feature in self.features.values():
+            img = feature.properties.get("img")
+            if img in sprites:
+                feature.properties["sprite"] = sprites[img]
+
+    @instrument.timed()
+    def match_categories(self, categories: Dict[str, str] = {}) -> Dict[str, List[Tuple]]:
+        # the index is built once here instead of walking every category for every business
+        matcher = as_category_matcher(categories)
+        report = {"fuzzy": [], "unmatched": []}
+        for feature_id, business in self.features.items():
+            key, score = business.match_category(matcher)
+            name = business.properties.get("business")
+            if key is None:
+                report["unmatched"].append((feature_id, name))
+            elif score < 1.0:
+                report["fuzzy"].append((feature_id, name, key, round(score, 3)))
+        for feature_id, name, key, score in report["fuzzy"]:
+            # a guess that ends up on the published map, so it is worth a look
+            logger.info("Fuzzy category match %s: %r -> %r (%s)", feature_id, name, key, score)
+        for feature_id, name in report["unmatched"]:
+            logger.info("No category match %s: %r", feature_id, name)
+        instrument.count("categories_fuzzy", len(report["fuzzy"]))
+        instrument.count("categories_unmatched", len(report["unmatched"]))
+        return report
 
+    @instrument.timed()
     def match_towns(self, census_places: Dict[str, Any]):
-        print("Matching towns ...")
+        places = as_census_places(census_places)
         for business in self.features.values():
-            business.match_town(census_places)
+            business.match_town(places)
+        instrument.count("towns_unmatched", sum(1 for b in self.features.values() if "town" not in b.properties))
 
-    def geocode(self):
-        print("Geocoding businesses:")
+    @instrument.timed()
+    def locate_towns(self, census_places: Dict[str, Any], overwrite: bool = False):
+        places = as_census_places(census_places)
         for business in self.features.values():
-            print(f"  {business.properties.get('id')}")
-            business.geocode(self.name)
+            business.locate_town(places, overwrite)
+        instrument.count("towns_not_located", sum(1 for b in self.features.values() if "town" not in b.properties))
+
+    @instrument.timed()
+    def geocode(self, geocoder=geocode, workers: int = 1):
+        if workers <= 1:
+            for business in self.features.values():
+                logger.debug("  %s", business.properties.get("id"))
+                business.geocode(self.name, geocoder)
+        else:
+            # each business writes only its own result, so completion order doesn't matter
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                businesses = list(self.features.values())
+                geocoded = executor.map(lambda b: b.geocode(self.name, geocoder), businesses)
+                for business, _ in zip(businesses, geocoded):
+                    logger.debug("  %s", business.properties.get("id"))
+        instrument.count("geocode_no_result", sum(1 for b in self.features.values() if "address" in b.properties and not b.geometry))
+
+    @instrument.timed()
+    def geocode_batch(self, batch_geocoder=batch_geocode, geocoder=geocode) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        queries: Dict[str, str] = {}
+        for feature_id, business in self.features.items():
+            query = business.geocode_query(self.name)
+            if query:
+                queries[feature_id] = query
+
+        results = dict(zip(queries, batch_geocoder(list(queries.values())))) if queries else {}
+        for feature_id, (address_formatted, geometry) in results.items():
+            business = self.features[feature_id]
+            if geometry:
+                business.properties["address_formatted"] = address_formatted
+                business.geometry = geometry
+            else:
+                logger.info("%s: batch geocode failed, retrying", feature_id)
+                instrument.count("geocode_batch_retries")
+                business.geocode(self.name, geocoder)
+                results[feature_id] = business.properties["address_formatted"], business.geometry
+        return results
+
+    @instrument.timed()
+    def validate_geocodes(self, validator, candidate_geocoder=None, review_filename: str = "", recheck: Iterable[str] = None, workers: int = 1) -> Dict[str, Any]:
+        # Checks every geocoded point against its town's census place in one batch. Points outside
+        # the town are geocoded again for all candidates (only the ids in recheck, when given) and
+        # the best scoring candidate is kept; what stays outside goes to the review file.
+        validator = as_geocode_validator(validator)
+        businesses = [b for b in self.features.values() if b.properties.get("town") and point_of(b.geometry)]
+        distances = validator.distances([(*point_of(b.geometry), b.properties["town"]) for b in businesses])
+        outside = [(b, d) for b, d in zip(businesses, distances) if d is not None and d > validator.tolerance]
+        instrument.count("geocode_validated", sum(1 for d in distances if d is not None))
+        instrument.count("geocode_outside_town", len(outside))
+
+        fixed: Dict[str, str] = {}
+        recheck = set(recheck) if recheck is not None else None
+        retry = [(b, d) for b, d in outside if recheck is None or b.properties["id"] in recheck]
+        if candidate_geocoder and retry:
+            queries = [b.geocode_query(self.name) for b, _ in retry]
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                results = list(executor.map(candidate_geocoder, queries))
+            # all candidates of all retried businesses are scored in one batch too
+            flat = [(k, formatted, geometry) for k, candidates in enumerate(results) for formatted, geometry in candidates if point_of(geometry)]
+            candidate_distances = validator.distances([(*point_of(g), retry[k][0].properties["town"]) for k, _, g in flat])
+            best: Dict[int, Tuple[float, str, Dict[str, Any]]] = {}
+            for (k, formatted, geometry), meters in zip(flat, candidate_distances):
+                score = validator.score(meters, formatted)
+                if k not in best or score > best[k][0]:
+                    best[k] = score, formatted, geometry
+            for k, (business, meters) in enumerate(retry):
+                if k in best and best[k][0] > validator.score(meters, business.properties.get("address_formatted", "")):
+                    _, business.properties["address_formatted"], business.geometry = best[k]
+                    fixed[business.properties["id"]] = queries[k]
+            instrument.count("geocode_candidates_fixed", len(fixed))
+
+        # fixed points are checked again, a better candidate can still be outside the town
+        review = [b for b, _ in outside]
+        review_distances = [d for _, d in outside]
+        if fixed:
+            review_distances = validator.distances([(*point_of(b.geometry), b.properties["town"]) for b in review])
+            kept = [(b, d) for b, d in zip(review, review_distances) if d > validator.tolerance]
+            review, review_distances = [b for b, _ in kept], [d for _, d in kept]
+        instrument.count("geocode_review", len(review))
+        if review_filename:
+            self._save_review(review, review_distances, review_filename)
+        for b, d in zip(review, review_distances):
+            logger.debug("%s: %.0f m outside %s", b.properties["id"], d, b.properties["town"])
+        logger.info("Geocode validation: %d outside their town, %d fixed, %d to review", len(outside), len(fixed), len(review))
+        return {"validated": sum(1 for d in distances if d is not None), "fixed": fixed, "review": [b.properties["id"] for b in review]}
+
+    def _save_review(self, review: List[Business], distances: List[float], filename: str):
+        # GeoJSON, so the points can be checked on a map and moved into the corrections file
+        if not review:
+            if os.path.isfile(filename):
+                os.remove(filename)
+            return
+        features = []
+        for business, meters in zip(review, distances):
+            properties = {key: business.properties.get(key, "") for key in ["id", "mapname", "address", "town", "address_formatted"]}
+            properties["distance_m"] = round(meters)
+            features.append({"type": "Feature", "properties": properties, "geometry": business.geometry})
+        make_geojson(f"{self.name} geocode review", features, filename)
 
     def load_geojson(self, filename: str, keep_name = False):
-        super().load_geojson(filename, obj_type=Business, keep_name=keep_name)
\ No newline at end of file
+        super().load_geojson(filename, obj_type=Business, keep_name=keep_name)
+
+def load_corrected(patterns: List[str], maps: Dict[str, Tuple[str, str]] = {}) -> Iterator[Tuple[str, BusinessDirectory]]:
+    # (output filename, businesses) for every file matching patterns, in pattern order. maps is
+    # output -> (map name, corrections file), e.g. PipelineConfig.map_files(); an output and its
+    # corrections are read as one map with the corrections layered over the output by id, as
+    # correct_map does, so id-only corrections move their businesses
+    outputs = {corrections: output for output, (_, corrections) in maps.items() if corrections}
+    done = set()
+    for pattern in patterns:
+        for filename in sorted(glob.glob(pattern)):
+            output = outputs.get(filename, filename)
+            if output in done:
+                continue
+            done.add(output)
+            name, corrections = maps.get(output, ("", ""))
+            map_data = BusinessDirectory(name)
+            if os.path.isfile(output):
+                map_data.load_geojson(output, keep_name=bool(name))
+            if corrections and os.path.isfile(corrections):
+                map_data.load_geojson(corrections, keep_name=True)
+            yield output, map_data
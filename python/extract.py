@@ -0,0 +1,132 @@
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# same void elements and special string containers as BeautifulSoup's html.parser builder
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer",
+}
+STRING_CONTAINERS = {"rt", "rp", "style", "script", "template"}
+
+
+class Node:
+    __slots__ = ("tag", "attrs", "children")
+
+    def __init__(self, tag: str, attrs: Dict[str, str]):
+        self.tag = tag
+        self.attrs = attrs
+        self.children: List = []
+
+    def iter(self) -> Iterator["Node"]:
+        for child in self.children:
+            if isinstance(child, Node):
+                yield child
+                yield from child.iter()
+
+    def find(self, tag: str) -> Optional["Node"]:
+        return next((node for node in self.iter() if node.tag == tag), None)
+
+    def stripped_strings(self) -> Iterator[str]:
+        for child in self.children:
+            if isinstance(child, Node):
+                yield from child.stripped_strings()
+            else:
+                text = child.strip()
+                if text:
+                    yield text
+
+
+def _matches(tag: str, attrs: Dict[str, str], selector: List[str]) -> bool:
+    if tag != selector[0]:
+        return False
+    return len(selector) < 2 or selector[1] in attrs.get("class", "").split()
+
+
+class _Extractor(HTMLParser):
+    # One pass over the page. Only the subtrees of target nodes inside the first root node are
+    # kept, as small Node trees; everything else is tracked on the open-element stack only.
+    def __init__(self, root_tag: List[str], target_tag: List[str]):
+        super().__init__(convert_charrefs=True)
+        self.root_tag = root_tag
+        self.target_tag = target_tag
+        self.stack: List[Tuple[str, Optional[Node]]] = []
+        self.root_depth = -1 # stack depth of the open root node, -1 when outside it
+        self.root_done = False
+        self.containers = 0 # open script/style/template/... elements
+        self.targets: List[Node] = []
+
+    def _current(self) -> Optional[Node]:
+        return self.stack[-1][1] if self.stack else None
+
+    def handle_starttag(self, tag: str, attr_list):
+        attrs = {k: v if v is not None else "" for k, v in attr_list}
+        parent = self._current()
+        node = None
+        if parent is not None:
+            node = Node(tag, attrs)
+            parent.children.append(node)
+        if self.root_depth >= 0 and _matches(tag, attrs, self.target_tag):
+            if node is None:
+                node = Node(tag, attrs)
+            self.targets.append(node)
+        if tag in VOID_TAGS:
+            return
+
+        if self.root_depth < 0 and not self.root_done and _matches(tag, attrs, self.root_tag):
+            self.root_depth = len(self.stack)
+        if tag in STRING_CONTAINERS:
+            self.containers += 1
+        self.stack.append((tag, node))
+
+    def handle_endtag(self, tag: str):
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.stack[depth][0] == tag:
+                break
+        else:
+            return
+        for open_tag, _ in self.stack[depth:]:
+            if open_tag in STRING_CONTAINERS:
+                self.containers -= 1
+        del self.stack[depth:]
+        if 0 <= self.root_depth and depth <= self.root_depth:
+            self.root_depth = -1
+            self.root_done = True
+
+    def handle_data(self, data: str):
+        parent = self._current()
+        if parent is not None and not self.containers:
+            parent.children.append(data)
+
+    def unknown_decl(self, data: str):
+        if data.startswith("CDATA["):
+            self.handle_data(data[6:])
+
+
+def extract_nodes(html_content: bytes, root_tag: List[str], target_tag: List[str]) -> List[Node]:
+    parser = _Extractor(root_tag, target_tag)
+    parser.feed(html_content.decode("utf-8", errors="replace") if isinstance(html_content, bytes) else html_content)
+    parser.close()
+    return parser.targets
+
+
+def extract_businesses(html_content: bytes, root_tag=["body"], target_tag=["div", "gear"], tag_names=["p", "h3"]):
+    # (node id, [(class, stripped strings, link href)]) per listing, in the order Business.load_html reads them
+    for node in extract_nodes(html_content, root_tag, target_tag):
+        tags = {name: [] for name in tag_names}
+        for tag in node.iter():
+            if tag.tag in tags and "class" in tag.attrs and tag.attrs["class"].split():
+                attribute = tag.attrs["class"].split()[0].lower()
+                href = None
+                if attribute in ["web", "email"]:
+                    link = tag.find("a")
+                    href = link.attrs.get("href") if link else None
+                tags[tag.tag].append((attribute, list(tag.stripped_strings()), href))
+        yield node.attrs["id"], [tag for name in tag_names for tag in tags[name]]
+
+
+def extract_locations(html_content: bytes, root_tag=["div", "content"], target_tag=["article"]):
+    # (link href, stripped strings) per article, as read by Location.load_html
+    for node in extract_nodes(html_content, root_tag, target_tag):
+        link = node.find("div").find("a")
+        yield link.attrs["href"], list(node.stripped_strings())
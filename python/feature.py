@@ -1,13 +1,32 @@
 import re
-from typing import Any, Dict, List, Tuple
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urlparse
 
 from bs4 import BeautifulSoup
 
+from categories import CategoryMatcher, as_category_matcher
+from census import CensusPlaces
+from geometry import from_geojson, quantize, simplify, to_geojson
 from utils import geocode, bounding_box, address_suffix, ascii_only
 
+INTERNED_VALUES = ["business", "category", "subcategory", "town", "priority"]
+
+
+def intern_properties(properties: Dict[str, Any]) -> Dict[str, Any]:
+    # property names and the small set of repeated category/town values are shared between features
+    interned = {}
+    for key, value in properties.items():
+        key = sys.intern(key)
+        if key in INTERNED_VALUES and isinstance(value, str):
+            value = sys.intern(value)
+        interned[key] = value
+    return interned
+
 
 class Feature:
+    __slots__ = ("properties", "geometry")
+
     def __init__(self, properties: Dict[str, Any] = None, geometry: Dict[str, Any] = None):
         self.properties = properties if properties is not None else None
         self.geometry = geometry if geometry is not None else None
@@ -34,17 +53,21 @@ class Feature:
 
 
 class Location(Feature):
+    __slots__ = ()
+
     def __init__(self, properties: Dict[str, Any] = None, geometry: Dict[str, Any] = None):
         super().__init__(properties, geometry)
 
     def load_html(self, node: BeautifulSoup, data_folder: str = "data"):
-        url = node.div.a["href"]
+        self.load_link(node.div.a["href"], node.stripped_strings, data_folder)
+
+    def load_link(self, url: str, strings: Iterable[str], data_folder: str = "data"):
         filename = url.split(".")[0]
 
         year_match = re.match(r"\d{4}", filename.split("-")[-1])
 
         filename = "-".join(filename.split("-")[:-1]) if year_match else filename
-        interactive = "interactive map" in [s.lower() for s in node.stripped_strings]
+        interactive = "interactive map" in [s.lower() for s in strings]
 
         self.properties = {
             "name": filename.replace("-", " ").title(),
@@ -54,24 +77,34 @@ class Location(Feature):
             "year": int(year_match.group()) if year_match else 0,
         }
 
-    def _find_matching_geometry(self, geojson: Dict[str, Any]):
-        for feature in geojson["features"]:
-            if self.properties.get("name") in feature["properties"]["NAME"]:
-                return feature["geometry"]
-        return None
+    def _find_matching_geometry(self, places: CensusPlaces):
+        return places.find(self.properties.get("name"))
     
-    def bounding_box(self, geojson: Dict[str, Any]):
-        match = self._find_matching_geometry(geojson)
+    def bounding_box(self, places: CensusPlaces):
+        match = self._find_matching_geometry(places)
         if match:
             self.geometry = bounding_box(match)
 
-    def match_geometry(self, geojson: Dict[str, Any]):
-        match = self._find_matching_geometry(geojson)
+    def match_geometry(self, places: CensusPlaces):
+        match = self._find_matching_geometry(places)
         if match:
             self.geometry = match
 
+    def simplify_geometry(self, tolerance: float = None, max_vertices: int = None, precision: int = None) -> Tuple[int, int]:
+        # vertex count before and after
+        if not self.geometry or self.geometry.get("type") not in ["Polygon", "MultiPolygon"]:
+            return 0, 0
+        shape = from_geojson(self.geometry)
+        simplified = simplify(shape, tolerance, max_vertices)
+        if precision is not None:
+            simplified = quantize(simplified, precision)
+        self.geometry = to_geojson(simplified)
+        return len(shape), len(simplified)
+
 
 class Business(Feature):
+    __slots__ = ()
+
     def _clean_strs(list_strs: List[str]):
         text = " ".join(list_strs)
         text = text.split(":")[-1]
@@ -80,11 +113,18 @@ class Business(Feature):
     
     def _extract_tag_data(tag: BeautifulSoup) -> Tuple[str, str]:
         attribute = tag["class"][0].lower()
+        href = None
+        if attribute in ["web", "email"]:
+            link = tag.find("a")
+            if link and "href" in link.attrs:
+                href = link["href"]
+        return Business._tag_data(attribute, tag.stripped_strings, href)
+
+    def _tag_data(attribute: str, strings: Iterable[str], href: str = None) -> Tuple[str, str]:
         data = None
         if attribute in ["web", "email"]:
-            tag = tag.find("a")
-            if tag and "href" in tag.attrs and tag["href"] != "#":
-                data = tag["href"].replace("mailto:", "")
+            if href and href != "#":
+                data = href.replace("mailto:", "")
             if data and data.find("facebook.com") >= 0:
                 attribute = "facebook"
             elif data and data.find("instagram.com") >= 0:
@@ -92,7 +132,7 @@ class Business(Feature):
         else:
             if attribute in ["category"]:
                 attribute = "business"
-            data = Business._clean_strs(tag.stripped_strings)
+            data = Business._clean_strs(strings)
         return attribute, data
 
     def _extract_website(website: str) -> Dict[str, str]:
@@ -140,6 +180,15 @@ class Business(Feature):
 
             self.update(properties)
 
+    def load_tags(self, node_id: str, tags: Iterable[Tuple[str, Iterable[str], str]]):
+        # same result as load_html, from pre-extracted (class, stripped strings, link href) tuples
+        properties = {"id": node_id}
+        for attribute, strings, href in tags:
+            attrib, data = Business._tag_data(attribute.lower(), strings, href)
+            if attrib and data:
+                properties.update({attrib: data})
+        self.update(properties)
+
     def load_csv(self, row: Dict[str, Any]):
         properties = {
             "id": ascii_only(row["Business"], space=""),
@@ -160,31 +209,50 @@ class Business(Feature):
             properties.update(Business._extract_website(row["Website"]))
         self.update(properties)
 
-    def match_category(self, category_json: Dict[str, Any], default_category=""):
+    def match_category(self, categories: CategoryMatcher, default_category="") -> Tuple[Optional[str], float]:
         self.properties["category"] = default_category
         self.properties["subcategory"] = default_category
-        for k, v in category_json.items():
-            category = v.get("category")
-            subcategory = v.get("subcategory")
-            if "business" in self.properties and self.properties["business"] == k:
-                self.properties["category"] = category
-                self.properties["subcategory"] = subcategory
-                break
-
-    def match_town(self, geojson: Dict[str, Any]):
+        if "business" not in self.properties:
+            return None, 0.0
+        categories = as_category_matcher(categories)
+        key, score = categories.match(self.properties["business"])
+        if key is not None:
+            v = categories.category_json[key]
+            self.properties["category"] = v.get("category")
+            self.properties["subcategory"] = v.get("subcategory")
+        return key, score
+
+    def match_town(self, places: CensusPlaces):
         if "town" not in self.properties and "address" in self.properties:
-            for feature in geojson["features"]:
-                town = feature["properties"]["NAME"]
-                if town in address_suffix(self.properties["address"]):
+            suffix = address_suffix(self.properties["address"])
+            for town in places.names:
+                if town in suffix:
                     self.properties["town"] = town
 
-    def geocode(self, default_context=""):
+    def locate_town(self, places: CensusPlaces, overwrite: bool = False):
+        if "town" in self.properties and not overwrite:
+            return
+        if self.geometry and self.geometry.get("type") == "Point":
+            lon, lat = self.geometry["coordinates"][:2]
+            town = places.locate(lon, lat)
+            if town:
+                self.properties["town"] = town
+
+    def geocode_query(self, default_context="") -> str:
         town, state = default_context.split(",")
         if "town" in self.properties:
             town = self.properties["town"]
         if "address" in self.properties:
             address: str = self.properties["address"]
             address = address.replace("#", "No.").replace("&", "and").replace("'", "")
-            address_formatted, geometry = geocode(f"{address} {town} {state}")
-            self.properties["address_formatted"] = address_formatted
-            self.geometry = geometry
+            return f"{address} {town} {state}"
+        return ""
+
+    def geocode(self, default_context="", geocoder=geocode):
+        query = self.geocode_query(default_context)
+        if query:
+            address_formatted, geometry = geocoder(query)
+            # no result (offline, a transient miss) keeps the point the business already has
+            if geometry or not self.geometry:
+                self.properties["address_formatted"] = address_formatted
+                self.geometry = geometry
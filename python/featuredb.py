@@ -0,0 +1,245 @@
+import argparse
+import glob
+import json
+import logging
+import math
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from geojson_stream import FeatureReader
+from geometry import bounds, from_geojson
+import instrument
+from utils import make_geojson
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_DEGREE = 111320
+# properties copied into indexed columns
+COLUMNS = ["loc", "category", "subcategory", "town"]
+
+Row = Tuple[Dict[str, Any], Optional[Dict[str, Any]]]
+
+
+def _bbox(geometry: Optional[Dict[str, Any]]) -> Optional[Tuple[float, float, float, float]]:
+    if not geometry or not geometry.get("coordinates"):
+        return None
+    if geometry.get("type") == "Point":
+        x, y = geometry["coordinates"][:2]
+        return x, y, x, y
+    return bounds(from_geojson(geometry))
+
+
+class FeatureDatabase:
+    # Features of every map in one SQLite file: properties and geometry as JSON, loc, category,
+    # subcategory and town in indexed columns and each feature's bounds in an R-tree, so
+    # questions across maps are answered without loading any GeoJSON.
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(filename, check_same_thread=False, timeout=30)
+        self.db.executescript(
+            "CREATE TABLE IF NOT EXISTS maps ("
+            " name TEXT PRIMARY KEY);"
+            "CREATE TABLE IF NOT EXISTS features ("
+            " fid INTEGER PRIMARY KEY,"
+            " map TEXT NOT NULL,"
+            " id TEXT NOT NULL,"
+            " loc INTEGER,"
+            " category TEXT,"
+            " subcategory TEXT,"
+            " town TEXT,"
+            " properties TEXT NOT NULL,"
+            " geometry TEXT,"
+            " UNIQUE (map, id));"
+            "CREATE INDEX IF NOT EXISTS features_id ON features (id);"
+            "CREATE INDEX IF NOT EXISTS features_loc ON features (loc);"
+            "CREATE INDEX IF NOT EXISTS features_category ON features (category, subcategory);"
+            "CREATE INDEX IF NOT EXISTS features_town ON features (town);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS features_rtree USING rtree (fid, min_x, max_x, min_y, max_y);"
+        )
+        self.db.commit()
+
+    def _write(self, map_name: str, fid: Optional[int], feature_id: str, properties: Dict[str, Any], geometry: Optional[Dict[str, Any]]):
+        loc = properties.get("loc")
+        values = [
+            loc if isinstance(loc, int) and not isinstance(loc, bool) else None,
+            *[properties.get(key) if isinstance(properties.get(key), str) else None for key in COLUMNS[1:]],
+            json.dumps(properties),
+            json.dumps(geometry) if geometry else None,
+        ]
+        if fid is None:
+            fid = self.db.execute(
+                "INSERT INTO features (map, id, loc, category, subcategory, town, properties, geometry) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (map_name, feature_id, *values),
+            ).lastrowid
+        else:
+            self.db.execute(
+                "UPDATE features SET loc = ?, category = ?, subcategory = ?, town = ?, properties = ?, geometry = ? WHERE fid = ?",
+                (*values, fid),
+            )
+            self.db.execute("DELETE FROM features_rtree WHERE fid = ?", (fid,))
+        box = _bbox(geometry)
+        if box:
+            x0, y0, x1, y1 = box
+            self.db.execute("INSERT INTO features_rtree VALUES (?, ?, ?, ?, ?)", (fid, x0, x1, y0, y1))
+
+    @instrument.timed("featuredb_upsert")
+    def upsert(self, map_name: str, features: Iterable[Row], merge: bool = True) -> int:
+        # In one transaction. With merge, an existing feature's properties and geometry are
+        # updated key by key like FeatureDirectory.load_geojson does with corrections; without,
+        # the feature is replaced.
+        count = 0
+        with self.lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO maps VALUES (?)", (map_name,))
+            for properties, geometry in features:
+                feature_id = (properties or {}).get("id", None)
+                if not feature_id:
+                    continue
+                row = self.db.execute("SELECT fid, properties, geometry FROM features WHERE map = ? AND id = ?", (map_name, feature_id)).fetchone()
+                fid = None
+                if row is not None:
+                    fid, old_properties, old_geometry = row
+                    if merge:
+                        properties = {**json.loads(old_properties), **properties}
+                        if old_geometry and geometry:
+                            geometry = {**json.loads(old_geometry), **geometry}
+                        elif old_geometry:
+                            geometry = json.loads(old_geometry)
+                self._write(map_name, fid, feature_id, properties, geometry)
+                count += 1
+        return count
+
+    def load_geojson(self, filename: str, map_name: str = "") -> str:
+        # corrections pass the name of the map they correct, outputs are stored under their own name
+        reader = FeatureReader(filename)
+        features = ((feature.get("properties", {}), feature.get("geometry", {})) for feature in reader)
+        if map_name:
+            count = self.upsert(map_name, features)
+        else:
+            # the name member may come after the features, so they are read first
+            rows = list(features)
+            map_name = reader.members.get("name") or filename
+            count = self.upsert(map_name, rows)
+        logger.info("%s: %d features into %s", filename, count, map_name)
+        return map_name
+
+    def save_directory(self, directory) -> int:
+        # the map becomes exactly the directory's features, listings that were dropped are deleted
+        count = self.upsert(directory.name, ((f.properties, f.geometry) for f in directory.features.values()), merge=False)
+        with self.lock, self.db:
+            stale = [fid for fid, feature_id in self.db.execute("SELECT fid, id FROM features WHERE map = ?", (directory.name,)) if feature_id not in directory.features]
+            self.db.executemany("DELETE FROM features WHERE fid = ?", [(fid,) for fid in stale])
+            self.db.executemany("DELETE FROM features_rtree WHERE fid = ?", [(fid,) for fid in stale])
+        return count
+
+    def to_directory(self, map_name: str, directory):
+        # fills a (Business/Location/Feature)Directory so the pipeline stages can run on it
+        for properties, geometry in self.rows("map = ?", (map_name,)):
+            directory.update_feature(properties["id"], properties, geometry)
+        if not directory.name:
+            directory.name = map_name
+        return directory
+
+    def rows(self, where: str = "1", params: Tuple = ()) -> Iterator[Row]:
+        with self.lock:
+            rows = self.db.execute(f"SELECT properties, geometry FROM features WHERE {where} ORDER BY fid", params).fetchall()
+        for properties, geometry in rows:
+            yield json.loads(properties), json.loads(geometry) if geometry else None
+
+    def features(self, map_name: str = None, category: str = None, subcategory: str = None, town: str = None, loc: int = None, missing: str = None) -> List[Dict[str, Any]]:
+        # e.g. features(category="eat_and_drink"), features(map_name="Hicksville, NY", missing="img")
+        where, params = ["1"], []
+        for column, value in [("map", map_name), ("category", category), ("subcategory", subcategory), ("town", town), ("loc", loc)]:
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if missing:
+            where.append("json_extract(properties, ?) IS NULL")
+            params.append(f'$."{missing}"')
+        return [{"type": "Feature", "properties": p, "geometry": g} for p, g in self.rows(" AND ".join(where), tuple(params))]
+
+    def near(self, lon: float, lat: float, meters: float, category: str = None, map_name: str = None) -> List[Tuple[float, Dict[str, Any]]]:
+        # (meters, feature) of the points within that distance, nearest first; the R-tree
+        # narrows it down to a box and the distance is checked on what's in it
+        kx = math.cos(math.radians(lat))
+        dy = meters / METERS_PER_DEGREE
+        dx = dy / kx
+        where = "fid IN (SELECT fid FROM features_rtree WHERE min_x <= ? AND max_x >= ? AND min_y <= ? AND max_y >= ?)"
+        params: List[Any] = [lon + dx, lon - dx, lat + dy, lat - dy]
+        if category is not None:
+            where += " AND category = ?"
+            params.append(category)
+        if map_name is not None:
+            where += " AND map = ?"
+            params.append(map_name)
+        result = []
+        for properties, geometry in self.rows(where, tuple(params)):
+            if geometry.get("type") != "Point":
+                continue
+            x, y = geometry["coordinates"][:2]
+            d = math.hypot((x - lon) * kx, y - lat) * METERS_PER_DEGREE
+            if d <= meters:
+                result.append((d, {"type": "Feature", "properties": properties, "geometry": geometry}))
+        result.sort(key=lambda item: item[0])
+        return result
+
+    def save_geojson(self, map_name: str, filename: str, compact: bool = False, precision: int = None):
+        # same output as BusinessDirectory.save_geojson, so the front end reads it unchanged
+        features = ({"type": "Feature", "properties": p, "geometry": g} for p, g in self.rows("map = ?", (map_name,)))
+        make_geojson(map_name, features, filename, compact, precision)
+
+    def maps(self) -> List[str]:
+        with self.lock:
+            return [name for name, in self.db.execute("SELECT name FROM maps ORDER BY name")]
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and maintain the SQLite store of every map's features")
+    parser.add_argument("--db", default="data/features.sqlite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("load", help="upsert .geojson outputs, then corrections into their map")
+    load.add_argument("patterns", nargs="+")
+    load.add_argument("--map", default="", help="map the files correct, e.g. 'Long Beach, NY'")
+    export = commands.add_parser("export", help="write a map back to GeoJSON")
+    export.add_argument("map")
+    export.add_argument("filename")
+    near = commands.add_parser("near", help="features within --radius meters of a point")
+    near.add_argument("lon", type=float)
+    near.add_argument("lat", type=float)
+    near.add_argument("--radius", type=float, default=1000)
+    near.add_argument("--category", default=None)
+    missing = commands.add_parser("missing", help="LOC ids whose features lack a property, e.g. img")
+    missing.add_argument("property")
+    missing.add_argument("--map", default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = FeatureDatabase(args.db)
+    if args.command == "load":
+        for pattern in args.patterns:
+            for filename in sorted(glob.glob(pattern)):
+                db.load_geojson(filename, args.map)
+    elif args.command == "export":
+        db.save_geojson(args.map, args.filename)
+    elif args.command == "near":
+        for d, feature in db.near(args.lon, args.lat, args.radius, args.category):
+            properties = feature["properties"]
+            print(f"  {d:7.0f} m  {properties['id']}  {properties.get('category', '')}  {properties.get('town', '')}")
+    elif args.command == "missing":
+        for feature in db.features(map_name=args.map, missing=args.property):
+            properties = feature["properties"]
+            print(f"  {properties.get('loc', '')}  {properties['id']}")
+    print(f"{len(db)} features in {len(db.maps())} maps in {args.db}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
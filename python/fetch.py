@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import WINDOWS_CHROME
+
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+
+def make_session(pool_size: int = 10, retries: int = 0, backoff: float = 0.5) -> requests.Session:
+    # Without retries, 429 and 5xx responses are returned as they are so callers that retry
+    # themselves (GeocodeEngine) see the HTTPError and its Retry-After. Once retries run out the
+    # last response is returned too, raise_for_status turns it into an HTTPError.
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUS if retries else (),
+        allowed_methods=["GET", "HEAD"],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate # tokens per second, 0 = unlimited
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class OfflineMiss(KeyError):
+    pass
+
+
+class Fetcher:
+    # GETs through a pooled session with an on-disk response cache. Cached pages are revalidated
+    # with ETag/Last-Modified, served as-is while younger than max_age, or replayed without any
+    # network access when offline. With a rate, requests to each host are spaced out to at most
+    # that many per second; cache hits don't count.
+    def __init__(
+        self,
+        cache_dir: str = "data/http_cache",
+        user_agent: str = WINDOWS_CHROME,
+        timeout: float = 30,
+        retries: int = 3,
+        max_age: float = 0,
+        offline: bool = False,
+        pool_size: int = 10,
+        rate: float = 0,
+    ):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.max_age = max_age
+        self.offline = offline
+        self.session = make_session(pool_size, retries)
+        self.session.headers.update({"User-Agent": user_agent})
+        self.stats = {"requests": 0, "not_modified": 0, "cached": 0}
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.buckets: Dict[str, TokenBucket] = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + ext)
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir or not os.path.isfile(self._path(url, ".json")):
+            return None
+        with open(self._path(url, ".json"), "r") as f:
+            meta = json.load(f)
+        with open(self._path(url, ".body"), "rb") as f:
+            meta["content"] = f.read()
+        return meta
+
+    def _store(self, url: str, response: requests.Response):
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched": time.time(),
+        }
+        for ext, data, mode in [(".body", response.content, "wb"), (".json", json.dumps(meta, indent=4), "w")]:
+            path = self._path(url, ext)
+            with open(path + ".tmp", mode) as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+
+    def _touch(self, url: str, cached: Dict[str, Any]):
+        meta = {k: v for k, v in cached.items() if k != "content"}
+        meta["fetched"] = time.time()
+        with open(self._path(url, ".json"), "w") as f:
+            json.dump(meta, f, indent=4)
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate)
+            return self.buckets[host]
+
+    def _count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def get(self, url: str) -> bytes:
+        cached = self._load(url)
+        if self.offline:
+            if cached is None:
+                raise OfflineMiss(f"{url} is not in the page cache {self.cache_dir}")
+            self._count("cached")
+            return cached["content"]
+        if cached and self.max_age and time.time() - cached["fetched"] < self.max_age:
+            self._count("cached")
+            return cached["content"]
+
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        self._bucket(url).acquire()
+        self._count("requests")
+        r = self.session.get(url, headers=headers, timeout=self.timeout)
+        if r.status_code == 304 and cached:
+            self._count("not_modified")
+            self._touch(url, cached)
+            return cached["content"]
+        r.raise_for_status()
+        if self.cache_dir:
+            self._store(url, r)
+        return r.content
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,209 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import PipelineConfig
+from directory import BusinessDirectory, load_corrected
+from utils import batch_geocode, geocode, geocode_candidates
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class GeocodeCache:
+    def __init__(
+        self,
+        filename: str,
+        geocoder=geocode,
+        ttl: float = 0,
+        offline: bool = False,
+        batch_geocoder=batch_geocode,
+        candidate_geocoder=geocode_candidates,
+        negative_ttl: float = 86400,
+    ):
+        self.filename = filename
+        self.geocoder = geocoder
+        self.batch_geocoder = batch_geocoder
+        self.candidate_geocoder = candidate_geocoder
+        self.ttl = ttl # seconds, 0 = entries never expire
+        # no-result answers are often transient (rate limits, outages), so they are asked again
+        # after negative_ttl seconds; 0 = they are not cached at all
+        self.negative_ttl = negative_ttl
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(filename, check_same_thread=False, timeout=30)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " query TEXT PRIMARY KEY,"
+            " address_formatted TEXT NOT NULL,"
+            " geometry TEXT,"
+            " timestamp REAL NOT NULL)"
+        )
+        # every match of a query, for geocode validation; a JSON list of [address_formatted, geometry]
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS candidates ("
+            " query TEXT PRIMARY KEY,"
+            " results TEXT NOT NULL,"
+            " timestamp REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def get(self, query: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT address_formatted, geometry, timestamp FROM geocode WHERE query = ?",
+                (normalize_query(query),),
+            ).fetchone()
+        if row is None:
+            return None
+        address_formatted, geometry, timestamp = row
+        if self._expired(timestamp, bool(geometry)):
+            return None
+        return address_formatted, json.loads(geometry) if geometry else None
+
+    def _expired(self, timestamp: float, found: bool) -> bool:
+        age = time.time() - timestamp
+        if not found and age > self.negative_ttl:
+            return True
+        return bool(self.ttl) and age > self.ttl
+
+    def put(self, query: str, address_formatted: str, geometry: Dict[str, Any], timestamp: float = None):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?)",
+                (
+                    normalize_query(query),
+                    address_formatted or "",
+                    json.dumps(geometry) if geometry else None,
+                    timestamp if timestamp is not None else time.time(),
+                ),
+            )
+            self.db.commit()
+
+    def geocode(self, query: str) -> Tuple[str, Dict[str, Any]]:
+        cached = self.get(query)
+        with self.lock:
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+        if self.offline:
+            return "", None
+        address_formatted, geometry = self.geocoder(query)
+        if geometry or self.negative_ttl:
+            self.put(query, address_formatted, geometry)
+        return address_formatted, geometry
+
+    def candidates(self, query: str) -> List[Tuple[str, Dict[str, Any]]]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT results, timestamp FROM candidates WHERE query = ?", (normalize_query(query),)
+            ).fetchone()
+            if row is not None and not self._expired(row[1], row[0] != "[]"):
+                self.hits += 1
+                return [(address_formatted, geometry) for address_formatted, geometry in json.loads(row[0])]
+            self.misses += 1
+        if self.offline:
+            return []
+        results = self.candidate_geocoder(query)
+        if not results and not self.negative_ttl:
+            return results
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO candidates VALUES (?, ?, ?)",
+                (normalize_query(query), json.dumps(results), time.time()),
+            )
+            self.db.commit()
+        return results
+
+    def batch_geocode(self, queries: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        results = [self.get(query) for query in queries]
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        with self.lock:
+            self.hits += len(queries) - len(missing)
+            self.misses += len(missing)
+        if self.offline or not missing:
+            return [cached or ("", None) for cached in results]
+
+        for i, (address_formatted, geometry) in zip(missing, self.batch_geocoder([queries[i] for i in missing])):
+            results[i] = address_formatted, geometry
+            if geometry: # failed items are retried one at a time and cached then
+                self.put(queries[i], address_formatted, geometry)
+        return results
+
+    def expire(self) -> int:
+        now = time.time()
+        count = 0
+        with self.lock:
+            count += self.db.execute("DELETE FROM geocode WHERE geometry IS NULL AND timestamp < ?", (now - self.negative_ttl,)).rowcount
+            self.db.execute("DELETE FROM candidates WHERE results = '[]' AND timestamp < ?", (now - self.negative_ttl,))
+            if self.ttl:
+                count += self.db.execute("DELETE FROM geocode WHERE timestamp < ?", (now - self.ttl,)).rowcount
+                self.db.execute("DELETE FROM candidates WHERE timestamp < ?", (now - self.ttl,))
+            self.db.commit()
+        return count
+
+    def seed(self, map_data: BusinessDirectory, default_context: str = "") -> int:
+        # the queries the pipeline would send for these businesses, answered with their points
+        context = map_data.name if "," in map_data.name else default_context
+        if "," not in context:
+            logger.warning("%s: no 'Town, ST' context, skipped", map_data.name or "unnamed map")
+            return 0
+        count = 0
+        for business in map_data.features.values():
+            if not business.geometry or not business.geometry.get("coordinates"):
+                continue
+            query = business.geocode_query(context)
+            if query:
+                self.put(query, business.properties.get("address_formatted", ""), business.geometry)
+                count += 1
+        return count
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the persistent geocode cache")
+    parser.add_argument("--cache", default="data/geocode_cache.sqlite")
+    parser.add_argument("--ttl", type=float, default=0)
+    parser.add_argument("--negative-ttl", type=float, default=86400, help="seconds no-result answers are kept")
+    commands = parser.add_subparsers(dest="command", required=True)
+    seed = commands.add_parser("seed", help="pre-seed the cache from .geojson outputs/corrections")
+    seed.add_argument("patterns", nargs="+")
+    seed.add_argument("--config", default="maps.json", help="map names and corrections of the outputs")
+    seed.add_argument("--context", default="", help="'Town, ST' for files that are not in the config and not named after their map")
+    commands.add_parser("expire", help="drop entries older than --ttl and no-result entries older than --negative-ttl")
+    commands.add_parser("stats", help="print the number of cached queries")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    cache = GeocodeCache(args.cache, ttl=args.ttl, offline=True, negative_ttl=args.negative_ttl)
+    if args.command == "seed":
+        # a map's corrections are seeded layered over its output, with the map's name as context
+        maps = PipelineConfig(args.config).map_files() if os.path.isfile(args.config) else {}
+        for filename, map_data in load_corrected(args.patterns, maps):
+            print(f"  {filename}: {cache.seed(map_data, args.context)} queries")
+    elif args.command == "expire":
+        print(f"  Expired {cache.expire()} queries")
+    print(f"{len(cache)} queries in {args.cache}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
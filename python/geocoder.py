@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import requests
+
+from fetch import RETRY_STATUS, TokenBucket, make_session
+from utils import GEOAPIFY_BATCH_URL, GEOAPIFY_URL, batch_geocode, geocode, geocode_candidates
+
+
+class GeocodeEngine:
+    def __init__(
+        self,
+        url: str = GEOAPIFY_URL,
+        api_key_env: str = "GEOAPIFY_API_KEY",
+        rate: float = 5,
+        workers: int = 8,
+        retries: int = 5,
+        backoff: float = 0.5,
+        timeout: float = 10,
+        batch_url: str = GEOAPIFY_BATCH_URL,
+    ):
+        self.url = url
+        self.batch_url = batch_url
+        self.api_key_env = api_key_env
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate)
+        self.session = make_session(workers)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def _retry_delay(self, response: requests.Response, attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * 2 ** attempt
+
+    def _request(self, fn, query: str):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            with self.lock:
+                self.requests += 1
+            try:
+                return fn(query, self.api_key_env, self.session, self.url, self.timeout)
+            except requests.HTTPError as e:
+                if e.response.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    raise
+                time.sleep(self._retry_delay(e.response, attempt))
+            except requests.ConnectionError:
+                if attempt >= self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    def geocode(self, query: str) -> Tuple[str, Dict[str, Any]]:
+        return self._request(geocode, query)
+
+    def candidates(self, query: str) -> List[Tuple[str, Dict[str, Any]]]:
+        return self._request(geocode_candidates, query)
+
+    def batch_geocode(self, queries: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        self.bucket.acquire()
+        with self.lock:
+            self.requests += 1
+        return batch_geocode(queries, self.api_key_env, self.session, self.batch_url, timeout=self.timeout)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,142 @@
+import json
+import os
+from typing import Any, Dict, Iterator
+
+WHITESPACE = " \t\n\r"
+
+
+class FeatureReader:
+    # Incremental reader for a GeoJSON FeatureCollection: features are decoded one at a time,
+    # the other top-level members are collected in self.members as they are passed
+    def __init__(self, filename: str, chunk_size: int = 1 << 16):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.members: Dict[str, Any] = {}
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+        if self.pos > len(self.buf) // 2:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        c = self._peek()
+        if not c or c not in chars:
+            raise ValueError(f"{self.filename}: expected one of {chars!r} at offset {self.pos}, got {c!r}")
+        self.pos += 1
+        return c
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a number cut off at the end of the buffer decodes without error, so make
+                # sure the next delimiter has been read before accepting the value
+                if end < len(self.buf) or not self._fill():
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        self.buf, self.pos = "", 0
+        with open(self.filename, "r") as self.file:
+            self._expect("{")
+            if self._peek() == "}":
+                return
+            while True:
+                key = self._value()
+                self._expect(":")
+                if key == "features":
+                    self._expect("[")
+                    if self._peek() == "]":
+                        self.pos += 1
+                    else:
+                        while True:
+                            yield self._value()
+                            if self._expect(",]") == "]":
+                                break
+                else:
+                    self.members[key] = self._value()
+                if self._expect(",}") == "}":
+                    break
+
+
+def _round_coordinates(coordinates: Any, precision: int) -> Any:
+    if isinstance(coordinates, list):
+        return [_round_coordinates(c, precision) for c in coordinates]
+    if isinstance(coordinates, float):
+        return round(coordinates, precision)
+    return coordinates
+
+
+class FeatureWriter:
+    # Writes a FeatureCollection one feature at a time. The pretty layout is byte-for-byte
+    # what json.dump(indent=4, ensure_ascii=False) produces for the whole document; the
+    # compact layout is minified JSON with one feature per line. The document is written next to
+    # filename and only replaces it once closed, so an error halfway leaves the old file as it was.
+    def __init__(self, filename: str, members: Dict[str, Any], compact: bool = False, precision: int = None):
+        self.filename = filename
+        self.compact = compact
+        self.precision = precision
+        self.count = 0
+        self.file = open(filename + ".tmp", "w")
+        self.file.write("{")
+        for key, value in members.items():
+            member = self._dump({key: value})[1:-1].strip("\n")
+            self.file.write(member.lstrip() if compact else "\n" + member)
+            self.file.write(",")
+        self.file.write('"features":[' if compact else '\n    "features": [')
+
+    def _dump(self, value: Any) -> str:
+        if self.compact:
+            return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        return json.dumps(value, indent=4, ensure_ascii=False)
+
+    def write(self, feature: Dict[str, Any]):
+        geometry = feature.get("geometry")
+        if self.precision is not None and geometry and "coordinates" in geometry:
+            geometry = dict(geometry, coordinates=_round_coordinates(geometry["coordinates"], self.precision))
+            feature = dict(feature, geometry=geometry)
+        text = self._dump(feature)
+        if not self.compact:
+            text = text.replace("\n", "\n        ")
+        self.file.write(("," if self.count else "") + ("\n" if self.compact else "\n        ") + text)
+        self.count += 1
+
+    def close(self):
+        if self.compact:
+            self.file.write("\n]}\n" if self.count else "]}\n")
+        else:
+            self.file.write(("\n    ]" if self.count else "]") + "\n}")
+        self.file.close()
+        os.replace(self.filename + ".tmp", self.filename)
+
+    def discard(self):
+        self.file.close()
+        os.remove(self.filename + ".tmp")
+
+    def __enter__(self) -> "FeatureWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
@@ -0,0 +1,317 @@
+import bisect
+import math
+from array import array
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+BBox = Tuple[float, float, float, float]
+
+
+class Shape:
+    # Flat float64 coordinates [x0, y0, x1, y1, ...]. Ring i spans points rings[i]:rings[i+1],
+    # part j (one polygon of a MultiPolygon) spans rings parts[j]:parts[j+1].
+    __slots__ = ("type", "coords", "rings", "parts")
+
+    def __init__(self, geo_type: str, coords, rings, parts):
+        self.type = geo_type
+        self.coords = coords
+        self.rings = rings
+        self.parts = parts
+
+    def ring(self, i: int):
+        start, end = self.rings[i], self.rings[i + 1]
+        return self.coords[2 * start:2 * end:2], self.coords[2 * start + 1:2 * end:2]
+
+    def __len__(self) -> int:
+        return len(self.coords) // 2
+
+
+def _polygons(geometry: Dict[str, Any]):
+    geo_type = geometry.get("type")
+    coordinates = geometry.get("coordinates", [])
+    if geo_type == "Point":
+        return [[[coordinates]]]
+    if geo_type in ["MultiPoint", "LineString"]:
+        return [[coordinates]]
+    if geo_type in ["Polygon", "MultiLineString"]:
+        return [coordinates]
+    if geo_type == "MultiPolygon":
+        return coordinates
+    raise NotImplementedError(geo_type)
+
+
+def from_geojson(geometry: Dict[str, Any]) -> Shape:
+    coords, rings, parts = array("d"), array("q", [0]), array("q", [0])
+    for poly in _polygons(geometry):
+        for ring in poly:
+            for pt in ring:
+                coords.append(pt[0])
+                coords.append(pt[1])
+            rings.append(len(coords) // 2)
+        parts.append(len(rings) - 1)
+    return Shape(geometry.get("type"), coords, rings, parts)
+
+
+def to_geojson(shape: Shape) -> Dict[str, Any]:
+    polygons = []
+    for j in range(len(shape.parts) - 1):
+        poly = []
+        for i in range(shape.parts[j], shape.parts[j + 1]):
+            xs, ys = shape.ring(i)
+            poly.append([[x, y] for x, y in zip(xs, ys)])
+        polygons.append(poly)
+
+    if shape.type == "Point":
+        coordinates = polygons[0][0][0]
+    elif shape.type in ["MultiPoint", "LineString"]:
+        coordinates = polygons[0][0]
+    elif shape.type in ["Polygon", "MultiLineString"]:
+        coordinates = polygons[0]
+    else:
+        coordinates = polygons
+    return {"type": shape.type, "coordinates": coordinates}
+
+
+def bounds(shape: Shape) -> BBox:
+    xs, ys = shape.coords[0::2], shape.coords[1::2]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _ring_moments(xs, ys) -> Tuple[float, float, float]:
+    # shoelace sums: signed area (positive for counter-clockwise rings) and its first moments
+    a = mx = my = 0.0
+    for x0, y0, x1, y1 in zip(xs, ys, chain(xs[1:], xs[:1]), chain(ys[1:], ys[:1])):
+        cross = x0 * y1 - x1 * y0
+        a += cross
+        mx += (x0 + x1) * cross
+        my += (y0 + y1) * cross
+    return a / 2, mx / 6, my / 6
+
+
+def _signed_rings(shape: Shape):
+    # outer rings count positive and holes negative, whatever their winding in the source
+    for j in range(len(shape.parts) - 1):
+        first = shape.parts[j]
+        for i in range(first, shape.parts[j + 1]):
+            a, mx, my = _ring_moments(*shape.ring(i))
+            sign = 1 if (a >= 0) == (i == first) else -1
+            yield sign * a, sign * mx, sign * my
+
+
+def area(shape: Shape) -> float:
+    if shape.type not in ["Polygon", "MultiPolygon"]:
+        return 0.0
+    return sum(a for a, _, _ in _signed_rings(shape))
+
+
+def centroid(shape: Shape) -> Tuple[float, float]:
+    if shape.type in ["Polygon", "MultiPolygon"]:
+        sum_a = sum_x = sum_y = 0.0
+        for a, mx, my in _signed_rings(shape):
+            sum_a += a
+            sum_x += mx
+            sum_y += my
+        if sum_a:
+            return sum_x / sum_a, sum_y / sum_a
+    n = len(shape)
+    return sum(shape.coords[0::2]) / n, sum(shape.coords[1::2]) / n
+
+
+def contains(shape: Shape, x: float, y: float) -> bool:
+    if shape.type not in ["Polygon", "MultiPolygon"]:
+        return False
+    # even-odd rule over the rings of each polygon, so holes are excluded
+    for j in range(len(shape.parts) - 1):
+        inside = False
+        for i in range(shape.parts[j], shape.parts[j + 1]):
+            xs, ys = shape.ring(i)
+            x0, y0 = xs[-1], ys[-1]
+            for x1, y1 in zip(xs, ys):
+                if (y1 > y) != (y0 > y) and x < (x0 - x1) * (y - y1) / (y0 - y1) + x1:
+                    inside = not inside
+                x0, y0 = x1, y1
+        if inside:
+            return True
+    return False
+
+
+def contains_many(shape: Shape, xs: List[float], ys: List[float]) -> List[bool]:
+    # contains() for many points at once: points are sorted by y, so each edge only visits the
+    # points in its y-range instead of every edge visiting every point
+    inside = [False] * len(xs)
+    if shape.type not in ["Polygon", "MultiPolygon"] or not xs:
+        return inside
+    order = sorted(range(len(ys)), key=ys.__getitem__)
+    sorted_ys = [ys[k] for k in order]
+    for j in range(len(shape.parts) - 1):
+        part_inside = [False] * len(xs)
+        for i in range(shape.parts[j], shape.parts[j + 1]):
+            rxs, rys = shape.ring(i)
+            x0, y0 = rxs[-1], rys[-1]
+            for x1, y1 in zip(rxs, rys):
+                if y0 != y1:
+                    # the points with min(y0, y1) <= y < max(y0, y1), as in contains()
+                    lo = bisect.bisect_left(sorted_ys, min(y0, y1))
+                    hi = bisect.bisect_left(sorted_ys, max(y0, y1))
+                    for k in order[lo:hi]:
+                        if xs[k] < (x0 - x1) * (ys[k] - y1) / (y0 - y1) + x1:
+                            part_inside[k] = not part_inside[k]
+                x0, y0 = x1, y1
+        inside = [a or b for a, b in zip(inside, part_inside)]
+    return inside
+
+
+def distance(shape: Shape, x: float, y: float, kx: float = 1.0) -> float:
+    # distance from a point to the nearest edge or vertex; x distances are scaled by kx
+    # (cos(latitude) turns degrees of longitude into degrees of latitude)
+    best = math.inf
+    for i in range(len(shape.rings) - 1):
+        xs, ys = shape.ring(i)
+        if len(xs) == 1:
+            best = min(best, math.hypot((xs[0] - x) * kx, ys[0] - y))
+            continue
+        for x0, y0, x1, y1 in zip(xs, ys, xs[1:], ys[1:]):
+            dx, dy = (x1 - x0) * kx, y1 - y0
+            px, py = (x - x0) * kx, y - y0
+            length2 = dx * dx + dy * dy
+            t = min(max((px * dx + py * dy) / length2, 0.0), 1.0) if length2 else 0.0
+            best = min(best, math.hypot(px - t * dx, py - t * dy))
+    return best
+
+
+def _significance(xs, ys, closed: bool) -> List[float]:
+    # Douglas-Peucker run to the end: each vertex gets the squared distance at which it would be
+    # kept, capped by its parent's, so every tolerance (or vertex budget) is a plain threshold.
+    n = len(xs)
+    sig = [0.0] * n
+    sig[0] = sig[n - 1] = math.inf
+    stack = [(0, n - 1, math.inf)]
+    while stack:
+        first, last, limit = stack.pop()
+        if last - first < 2:
+            continue
+        x0, y0, dx, dy = xs[first], ys[first], xs[last] - xs[first], ys[last] - ys[first]
+        length2 = dx * dx + dy * dy
+        index, dmax = first + 1, -1.0
+        for i in range(first + 1, last):
+            px, py = xs[i] - x0, ys[i] - y0
+            t = min(max((px * dx + py * dy) / length2, 0.0), 1.0) if length2 else 0.0
+            d = (px - t * dx) ** 2 + (py - t * dy) ** 2
+            if d > dmax:
+                index, dmax = i, d
+        d = min(dmax, limit)
+        sig[index] = d
+        stack.append((first, index, d))
+        stack.append((index, last, d))
+    if closed and n >= 4:
+        # a ring keeps at least 3 distinct vertices
+        for i in sorted(range(1, n - 1), key=lambda i: -sig[i])[:2]:
+            sig[i] = math.inf
+    return sig
+
+
+def _rebuild(shape: Shape, rings) -> Shape:
+    # rings: per part, the list of (xs, ys) rings to keep
+    coords, ring_index, parts = array("d"), array("q", [0]), array("q", [0])
+    for part in rings:
+        if not part:
+            continue
+        for xs, ys in part:
+            for x, y in zip(xs, ys):
+                coords.append(x)
+                coords.append(y)
+            ring_index.append(len(coords) // 2)
+        parts.append(len(ring_index) - 1)
+    return Shape(shape.type, coords, ring_index, parts)
+
+
+def simplify(shape: Shape, tolerance: float = None, max_vertices: int = None) -> Shape:
+    # tolerance is a distance in coordinate units (degrees for census places); max_vertices
+    # keeps the most significant vertices of the whole shape up to that budget
+    if shape.type in ["Point", "MultiPoint"]:
+        return shape
+    closed = shape.type in ["Polygon", "MultiPolygon"]
+    sigs = [_significance(*shape.ring(i), closed) for i in range(len(shape.rings) - 1)]
+    threshold = tolerance * tolerance if tolerance is not None else 0.0
+    if max_vertices is not None:
+        ranked = sorted((s for sig in sigs for s in sig), reverse=True)
+        if len(ranked) > max_vertices:
+            threshold = max(threshold, ranked[max_vertices])
+
+    rings = []
+    for j in range(len(shape.parts) - 1):
+        part = []
+        for i in range(shape.parts[j], shape.parts[j + 1]):
+            xs, ys = shape.ring(i)
+            keep = [k for k, s in enumerate(sigs[i]) if s > threshold or s == math.inf or not threshold]
+            part.append(([xs[k] for k in keep], [ys[k] for k in keep]))
+        rings.append(part)
+    return _rebuild(shape, rings)
+
+
+def quantize(shape: Shape, precision: int) -> Shape:
+    # rounds to a fixed number of decimals and drops the repeated vertices this creates;
+    # polygon holes that collapse are dropped, outer rings are only rounded
+    closed = shape.type in ["Polygon", "MultiPolygon"]
+    rings = []
+    for j in range(len(shape.parts) - 1):
+        part = []
+        for i in range(shape.parts[j], shape.parts[j + 1]):
+            xs, ys = [[round(c, precision) for c in cs] for cs in shape.ring(i)]
+            points = [(x, y) for k, (x, y) in enumerate(zip(xs, ys)) if k == 0 or (x, y) != (xs[k - 1], ys[k - 1])]
+            if closed and len(points) < 4:
+                if i != shape.parts[j]:
+                    continue
+                points = list(zip(xs, ys))
+            part.append(([x for x, _ in points], [y for _, y in points]))
+        rings.append(part)
+    return _rebuild(shape, rings)
+
+
+def _clip_ring(points: List[Tuple[float, float]], box: BBox) -> List[Tuple[float, float]]:
+    # Sutherland-Hodgman against each side of the box; points is an open ring (no closing vertex)
+    min_x, min_y, max_x, max_y = box
+    for axis, limit, keep_below in [(0, min_x, False), (0, max_x, True), (1, min_y, False), (1, max_y, True)]:
+        clipped = []
+        for k, current in enumerate(points):
+            previous = points[k - 1]
+            current_in = (current[axis] <= limit) if keep_below else (current[axis] >= limit)
+            previous_in = (previous[axis] <= limit) if keep_below else (previous[axis] >= limit)
+            if current_in != previous_in:
+                t = (limit - previous[axis]) / (current[axis] - previous[axis])
+                crossing = [previous[0] + t * (current[0] - previous[0]), previous[1] + t * (current[1] - previous[1])]
+                crossing[axis] = limit
+                clipped.append(tuple(crossing))
+            if current_in:
+                clipped.append(current)
+        points = clipped
+        if not points:
+            break
+    return points
+
+
+def clip(shape: Shape, box: BBox) -> Optional[Shape]:
+    # the part of a Polygon/MultiPolygon inside box, None if nothing is; a polygon whose outer
+    # ring is clipped away is dropped with its holes, as is one whose holes now cover all of it
+    rings = []
+    for j in range(len(shape.parts) - 1):
+        part, areas = [], []
+        for i in range(shape.parts[j], shape.parts[j + 1]):
+            xs, ys = shape.ring(i)
+            points = _clip_ring(list(zip(xs, ys))[:-1], box)
+            if points:
+                points.append(points[0])
+            ring = ([x for x, _ in points], [y for _, y in points])
+            # a ring that only touches the box has no area left
+            a = abs(_ring_moments(*ring)[0]) if len(set(points)) >= 3 else 0.0
+            if not a:
+                if i == shape.parts[j]:
+                    break
+                continue
+            part.append(ring)
+            areas.append(a)
+        if part and areas[0] - sum(areas[1:]) > 1e-9 * areas[0]:
+            rings.append(part)
+    if not rings:
+        return None
+    return _rebuild(shape, rings)
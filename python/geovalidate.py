@@ -0,0 +1,86 @@
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from census import CensusPlaces, as_census_places
+from geometry import BBox, Shape, bounds, contains_many, distance
+from linkage import town_key
+
+METERS_PER_DEGREE = 111320
+# a point this close to its town's boundary still counts as in town: postal towns and census
+# places don't share boundaries
+TOWN_TOLERANCE = 500
+# candidates further than this from the town score 0
+MAX_DISTANCE = 10000
+# a candidate without a house number is a street or town centroid, not the address
+NO_NUMBER_PENALTY = 0.5
+
+# (lon, lat, town name)
+TownPoint = Tuple[float, float, str]
+
+
+class GeocodeValidator:
+    # Checks geocoded points against the census place named by each business's town. Town
+    # polygons and their bounds are looked up once and kept, and points are checked per town in
+    # one batch: a bounds test first, one contains_many() pass for the points inside the bounds
+    # and a boundary distance only for the few points outside.
+    def __init__(self, census_places, tolerance: float = TOWN_TOLERANCE, max_distance: float = MAX_DISTANCE):
+        self.places: CensusPlaces = as_census_places(census_places)
+        self.tolerance = tolerance
+        self.max_distance = max_distance
+        self.by_key: Dict[str, int] = {}
+        for i, name in enumerate(self.places.names):
+            self.by_key.setdefault(town_key(name), i)
+        # town name -> (shape, bounds padded by the tolerance, cos(latitude)), None when unknown
+        self.towns: Dict[str, Optional[Tuple[Shape, BBox, float]]] = {}
+
+    def town(self, name: str) -> Optional[Tuple[Shape, BBox, float]]:
+        if name not in self.towns:
+            i = self.by_key.get(town_key(name))
+            shape = self.places.shape(i) if i is not None else None
+            if shape is None:
+                self.towns[name] = None
+            else:
+                x0, y0, x1, y1 = bounds(shape)
+                kx = math.cos(math.radians((y0 + y1) / 2))
+                pad = self.tolerance / METERS_PER_DEGREE
+                self.towns[name] = shape, (x0 - pad / kx, y0 - pad, x1 + pad / kx, y1 + pad), kx
+        return self.towns[name]
+
+    def distances(self, points: List[TownPoint]) -> List[Optional[float]]:
+        # meters from each point to its town, 0 inside; None when the town is unknown
+        result: List[Optional[float]] = [None] * len(points)
+        by_town: Dict[str, List[int]] = {}
+        for k, (_, _, name) in enumerate(points):
+            by_town.setdefault(name, []).append(k)
+        for name, ks in by_town.items():
+            town = self.town(name)
+            if town is None:
+                continue
+            shape, (x0, y0, x1, y1), kx = town
+            in_box = [k for k in ks if x0 <= points[k][0] <= x1 and y0 <= points[k][1] <= y1]
+            inside = dict(zip(in_box, contains_many(shape, [points[k][0] for k in in_box], [points[k][1] for k in in_box])))
+            for k in ks:
+                x, y, _ = points[k]
+                result[k] = 0.0 if inside.get(k) else distance(shape, x, y, kx) * METERS_PER_DEGREE
+        return result
+
+    def score(self, meters: Optional[float], address_formatted: str, has_number: bool = True) -> float:
+        if meters is None:
+            return 0.0
+        score = 1.0 if meters <= self.tolerance else max(0.0, 1 - meters / self.max_distance)
+        if has_number and not re.match(r"\s*\d", address_formatted or ""):
+            score *= NO_NUMBER_PENALTY
+        return score
+
+
+def as_geocode_validator(validator) -> GeocodeValidator:
+    if isinstance(validator, GeocodeValidator):
+        return validator
+    return GeocodeValidator(validator)
+
+
+def point_of(geometry: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    if not geometry or geometry.get("type") != "Point" or not geometry.get("coordinates"):
+        return None
+    return tuple(geometry["coordinates"][:2])
@@ -0,0 +1,138 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class RunReport:
+    # Stage timings and counters for one map. Stages nest ("correct/load_img") and add up when
+    # a stage runs more than once; counters are thread-safe so the geocoder threads can count.
+    # Each thread nests its own stages, and only the main thread profiles or traces memory.
+    def __init__(self, name: str, profile_dir: str = "", trace_memory: bool = False):
+        self.name = name
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.started = time.time()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.counters: Dict[str, int] = {}
+        self.info: Dict[str, Any] = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def count(self, key: str, n: int = 1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    @property
+    def path(self) -> List[str]:
+        if not hasattr(self.local, "path"):
+            self.local.path = []
+        return self.local.path
+
+    @contextmanager
+    def stage(self, name: str):
+        path = self.path
+        path.append(name)
+        key = "/".join(path)
+        logger.debug("%s: %s", self.name, key)
+        main_thread = threading.current_thread() is threading.main_thread()
+        # only top-level stages are profiled, a profiler can't be nested in another one
+        profiler = cProfile.Profile() if self.profile_dir and len(path) == 1 and main_thread else None
+        tracing = self.trace_memory and main_thread and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if profiler:
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                safe_name = "".join(c if c.isalnum() else "_" for c in f"{self.name}-{key}")
+                profiler.dump_stats(os.path.join(self.profile_dir, safe_name + ".prof"))
+            with self.lock:
+                stage = self.stages.setdefault(key, {"seconds": 0.0, "calls": 0})
+                stage["seconds"] = round(stage["seconds"] + seconds, 4)
+                stage["calls"] += 1
+            if tracing:
+                stage["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+                tracemalloc.stop()
+            path.pop()
+            logger.debug("%s: %s took %.3f s", self.name, key, seconds)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "map": self.name,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "seconds": round(time.time() - self.started, 4),
+            **self.info,
+            "stages": self.stages,
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def save(self, filename: str):
+        with open(filename, "w") as f:
+            json.dump(self.to_json(), f, indent=4)
+        logger.info("%s: run report saved to %s", self.name, filename)
+
+
+class NullReport(RunReport):
+    # stands in when no map is being built in this process: stages run untimed, counts are dropped
+    def __init__(self):
+        super().__init__("")
+
+    def count(self, key: str, n: int = 1):
+        pass
+
+    @contextmanager
+    def stage(self, name: str):
+        yield self
+
+
+# the report of the map being built in this process
+_current: RunReport = NullReport()
+
+
+def current() -> RunReport:
+    return _current
+
+
+def start_run(name: str, profile_dir: str = "", trace_memory: bool = False) -> RunReport:
+    global _current
+    _current = RunReport(name, profile_dir, trace_memory)
+    return _current
+
+
+def end_run():
+    global _current
+    _current = NullReport()
+
+
+def stage(name: str):
+    return _current.stage(name)
+
+
+def count(key: str, n: int = 1):
+    _current.count(key, n)
+
+
+def timed(name: str = ""):
+    # decorator form of stage(), named after the function by default
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _current.stage(name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
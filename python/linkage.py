@@ -0,0 +1,164 @@
+import csv
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+NAME_STOPWORDS = {"the", "and", "of", "inc", "llc", "ltd", "corp", "co", "pc", "cpa", "company"}
+ADDRESS_WORDS = {
+    "avenue": "ave", "road": "rd", "street": "st", "place": "pl", "boulevard": "blvd", "drive": "dr",
+    "parkway": "pkwy", "lane": "ln", "turnpike": "tpke", "highway": "hwy", "court": "ct", "plaza": "plz",
+    "north": "n", "south": "s", "east": "e", "west": "w",
+}
+ADDRESS_UNITS = {"suite", "ste", "unit", "apt", "fl", "floor", "room", "rm"}
+DIRECTIONS = {"n", "s", "e", "w"}
+# words that differ between how a listing and the geocoder or census name the same town
+TOWN_STOPWORDS = {"city", "of", "town", "village", "hamlet", "cdp"}
+# how much a matching field on its own says about two records being the same business
+PHONE_WEIGHT = 0.95
+ADDRESS_WEIGHT = 0.9
+# a shared address only counts towards a match when the names agree this much or the phones match,
+# businesses in the same building or plaza share it
+NAME_AGREEMENT = 0.3
+NAME_PREFIX = 4
+# name-token and name-prefix blocks bigger than this are too common to narrow anything down
+MAX_BLOCK = 50
+
+
+def normalize_phone(phone: str) -> str:
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-10:] if len(digits) >= 10 else ""
+
+
+def _words(text: str) -> List[str]:
+    text = (text or "").lower().replace("&", " and ").replace("'", "")
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def name_tokens(name: str) -> List[str]:
+    return [w for w in _words(name) if w not in NAME_STOPWORDS]
+
+
+def address_words(text: str, units: bool = False) -> List[str]:
+    # "17B E. Old Country Road, Suite 328" -> ["17b", "e", "old", "country", "rd"],
+    # with units ["17b", "e", "old", "country", "rd", "#328"]
+    tokens = []
+    words = _words(text)
+    i = 0
+    while i < len(words):
+        if words[i] in ADDRESS_UNITS:
+            if units and i + 1 < len(words):
+                tokens.append("#" + words[i + 1])
+            i += 2
+            continue
+        tokens.append(ADDRESS_WORDS.get(words[i], words[i]))
+        i += 1
+    return tokens
+
+
+def address_tokens(address: str) -> List[str]:
+    # street and unit: "17B East Old Country Road, Suite 328, Hicksville" -> ["17b", "e", "old", "country", "rd", "#328"]
+    parts = (address or "").split(",")
+    tokens = address_words(parts[0], units=True)
+    # the unit is often a part of its own
+    for part in parts[1:]:
+        tokens.extend(t for t in address_words(part, units=True) if t.startswith("#"))
+    return tokens
+
+
+def town_key(town: str) -> str:
+    # "N. Babylon", "North Babylon" -> "n babylon"; "City of Long Beach" -> "long beach"
+    return " ".join(w for w in address_words(town) if w not in TOWN_STOPWORDS)
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class LinkRecord:
+    __slots__ = ("loc", "name", "phone", "address", "unit", "street_number", "street")
+
+    def __init__(self, loc: int, name: str, phone: str, address: str):
+        self.loc = loc
+        self.name = name_tokens(name)
+        self.phone = normalize_phone(phone)
+        self.address = address_tokens(address)
+        self.unit = next((t for t in self.address if t.startswith("#")), None)
+        self.street_number = next((t for t in self.address if t[0].isdigit()), None)
+        self.street = None
+        if self.street_number:
+            rest = self.address[self.address.index(self.street_number) + 1:]
+            self.street = next((t for t in rest if t not in DIRECTIONS), None)
+
+    def blocking_keys(self) -> List[Tuple[str, str]]:
+        keys = []
+        if self.phone:
+            keys.append(("phone", self.phone))
+        if self.street_number and self.street:
+            keys.append(("street", f"{self.street_number} {self.street}"))
+        if self.name:
+            keys.append(("name", " ".join(self.name)))
+            keys.append(("prefix", "".join(self.name)[:NAME_PREFIX]))
+            keys.extend(("token", t) for t in set(self.name))
+        return keys
+
+    def score(self, other: "LinkRecord") -> float:
+        # noisy-or of the per-field evidence, so one strong field is enough and weak ones add up
+        name = _dice(set(self.name), set(other.name))
+        phone = bool(self.phone) and self.phone == other.phone
+        evidence = [name]
+        if phone:
+            evidence.append(PHONE_WEIGHT)
+        # different suites at one street address are different businesses
+        same_unit = not (self.unit and other.unit) or self.unit == other.unit
+        if self.street_number and self.street_number == other.street_number and same_unit and (phone or name >= NAME_AGREEMENT):
+            evidence.append(ADDRESS_WEIGHT * _dice(set(self.address), set(other.address)))
+        miss = 1.0
+        for e in evidence:
+            miss *= 1.0 - e
+        return 1.0 - miss
+
+
+class RecordLinker:
+    # Blocked record linkage: rows are indexed by phone digits, street number + street name,
+    # normalized name, name prefix and name tokens, and a listing is only scored against the
+    # rows sharing one of its keys.
+    def __init__(self, records: Iterable[LinkRecord], min_score: float = 0.8, max_block: int = MAX_BLOCK):
+        self.records: List[LinkRecord] = list(records)
+        self.min_score = min_score
+        self.max_block = max_block
+        self.blocks: Dict[Tuple[str, str], List[int]] = {}
+        for i, record in enumerate(self.records):
+            for key in record.blocking_keys():
+                self.blocks.setdefault(key, []).append(i)
+
+    def candidates(self, record: LinkRecord) -> Set[int]:
+        candidates = set()
+        for key in record.blocking_keys():
+            block = self.blocks.get(key, [])
+            if key[0] in ["prefix", "token"] and len(block) > self.max_block:
+                continue
+            candidates.update(block)
+        return candidates
+
+    def match(self, record: LinkRecord) -> Tuple[Optional[LinkRecord], float]:
+        # no match when two rows for different LOCs score the same, there is nothing to pick one by
+        best, best_score, tied = None, 0.0, False
+        for i in sorted(self.candidates(record)):
+            score = record.score(self.records[i])
+            if score > best_score + 1e-9:
+                best, best_score, tied = self.records[i], score, False
+            elif best is not None and abs(score - best_score) <= 1e-9 and self.records[i].loc != best.loc:
+                tied = True
+        if best is None or best_score < self.min_score or tied:
+            return None, best_score
+        return best, best_score
+
+    @staticmethod
+    def load_csv(filename: str, min_score: float = 0.8) -> "RecordLinker":
+        records = []
+        with open(filename, "r") as f:
+            for row in csv.DictReader(f):
+                loc = int(re.search(r"\d+", row["LOC"]).group())
+                records.append(LinkRecord(loc, row["Business"], row["Phone"], row["Address"]))
+        return RecordLinker(records, min_score)
@@ -0,0 +1,184 @@
+import glob
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from PIL import Image
+
+from manifest import file_digest
+
+logger = logging.getLogger(__name__)
+
+LOGO_SIZES = [32, 64, 128]
+MAX_ATLAS_SIZE = 4096
+
+
+def parse_logo_stem(stem: str) -> Tuple[int, str]:
+    # "HK-102S" -> (102, "S"); AttributeError if the stem has no LOC or priority
+    file_id = stem.split("-")[-1]
+    return int(re.search(r"\d+", file_id).group()), re.search(r"[a-zA-Z]+", file_id).group()
+
+
+def _thumbnail(path: str, stem: str, thumb_dir: str, sizes: List[int]) -> Tuple[str, int, int]:
+    with Image.open(path) as img:
+        img = img.convert("RGBA")
+        width, height = img.size
+        for size in sizes:
+            thumb = img.copy()
+            thumb.thumbnail((size, size), Image.LANCZOS)
+            thumb.save(os.path.join(thumb_dir, str(size), stem + ".png"), optimize=True)
+    return stem, width, height
+
+
+def pack_shelves(boxes: Dict[str, Tuple[int, int]], max_size: int = MAX_ATLAS_SIZE) -> Dict[str, Tuple[int, int, int, int, int]]:
+    # shelf packing, tallest first: stem -> (page, x, y, w, h)
+    area = sum(w * h for w, h in boxes.values())
+    widest = max((w for w, _ in boxes.values()), default=1)
+    width = min(max_size, max(widest, int((area * 1.2) ** 0.5)))
+    placements = {}
+    page, x, y, shelf = 0, 0, 0, 0
+    for stem, (w, h) in sorted(boxes.items(), key=lambda item: (-item[1][1], item[0])):
+        if x + w > width:
+            x, y, shelf = 0, y + shelf, 0
+        if y + h > max_size:
+            page, x, y, shelf = page + 1, 0, 0, 0
+        placements[stem] = (page, x, y, w, h)
+        x += w
+        shelf = max(shelf, h)
+    return placements
+
+
+def _write_atlas(prefix: str, size: int, thumb_dir: str, placements: Dict[str, Tuple[int, int, int, int, int]]) -> List[str]:
+    # one png + MapLibre/Mapbox style sprite index json per atlas page
+    pages: Dict[int, Dict[str, Tuple[int, int, int, int, int]]] = {}
+    for stem, placement in placements.items():
+        pages.setdefault(placement[0], {})[stem] = placement
+    names = []
+    for page, entries in sorted(pages.items()):
+        name = f"{Path(prefix).name}-{size}-{page}"
+        width = max(x + w for _, x, _, w, _ in entries.values())
+        height = max(y + h for _, _, y, _, h in entries.values())
+        atlas = Image.new("RGBA", (width, height))
+        index = {}
+        for stem, (_, x, y, w, h) in sorted(entries.items()):
+            with Image.open(os.path.join(thumb_dir, str(size), stem + ".png")) as thumb:
+                atlas.paste(thumb, (x, y))
+            index[stem] = {"x": x, "y": y, "width": w, "height": h, "pixelRatio": 1}
+        atlas.save(os.path.join(os.path.dirname(prefix), name + ".png"), optimize=True)
+        with open(os.path.join(os.path.dirname(prefix), name + ".json"), "w") as f:
+            json.dump(index, f, indent=4)
+        names.append(name)
+    return names
+
+
+class LogoManifest:
+    # stem -> LOC, priority, source size/mtime/hash and original dimensions of every logo
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.sizes: List[int] = []
+        self.logos: Dict[str, Dict[str, Any]] = {}
+        self.sprites: Dict[str, Dict[str, List[Any]]] = {}
+        if os.path.isfile(filename):
+            with open(filename, "r") as f:
+                data = json.load(f)
+            self.sizes = data.get("sizes", [])
+            self.logos = data.get("logos", {})
+            # sizes in the order a build returns them, so cached and rebuilt sprites serialize alike
+            self.sprites = {
+                stem: {str(size): sprite[str(size)] for size in self.sizes if str(size) in sprite}
+                for stem, sprite in data.get("sprites", {}).items()
+            }
+
+    def scan(self, pattern: str) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        logos, changed = {}, []
+        for path in sorted(glob.glob(pattern)):
+            stem = Path(path).stem
+            try:
+                loc, priority = parse_logo_stem(stem)
+            except AttributeError as e:
+                logger.warning("Error processing %s: %s", stem, e)
+                continue
+            stat = os.stat(path)
+            old = self.logos.get(stem, {})
+            # the file is only hashed again when its size or mtime moved
+            if old.get("bytes") == stat.st_size and old.get("mtime") == stat.st_mtime_ns:
+                content = old["digest"]
+            else:
+                content = file_digest(path)
+            logos[stem] = {
+                "file": path, "loc": loc, "priority": priority,
+                "bytes": stat.st_size, "mtime": stat.st_mtime_ns, "digest": content,
+                "width": old.get("width"), "height": old.get("height"),
+            }
+            if content != old.get("digest"):
+                changed.append(stem)
+        return logos, changed
+
+    def save(self):
+        with open(self.filename, "w") as f:
+            json.dump({"sizes": self.sizes, "logos": self.logos, "sprites": self.sprites}, f, indent=4)
+
+
+def build_logos(pattern: str, prefix: str, sizes: List[int] = LOGO_SIZES, workers: int = 1) -> Dict[str, Dict[str, List[Any]]]:
+    # Thumbnails every new or changed logo matching pattern at each size and packs the
+    # thumbnails into sprite atlases next to prefix. Returns stem -> {size: [atlas, x, y, w, h]}.
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    thumb_dir = prefix + "_thumbs"
+    for size in sizes:
+        os.makedirs(os.path.join(thumb_dir, str(size)), exist_ok=True)
+
+    manifest = LogoManifest(prefix + ".logos.json")
+    logos, changed = manifest.scan(pattern)
+    if sizes != manifest.sizes:
+        changed = list(logos)
+    else:
+        changed = [stem for stem in logos if stem in changed or not all(
+            os.path.isfile(os.path.join(thumb_dir, str(size), stem + ".png")) for size in sizes
+        )]
+    removed = set(manifest.logos) - set(logos)
+    logger.info("Logos: %d found, %d to thumbnail, %d removed", len(logos), len(changed), len(removed))
+    if not changed and not removed and manifest.sprites:
+        return manifest.sprites
+
+    for stem in removed:
+        for size in sizes:
+            path = os.path.join(thumb_dir, str(size), stem + ".png")
+            if os.path.isfile(path):
+                os.remove(path)
+
+    jobs = [(logos[stem]["file"], stem, thumb_dir, sizes) for stem in changed]
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    if executor and len(jobs) > 1:
+        results = list(executor.map(_thumbnail, *zip(*jobs), chunksize=8))
+    else:
+        results = [_thumbnail(*job) for job in jobs]
+    for stem, width, height in results:
+        logos[stem]["width"], logos[stem]["height"] = width, height
+
+    placements = {}
+    for size in sizes:
+        boxes = {}
+        for stem in logos:
+            with Image.open(os.path.join(thumb_dir, str(size), stem + ".png")) as thumb:
+                boxes[stem] = thumb.size
+        placements[size] = pack_shelves(boxes)
+    # the atlases are written (and png-optimized) one size per worker
+    atlas_jobs = [(prefix, size, thumb_dir, placements[size]) for size in sizes]
+    if executor:
+        with executor:
+            atlas_names = list(executor.map(_write_atlas, *zip(*atlas_jobs)))
+    else:
+        atlas_names = [_write_atlas(*job) for job in atlas_jobs]
+
+    sprites: Dict[str, Dict[str, List[Any]]] = {stem: {} for stem in logos}
+    for size, names in zip(sizes, atlas_names):
+        for stem, (page, x, y, w, h) in placements[size].items():
+            sprites[stem][str(size)] = [names[page], x, y, w, h]
+
+    manifest.sizes, manifest.logos, manifest.sprites = sizes, logos, sprites
+    manifest.save()
+    return sprites
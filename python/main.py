@@ -1,90 +1,41 @@
-import os
+import argparse
+import logging
+import sys
 
-from dotenv import load_dotenv
+from config import PipelineConfig
+from runner import LOG_FORMAT, run_maps
 
-from directory import BusinessDirectory
-from utils import load_json
-
-
-class DataSource:
-    def __init__(self, name: str, geojson: str, url: str  = "", csv: str  = ""):
-        self.name = name
-        self.geojson = geojson
-        self.url = url
-        self.csv = csv
-
-
-class Corrections:
-    def __init__(self, filename: str, corrections: str = "", csv: str = "", img: str = ""):
-        self.filename = filename
-        self.corrections = corrections
-        self.csv = csv
-        self.img = img
+logger = logging.getLogger("main")
 
 
 def main():
-    # 1. Load external data
-    load_dotenv() # API key for geocoder
-    census_places = load_json("data/us_census/ny_places_poly.geojson")
-    business_categories = load_json("data/subcategories.json")
-
-    # 2. Scrape selected map urls
-    print("\nCollecting business data from web for selected locations:")
-
-    maps_to_scrape = [
-        #DataSource(
-        #    name="Hicksville, NY",
-        #    url="https://maptoons.com/hicksville-2025.html",
-        #    geojson="data/hicksville.geojson",
-        #),
-        DataSource(
-            name="North Babylon, NY",
-            csv="data/2025_best_of_nb.csv",
-            geojson="data/north_babylon.geojson",
-        )
-    ]
-    for m in maps_to_scrape:
-        print(m.name, m.url, m.csv)
-        if not os.path.isfile(m.geojson):
-            map_data = BusinessDirectory(m.name)
-            if m.url:
-                map_data.scrape(m.url)
-            elif m.csv:
-                map_data.load_csv(m.csv)
-            map_data.match_categories(business_categories)
-            map_data.match_towns(census_places)
-            map_data.geocode()
-            map_data.save_geojson(m.geojson)
+    parser = argparse.ArgumentParser(description="Build maptoons .geojson files from the maps in a config file")
+    parser.add_argument("--config", default="maps.json")
+    parser.add_argument("--map", action="append", default=[], help="map name to build (default: all enabled maps)")
+    parser.add_argument("--processes", type=int, default=0, help="worker processes (default: one per map, up to the cpu count)")
+    parser.add_argument("--log-level", default=None, help="DEBUG, INFO, WARNING, ... (default: log_level from the config, INFO)")
+    parser.add_argument("--profile", default=None, metavar="DIR", help="write a cProfile .prof file per map and stage to DIR")
+    parser.add_argument("--trace-memory", action="store_true", help="record the tracemalloc peak of each map's top-level stages (build, correct); nested stages and stages on worker threads get no peak of their own")
+    args = parser.parse_args()
+
+    config = PipelineConfig(args.config)
+    config.log_level = (args.log_level or config.log_level).upper()
+    config.profile_dir = args.profile or config.profile_dir
+    config.trace_memory = args.trace_memory or config.trace_memory
+    logging.basicConfig(level=config.log_level, format=LOG_FORMAT)
+
+    maps = config.select(args.map)
+    logger.info("Processing %d map(s) from %s", len(maps), args.config)
+    report = run_maps(config, maps, args.processes)
+
+    logger.info("Summary:")
+    for name, result in report.items():
+        if result["ok"]:
+            logger.info("  %s: ok (%s, report %s)", name, result["geojson"], result["report"])
         else:
-            print("  Skipping download.", m.geojson, "already exists")
-
-    # 3. Apply local corrections
-    print("\nApplying updates/corrections:")
-    maps_to_fix = [
-        #Corrections(
-        #    filename="data/hicksville.geojson",
-        #    corrections="data/hicksville-corrections.geojson",
-        #    csv="data/Best_of_HK_2024.csv",
-        #    img="img/HK-*png",
-        #),
-        Corrections(
-            filename="data/north_babylon.geojson",
-        #    corrections="data/north_babylon_corrected.geojson",
-            img="img/NB-*png"
-        ),
-    ]
-    for m in maps_to_fix:
-        print(m.filename)
-        map_data = BusinessDirectory()
-        map_data.load_geojson(m.filename)
-        map_data.match_categories(business_categories)
-        if m.csv:
-            map_data.load_loc_from_csv(m.csv)
-        if m.img:
-            map_data.load_img(m.img)
-        if m.corrections:
-            map_data.load_geojson(m.corrections, keep_name=True)
-        map_data.save_geojson(m.filename)
+            logger.error("  %s: FAILED %s\n%s", name, result["error"], result["traceback"])
+    if not all(result["ok"] for result in report.values()):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,35 @@
+import hashlib
+import json
+import os
+from typing import Dict, List
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def file_digest(filename: str) -> str:
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Manifest:
+    # Per-feature fingerprints of the inputs an output .geojson was built from
+    def __init__(self, filename: str, inputs: List[str] = []):
+        self.filename = filename
+        self.inputs = {path: file_digest(path) for path in inputs if os.path.isfile(path)}
+        self.inputs_digest = digest(json.dumps(self.inputs, sort_keys=True))
+        self.features: Dict[str, str] = {}
+        if os.path.isfile(filename):
+            with open(filename, "r") as f:
+                self.features = json.load(f).get("features", {})
+
+    def feature_digest(self, source_digest: str) -> str:
+        return digest(self.inputs_digest + source_digest)
+
+    def save(self):
+        with open(self.filename, "w") as f:
+            json.dump({"inputs": self.inputs, "features": self.features}, f, indent=4, sort_keys=True)
@@ -0,0 +1,242 @@
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from geojson_stream import FeatureReader
+from manifest import digest
+from utils import make_geojson
+
+logger = logging.getLogger(__name__)
+
+# A published map is a directory with
+#   latest.geojson   the current version, in full
+#   versions.json    version manifest: latest version and the deltas between versions
+#   delta-<from>-<to>.json
+# A delta lists the features added (in full) and removed (by id) and, for changed features,
+# JSON-patch operations on "/properties/<key>" and "/geometry". A client that has version n
+# applies the deltas from n onwards instead of downloading latest.geojson again.
+LATEST = "latest.geojson"
+VERSIONS = "versions.json"
+
+Delta = Dict[str, Any]
+
+
+def _pointer(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def _unpointer(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def diff_feature(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    ops = []
+    old_properties, new_properties = old.get("properties") or {}, new.get("properties") or {}
+    for key in old_properties:
+        if key not in new_properties:
+            ops.append({"op": "remove", "path": f"/properties/{_pointer(key)}"})
+    for key, value in new_properties.items():
+        if key not in old_properties:
+            ops.append({"op": "add", "path": f"/properties/{_pointer(key)}", "value": value})
+        elif old_properties[key] != value:
+            ops.append({"op": "replace", "path": f"/properties/{_pointer(key)}", "value": value})
+    if old.get("geometry") != new.get("geometry"):
+        ops.append({"op": "replace", "path": "/geometry", "value": new.get("geometry")})
+    return ops
+
+
+def diff(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> Delta:
+    # features by id, before and after
+    changed = {}
+    for feature_id, feature in new.items():
+        if feature_id in old:
+            ops = diff_feature(old[feature_id], feature)
+            if ops:
+                changed[feature_id] = ops
+    return {
+        "added": {feature_id: feature for feature_id, feature in new.items() if feature_id not in old},
+        "removed": [feature_id for feature_id in old if feature_id not in new],
+        "changed": changed,
+    }
+
+
+def patch_feature(feature: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    feature = {**feature, "properties": dict(feature.get("properties") or {})}
+    for op in ops:
+        tokens = op["path"].split("/")[1:]
+        if tokens == ["geometry"]:
+            feature["geometry"] = op["value"]
+        elif tokens[0] == "properties" and len(tokens) == 2:
+            key = _unpointer(tokens[1])
+            if op["op"] == "remove":
+                feature["properties"].pop(key, None)
+            else:
+                feature["properties"][key] = op["value"]
+        else:
+            raise ValueError(f"Unsupported patch path: {op['path']}")
+    return feature
+
+
+def apply_delta(features: Dict[str, Dict[str, Any]], delta: Delta) -> Dict[str, Dict[str, Any]]:
+    # features by id at the delta's "from" version -> at its "to" version; new features go last
+    features = {feature_id: feature for feature_id, feature in features.items() if feature_id not in delta["removed"]}
+    for feature_id, ops in delta["changed"].items():
+        if feature_id in features:
+            features[feature_id] = patch_feature(features[feature_id], ops)
+    features.update(delta["added"])
+    return features
+
+
+def squash(deltas: List[Delta]) -> Delta:
+    # one delta with the effect of applying these in order
+    added: Dict[str, Dict[str, Any]] = {}
+    removed: Dict[str, None] = {}
+    changed: Dict[str, List[Dict[str, Any]]] = {}
+    for delta in deltas:
+        for feature_id in delta["removed"]:
+            added.pop(feature_id, None)
+            changed.pop(feature_id, None)
+            removed[feature_id] = None
+        for feature_id, ops in delta["changed"].items():
+            if feature_id in added:
+                added[feature_id] = patch_feature(added[feature_id], ops)
+            else:
+                changed.setdefault(feature_id, []).extend(ops)
+        for feature_id, feature in delta["added"].items():
+            # removed and added again: the client replaces whatever it has
+            removed.pop(feature_id, None)
+            changed.pop(feature_id, None)
+            added[feature_id] = feature
+    return {
+        "from": deltas[0]["from"], "to": deltas[-1]["to"],
+        "added": added, "removed": list(removed), "changed": changed,
+    }
+
+
+def load_features(filename: str) -> Dict[str, Dict[str, Any]]:
+    features = {}
+    for feature in FeatureReader(filename):
+        feature_id = (feature.get("properties") or {}).get("id")
+        if feature_id:
+            features[feature_id] = feature
+    return features
+
+
+class PublishedMap:
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self.manifest: Dict[str, Any] = {"name": "", "latest": 0, "hash": "", "versions": [], "deltas": []}
+        filename = os.path.join(out_dir, VERSIONS)
+        if os.path.isfile(filename):
+            with open(filename, "r") as f:
+                self.manifest = json.load(f)
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.out_dir, filename)
+
+    def _save_manifest(self):
+        with open(self._path(VERSIONS) + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=4)
+        os.replace(self._path(VERSIONS) + ".tmp", self._path(VERSIONS))
+
+    def _write_delta(self, delta: Delta) -> Dict[str, Any]:
+        filename = f"delta-{delta['from']}-{delta['to']}.json"
+        with open(self._path(filename), "w") as f:
+            json.dump(delta, f, separators=(",", ":"))
+        return {
+            "from": delta["from"], "to": delta["to"], "file": filename, "bytes": os.path.getsize(self._path(filename)),
+            "added": len(delta["added"]), "removed": len(delta["removed"]), "changed": len(delta["changed"]),
+        }
+
+    def latest(self) -> Dict[str, Dict[str, Any]]:
+        return load_features(self._path(LATEST)) if os.path.isfile(self._path(LATEST)) else {}
+
+    def publish(self, name: str, features: Iterable[Dict[str, Any]], precision: int = None) -> Optional[Dict[str, Any]]:
+        # a new version if anything changed since the latest one; returns its manifest entry
+        os.makedirs(self.out_dir, exist_ok=True)
+        # written first, so the features compare with the previous version as they read back
+        make_geojson(name, features, self._path(LATEST) + ".tmp", compact=True, precision=precision)
+        new = load_features(self._path(LATEST) + ".tmp")
+        version = self.manifest["latest"]
+        delta = {"from": version, "to": version + 1, **diff(self.latest(), new)}
+        if not (delta["added"] or delta["removed"] or delta["changed"]):
+            os.remove(self._path(LATEST) + ".tmp")
+            logger.info("%s: unchanged at version %d", name, version)
+            return None
+
+        # the first version has no delta, a client without any version downloads latest.geojson
+        entry = self._write_delta(delta) if version else None
+        os.replace(self._path(LATEST) + ".tmp", self._path(LATEST))
+        content = content_digest(new)
+        self.manifest.update(name=name, latest=version + 1, hash=content)
+        self.manifest["versions"].append({"version": version + 1, "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "hash": content, "features": len(new)})
+        if entry:
+            self.manifest["deltas"].append(entry)
+            logger.info(
+                "%s: version %d, %d added, %d removed, %d changed (%d bytes)",
+                name, version + 1, entry["added"], entry["removed"], entry["changed"], entry["bytes"],
+            )
+        else:
+            logger.info("%s: version %d, %d features", name, version + 1, len(new))
+        self._save_manifest()
+        return self.manifest["versions"][-1]
+
+    def deltas_since(self, version: int) -> Optional[List[Dict[str, Any]]]:
+        # the delta files that take a client from version to the latest, None if it has to
+        # download latest.geojson instead
+        chain, at = [], version
+        for entry in self.manifest["deltas"]:
+            if entry["from"] == at:
+                chain.append(entry)
+                at = entry["to"]
+        return chain if at == self.manifest["latest"] else None
+
+    def compact(self, keep: int = 10) -> Optional[Dict[str, Any]]:
+        # squashes every delta but the last `keep` into one, so old clients catch up in one download
+        old = self.manifest["deltas"][:-keep] if keep else self.manifest["deltas"]
+        if len(old) < 2:
+            return None
+        deltas = []
+        for entry in old:
+            with open(self._path(entry["file"]), "r") as f:
+                deltas.append(json.load(f))
+        entry = self._write_delta(squash(deltas))
+        for e in old:
+            if e["file"] != entry["file"]:
+                os.remove(self._path(e["file"]))
+        self.manifest["deltas"] = [entry] + self.manifest["deltas"][len(old):]
+        self._save_manifest()
+        logger.info("%s: %d deltas squashed into %s (%d bytes)", self.manifest["name"], len(old), entry["file"], entry["bytes"])
+        return entry
+
+
+def content_digest(features: Dict[str, Dict[str, Any]]) -> str:
+    # order-independent fingerprint, to check a client's patched copy against latest.geojson
+    return digest(json.dumps(features, sort_keys=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish map outputs as versions with per-feature deltas")
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish = commands.add_parser("publish", help="publish a .geojson as the next version if it changed")
+    publish.add_argument("geojson")
+    publish.add_argument("out_dir")
+    compact = commands.add_parser("compact", help="squash all but the last --keep deltas into one")
+    compact.add_argument("out_dir")
+    compact.add_argument("--keep", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "publish":
+        reader = FeatureReader(args.geojson)
+        features = list(reader)
+        PublishedMap(args.out_dir).publish(reader.members.get("name", ""), features)
+    elif args.command == "compact":
+        PublishedMap(args.out_dir).compact(args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import logging
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+
+from addresspoints import AddressPointGeocoder
+from census import CensusPlaces
+from config import Corrections, DataSource, MapConfig, PipelineConfig
+from directory import BusinessDirectory
+from featuredb import FeatureDatabase
+from fetch import Fetcher
+from geocache import GeocodeCache
+from geocoder import GeocodeEngine
+from geovalidate import GeocodeValidator
+import instrument
+from logos import build_logos
+from manifest import Manifest
+from publish import PublishedMap
+from utils import load_json
+
+logger = logging.getLogger(__name__)
+LOG_FORMAT = "%(asctime)s %(levelname)s %(processName)s %(name)s: %(message)s"
+
+
+class SharedData:
+    # Read-only inputs loaded once per process; the census layer is a memory-mapped pack,
+    # so worker processes share its pages through the OS page cache
+    def __init__(self, config: PipelineConfig, processes: int = 1):
+        self.config = config
+        self.processes = processes
+        self.census_places = CensusPlaces.load(config.census_places)
+        self.business_categories = load_json(config.business_categories)
+        # the API rate limit is split between the worker processes
+        self.geocode_engine = GeocodeEngine(config.geocode_url, rate=config.geocode_rate / processes, workers=config.geocode_workers)
+        self.geocode_cache = GeocodeCache(
+            config.geocode_cache, geocoder=self.geocode_engine.geocode, ttl=config.geocode_ttl, offline=config.geocode_offline,
+            candidate_geocoder=self.geocode_engine.candidates, negative_ttl=config.geocode_negative_ttl,
+            batch_geocoder=self.geocode_engine.batch_geocode,
+        )
+        # already resolved addresses are answered locally, the rest goes through the cache to the API
+        self.address_points = AddressPointGeocoder(self.geocode_cache.geocode, config.address_point_confidence, self.geocode_cache.batch_geocode)
+        self.address_points.load(config.address_points, config.map_files())
+        self.geocode_validator = GeocodeValidator(self.census_places, config.town_tolerance)
+        self.fetcher = Fetcher(config.http_cache, offline=config.http_offline, rate=config.http_rate)
+        # opened when a map first saves to it, maps can each name their own
+        self.feature_dbs: Dict[str, FeatureDatabase] = {}
+
+    def feature_db(self, filename: str) -> FeatureDatabase:
+        if filename not in self.feature_dbs:
+            self.feature_dbs[filename] = FeatureDatabase(filename)
+        return self.feature_dbs[filename]
+
+
+_shared: SharedData = None
+
+
+def _init_worker(config: PipelineConfig, processes: int):
+    global _shared
+    load_dotenv() # API key for geocoder
+    logging.basicConfig(level=config.log_level, format=LOG_FORMAT)
+    _shared = SharedData(config, processes)
+
+
+def _network_counters(shared: SharedData) -> Dict[str, int]:
+    # process-wide totals; a map's report gets the difference over its run
+    return {
+        "http_requests": shared.fetcher.stats["requests"],
+        "http_not_modified": shared.fetcher.stats["not_modified"],
+        "http_cached": shared.fetcher.stats["cached"],
+        "geocode_requests": shared.geocode_engine.requests,
+        "geocode_cache_hits": shared.geocode_cache.hits,
+        "geocode_cache_misses": shared.geocode_cache.misses,
+        "geocode_local_exact": shared.address_points.exact,
+        "geocode_local_interpolated": shared.address_points.interpolated,
+    }
+
+
+def build_map(m: DataSource, shared: SharedData, config: PipelineConfig = None):
+    logger.info("%s: %s", m.name, m.url or m.csv)
+    if os.path.isfile(m.geojson) and not m.incremental:
+        logger.info("Skipping download, %s already exists", m.geojson)
+        return
+
+    config = config or shared.config
+    map_data = BusinessDirectory(m.name)
+    if m.url:
+        map_data.scrape(m.url, fetcher=shared.fetcher, streaming=config.streaming_html)
+    elif m.csv:
+        map_data.load_csv(m.csv)
+    # only features whose source row or inputs changed since the last run are reprocessed
+    manifest = Manifest(m.geojson + ".manifest.json", [config.census_places, config.business_categories])
+    changed = map_data.changed_since(m.geojson, manifest)
+    changed.match_categories(shared.business_categories)
+    changed.match_towns(shared.census_places)
+    if config.batch_geocode:
+        # what the address points and the cache can't answer goes to the API as one batch job
+        changed.geocode_batch(shared.address_points.batch_geocode, shared.address_points.geocode)
+    else:
+        changed.geocode(shared.address_points.geocode, workers=shared.geocode_engine.workers)
+    if config.validate_geocodes:
+        # Only new or changed listings are geocoded again, and not those placed from the address
+        # points (outputs and hand corrections); the review file covers the whole map. Candidates
+        # come through the cache, so a point that stays outside costs one request, not one per run.
+        recheck = [
+            feature_id for feature_id, business in changed.features.items()
+            if not shared.address_points.is_local(business.geocode_query(m.name))
+        ]
+        validation = map_data.validate_geocodes(
+            shared.geocode_validator, shared.geocode_cache.candidates, m.geojson + ".review.geojson",
+            recheck=recheck, workers=shared.geocode_engine.workers,
+        )
+        for feature_id, query in validation["fixed"].items():
+            business = map_data.features[feature_id]
+            shared.geocode_cache.put(query, business.properties["address_formatted"], business.geometry)
+    changed.locate_towns(shared.census_places)
+    map_data.save_geojson(m.geojson)
+    manifest.save()
+
+
+def correct_map(m: Corrections, shared: SharedData, config: PipelineConfig = None):
+    logger.info("Correcting %s", m.filename)
+    config = config or shared.config
+    map_data = BusinessDirectory()
+    map_data.load_geojson(m.filename)
+    map_data.match_categories(shared.business_categories)
+    if m.csv:
+        map_data.load_loc_from_csv(m.csv)
+    if m.img:
+        map_data.load_img(m.img)
+        if config.logo_dir:
+            # thumbnails and sprite atlases next to the other maps' ones, e.g. data/logos/north_babylon-64-0.png
+            prefix = os.path.join(config.logo_dir, Path(m.filename).stem)
+            workers = max(1, config.logo_workers // shared.processes)
+            with instrument.stage("build_logos"):
+                map_data.load_sprites(build_logos(m.img, prefix, config.logo_sizes, workers))
+    if m.corrections:
+        map_data.load_geojson(m.corrections, keep_name=True)
+    map_data.save_geojson(m.filename)
+    if config.publish_dir:
+        # clients of data/published/<map>/ fetch only the delta to the new version
+        with instrument.stage("publish"):
+            published = PublishedMap(os.path.join(config.publish_dir, Path(m.filename).stem))
+            if published.publish(map_data.name, (f.feature for f in map_data.features.values())) and config.publish_keep:
+                published.compact(config.publish_keep)
+    if config.feature_db:
+        with instrument.stage("feature_db"):
+            shared.feature_db(config.feature_db).save_directory(map_data)
+    if config.cluster_dir:
+        os.makedirs(config.cluster_dir, exist_ok=True)
+        prefix = os.path.join(config.cluster_dir, Path(m.filename).stem)
+        min_zoom, max_zoom = config.cluster_zooms
+        map_data.save_clusters(prefix, min_zoom, max_zoom, config.cluster_radius)
+    if config.tile_dir:
+        map_data.save_tiles(os.path.join(config.tile_dir, Path(m.filename).stem), config.tile_zooms)
+    if config.outline_dir:
+        # town outlines for the map instead of bounding boxes, e.g. data/outlines/north_babylon-towns.geojson
+        os.makedirs(config.outline_dir, exist_ok=True)
+        map_data.save_outlines(
+            os.path.join(config.outline_dir, Path(m.filename).stem + "-towns.geojson"), shared.census_places,
+            config.outline_tolerance, config.outline_max_vertices, config.outline_precision,
+        )
+
+
+def run_map(m: MapConfig) -> Dict[str, Any]:
+    config = _shared.config.for_map(m)
+    report = instrument.start_run(m.name, config.profile_dir, config.trace_memory)
+    report_filename = m.source.geojson + ".report.json"
+    before = _network_counters(_shared)
+    try:
+        with instrument.stage("build"):
+            build_map(m.source, _shared, config)
+        with instrument.stage("correct"):
+            correct_map(m.corrections, _shared, config)
+        report.info["ok"] = True
+    except Exception as e:
+        report.info.update(ok=False, error=repr(e))
+        raise
+    finally:
+        for key, value in _network_counters(_shared).items():
+            report.count(key, value - before[key])
+        report.save(report_filename)
+        instrument.end_run()
+    return {"geojson": m.source.geojson, "report": report_filename}
+
+
+def run_maps(config: PipelineConfig, maps: List[MapConfig], processes: int = 0) -> Dict[str, Dict[str, Any]]:
+    processes = processes or min(len(maps), os.cpu_count() or 1)
+    # pack the census layer once up front so the workers only ever open it
+    CensusPlaces.load(config.census_places)
+
+    report: Dict[str, Dict[str, Any]] = {}
+    if processes <= 1:
+        _init_worker(config, 1)
+        for m in maps:
+            try:
+                report[m.name] = {"ok": True, **run_map(m)}
+            except Exception as e:
+                report[m.name] = {"ok": False, "error": repr(e), "traceback": traceback.format_exc()}
+        return report
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(config, processes)) as executor:
+        futures = {executor.submit(run_map, m): m for m in maps}
+        for future in as_completed(futures):
+            m = futures[future]
+            try:
+                report[m.name] = {"ok": True, **future.result()}
+            except Exception as e:
+                report[m.name] = {"ok": False, "error": repr(e), "traceback": traceback.format_exc()}
+    # keep the report in config order, not completion order
+    return {m.name: report[m.name] for m in maps}
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+# the pipeline modules import each other by name, as when run from python/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # routes each request to server.respond(method, path, query, body) -> (status, headers, body);
+    # server.requests and server.headers record what was asked
+    def _handle(self, method: str):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        self.server.requests.append((method, url.path, parse_qs(url.query), body))
+        self.server.headers.append(dict(self.headers))
+        status, headers, payload = self.server.respond(method, url.path, parse_qs(url.query), body)
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(respond) -> str:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        server.respond = respond
+        server.requests = []
+        server.headers = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
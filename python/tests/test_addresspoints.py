@@ -0,0 +1,69 @@
+import json
+
+from addresspoints import AddressPointGeocoder
+
+
+def point(lon, lat):
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+def business(feature_id, address, lon, lat):
+    return {"type": "Feature", "properties": {"id": feature_id, "address": address}, "geometry": point(lon, lat)}
+
+
+def write(path, name, features):
+    with open(path, "w") as f:
+        json.dump({"type": "FeatureCollection", "name": name, "features": features}, f)
+    return str(path)
+
+
+def no_fallback(query):
+    raise AssertionError(f"{query} went to the remote geocoder")
+
+
+def test_id_only_correction_moves_the_point(tmp_path):
+    output = write(tmp_path / "north_babylon.geojson", "North Babylon, NY", [
+        business("deli", "1000 Deer Park Ave", -73.3200, 40.7300),
+        business("pizza", "1100 Deer Park Ave", -73.3210, 40.7310),
+    ])
+    corrections = write(tmp_path / "north_babylon-corrections.geojson", "North Babylon Corrections", [
+        {"type": "Feature", "properties": {"id": "pizza"}, "geometry": point(-73.3250, 40.7350)},
+    ])
+    geocoder = AddressPointGeocoder(no_fallback)
+    geocoder.load([output, corrections], {output: ("North Babylon, NY", corrections)})
+    assert geocoder.geocode("1100 Deer Park Ave North Babylon NY")[1] == point(-73.3250, 40.7350)
+    assert geocoder.geocode("1000 Deer Park Avenue N. Babylon NY")[1] == point(-73.3200, 40.7300)
+
+
+def test_interpolation_between_address_points():
+    geocoder = AddressPointGeocoder(lambda query: ("remote", None))
+    geocoder.add("1000 Deer Park Ave", "North Babylon", -73.3200, 40.7300)
+    geocoder.add("1100 Deer Park Ave", "North Babylon", -73.3210, 40.7310)
+    geocoder.add("1051 Deer Park Ave", "North Babylon", -73.3180, 40.7300)
+
+    # same side of the street: halfway between 1000 and 1100
+    confidence, _, geometry = geocoder.locate("1050 Deer Park Avenue North Babylon NY")
+    assert geometry["coordinates"] == [-73.3205, 40.7305] and confidence > 0.5
+    assert geocoder.geocode("1050 Deer Park Ave North Babylon NY")[1] == geometry
+    # outside the known range is not answered locally
+    assert geocoder.locate("1200 Deer Park Ave North Babylon NY")[2] is None
+    assert geocoder.geocode("1200 Deer Park Ave North Babylon NY") == ("remote", None)
+    assert (geocoder.exact, geocoder.interpolated, geocoder.fallbacks) == (0, 1, 1)
+
+
+def test_batch_sends_only_what_is_not_local():
+    batches = []
+
+    def batch_fallback(queries):
+        batches.append(queries)
+        return [("remote", point(-73.4, 40.7)) if "Main" in query else ("", None) for query in queries]
+
+    geocoder = AddressPointGeocoder(no_fallback, batch_fallback=batch_fallback)
+    geocoder.add("1000 Deer Park Ave", "North Babylon", -73.3200, 40.7300)
+    results = geocoder.batch_geocode(["1000 Deer Park Ave North Babylon NY", "1 Main St North Babylon NY", "2 Nowhere Rd North Babylon NY"])
+    assert results == [("", point(-73.3200, 40.7300)), ("remote", point(-73.4, 40.7)), ("", None)]
+    assert batches == [["1 Main St North Babylon NY", "2 Nowhere Rd North Babylon NY"]]
+    assert geocoder.is_local("1000 Deer Park Ave North Babylon NY") and geocoder.fallbacks == 2
+
+    assert geocoder.batch_geocode(["1000 Deer Park Ave North Babylon NY"]) == [("", point(-73.3200, 40.7300))]
+    assert len(batches) == 1
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from categories import CategoryMatcher
+from utils import load_json
+
+CATEGORIES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "subcategories.json")
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return CategoryMatcher(load_json(CATEGORIES))
+
+
+@pytest.mark.parametrize("business", ["Tax Preparation", "Dog Grooming"])
+def test_similar_spelling_with_a_different_word_is_no_match(matcher, business):
+    # trigram Dice alone put these in "Meal Preparation" (0.667) and "Pet Grooming" (0.615)
+    assert matcher.match(business)[0] is None
+
+
+@pytest.mark.parametrize("business, key", [
+    ("Accounting & Tax Preparation", "Accounting & Tax Preparation"),
+    ("accounting and tax preparation", "Accounting & Tax Preparation"),
+    ("Accounting and Tax Prep", "Accounting & Tax Preparation"),
+    ("Pet Groming", "Pet Grooming"),
+    ("Resturant", "Restaurant"),
+])
+def test_variants_and_misspellings_match(matcher, business, key):
+    assert matcher.match(business)[0] == key
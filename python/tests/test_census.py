@@ -0,0 +1,83 @@
+import json
+import os
+import random
+
+import pytest
+
+from census import CensusPlaces, PackedCensusPlaces, STRTree, pack_places
+
+
+def square(x, y, size):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+PLACES = {"type": "FeatureCollection", "features": [
+    {"type": "Feature", "properties": {"NAME": "Hicksville", "GEOID": "3634374"},
+     "geometry": {"type": "Polygon", "coordinates": [square(0, 0, 4), list(reversed(square(1, 1, 2)))]}},
+    # inside Hicksville's hole
+    {"type": "Feature", "properties": {"NAME": "Bethpage"}, "geometry": {"type": "Polygon", "coordinates": [square(1, 1, 2)]}},
+    {"type": "Feature", "properties": {"NAME": "Lost Town"}, "geometry": None},
+    {"type": "Feature", "properties": {"NAME": "Long Beach"},
+     "geometry": {"type": "MultiPolygon", "coordinates": [[square(5, 0, 1)], [square(7, 0, 1)]]}},
+]}
+
+
+def write_places(path, places=PLACES):
+    with open(path, "w") as f:
+        json.dump(places, f)
+    return str(path)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_strtree_matches_brute_force(seed):
+    rng = random.Random(seed)
+    boxes = []
+    for _ in range(300):
+        x, y = rng.uniform(0, 100), rng.uniform(0, 100)
+        boxes.append((x, y, x + rng.uniform(0, 10), y + rng.uniform(0, 10)))
+    tree = STRTree(boxes, node_size=4)
+    for _ in range(200):
+        x, y = rng.uniform(-5, 110), rng.uniform(-5, 110)
+        assert tree.query(x, y) == [i for i, (x0, y0, x1, y1) in enumerate(boxes) if x0 <= x <= x1 and y0 <= y <= y1]
+    assert STRTree([]).query(0, 0) == []
+
+
+def test_packed_places_match_geojson(tmp_path):
+    filename = write_places(tmp_path / "places.json")
+    pack_places(filename, str(tmp_path / "places.bin"))
+    places, packed = CensusPlaces(PLACES), PackedCensusPlaces(str(tmp_path / "places.bin"))
+    assert packed.names == places.names
+    for i in range(len(PLACES["features"])):
+        assert packed.properties(i) == PLACES["features"][i]["properties"]
+        shape, packed_shape = places.shape(i), packed.shape(i)
+        if shape is None:
+            assert packed_shape is None
+        else:
+            assert packed_shape.type == shape.type and list(packed_shape.coords) == list(shape.coords)
+            assert list(packed_shape.rings) == list(shape.rings) and list(packed_shape.parts) == list(shape.parts)
+    for name in ["Hicksville", "Lost Town", "Long", "Massapequa"]:
+        assert packed.find(name) == places.find(name)
+    assert places.find("Lost Town") is None
+    assert places.find("Long")["type"] == "MultiPolygon"
+
+    for x, y, name in [(0.5, 0.5, "Hicksville"), (2, 2, "Bethpage"), (7.5, 0.5, "Long Beach"), (6.5, 0.5, None), (-1, -1, None)]:
+        assert places.locate(x, y) == name
+        assert packed.locate(x, y) == name
+
+
+def test_pack_is_rebuilt_when_the_source_changes(tmp_path):
+    filename = write_places(tmp_path / "places.json")
+    cache_filename = str(tmp_path / "places.bin")
+    assert CensusPlaces.load(filename, cache_filename=cache_filename).locate(7.5, 0.5) == "Long Beach"
+    assert PackedCensusPlaces.is_current(cache_filename, filename)
+
+    # the same content touched again is still current; new content is packed again
+    os.utime(filename, ns=(0, 0))
+    assert PackedCensusPlaces.is_current(cache_filename, filename)
+    moved = json.loads(json.dumps(PLACES))
+    moved["features"][3]["geometry"]["coordinates"][1] = [square(9, 0, 1)]
+    write_places(filename, moved)
+    assert not PackedCensusPlaces.is_current(cache_filename, filename)
+    places = CensusPlaces.load(filename, cache_filename=cache_filename)
+    assert places.locate(7.5, 0.5) is None and places.locate(9.5, 0.5) == "Long Beach"
+    assert PackedCensusPlaces.is_current(cache_filename, filename)
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from cluster import ClusterIndex, lat_y, lon_x, x_lon, y_lat
+
+
+def point(business_id, lon, lat, category):
+    return {"id": business_id, "category": category}, {"type": "Point", "coordinates": [lon, lat]}
+
+
+# two listings a few meters apart, a third one block away and a fourth in the next town
+POINTS = [
+    point("a", -73.3186, 40.7356, "eat_and_drink"),
+    point("b", -73.31865, 40.73562, "eat_and_drink"),
+    point("c", -73.3150, 40.7356, "services"),
+    point("d", -73.5250, 40.7680, "services"),
+    ({"id": "no-point"}, None),
+]
+
+
+def test_projection_round_trip():
+    assert x_lon(lon_x(-73.3186)) == pytest.approx(-73.3186)
+    assert y_lat(lat_y(40.7356)) == pytest.approx(40.7356)
+
+
+def test_clusters_add_up_at_every_zoom():
+    index = ClusterIndex(POINTS, 0, 16)
+    for z in range(0, 18):
+        features = list(index.features(z))
+        assert sum(f["properties"].get("point_count", 1) for f in features) == 4
+        categories = {}
+        for f in features:
+            for category, count in f["properties"].get("categories", {f["properties"].get("category"): 1}).items():
+                categories[category] = categories.get(category, 0) + count
+        assert categories == {"eat_and_drink": 2, "services": 2}
+
+    # the whole area is one cluster when zoomed out, the listings themselves past max_zoom
+    top = list(index.features(0))
+    assert len(top) == 1 and top[0]["properties"]["point_count"] == 4
+    assert top[0]["properties"]["categories"] == {"eat_and_drink": 2, "services": 2}
+    assert sorted(f["properties"]["id"] for f in index.features(17)) == ["a", "b", "c", "d"]
+
+    # a and b are still together at 16; every cluster splits up by the zoom it names
+    deepest = [f["properties"] for f in index.features(16) if f["properties"].get("cluster")]
+    assert len(deepest) == 1 and deepest[0]["point_count"] == 2 and deepest[0]["expansion_zoom"] == 17
+    for z in range(0, 17):
+        for f in index.features(z):
+            if f["properties"].get("cluster"):
+                assert f["properties"]["expansion_zoom"] > z
+                split = [g for g in index.features(f["properties"]["expansion_zoom"]) if g["properties"].get("cluster_id") == f["properties"]["cluster_id"]]
+                assert not split
+
+
+def test_save_writes_one_file_per_zoom(tmp_path):
+    filenames = ClusterIndex(POINTS, 10, 12).save(str(tmp_path / "north_babylon"), "North Babylon, NY")
+    assert filenames == [str(tmp_path / f"north_babylon-{z}.geojson") for z in (10, 11, 12)]
+    with open(filenames[0]) as f:
+        data = json.load(f)
+    assert data["name"] == "North Babylon, NY z10"
+    assert sum(f["properties"].get("point_count", 1) for f in data["features"]) == 4
@@ -0,0 +1,31 @@
+import json
+import os
+
+from config import PipelineConfig
+
+
+def test_stages_are_opted_into_per_map(tmp_path):
+    with open(tmp_path / "maps.json", "w") as f:
+        json.dump({
+            "census_places": "places.geojson",
+            "business_categories": "subcategories.json",
+            "tile_dir": "data/tiles",
+            "maps": [
+                {"name": "North Babylon, NY", "geojson": "data/north_babylon.geojson", "csv": "nb.csv", "validate_geocodes": True, "tile_dir": ""},
+                {"name": "Hicksville, NY", "geojson": "data/hicksville.geojson", "url": "https://maptoons.com/hicksville-2025.html", "publish_dir": "data/published"},
+            ],
+        }, f)
+    config = PipelineConfig(str(tmp_path / "maps.json"))
+    assert not config.validate_geocodes and not config.publish_dir and not config.feature_db and not config.batch_geocode
+    north_babylon, hicksville = [config.for_map(m) for m in config.maps]
+    assert north_babylon.validate_geocodes and north_babylon.tile_dir == "" and not north_babylon.publish_dir
+    assert not hicksville.validate_geocodes and hicksville.tile_dir == "data/tiles" and hicksville.publish_dir == "data/published"
+    assert config.tile_dir == "data/tiles" and not config.maps[0].source.incremental
+
+
+def test_shipped_config_has_optional_stages_off():
+    config = PipelineConfig(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "maps.json"))
+    for m in config.maps:
+        options = config.for_map(m)
+        assert not m.source.incremental and not options.validate_geocodes and not options.batch_geocode
+        assert not (options.logo_dir or options.cluster_dir or options.tile_dir or options.outline_dir or options.feature_db or options.publish_dir)
@@ -0,0 +1,44 @@
+import os
+import time
+
+from bench.extract import listing_page
+from conftest import FIXTURES
+from directory import LocationDirectory
+from fetch import Fetcher
+
+
+def site_server(stub_server):
+    # the fixture index, and a different generated listings page per town; towns earlier in the
+    # index answer more slowly so a pool finishes them out of order
+    with open(os.path.join(FIXTURES, "index.html"), "rb") as f:
+        index = f.read()
+    pages = {}
+    delays = {"/hicksville-2024.html": 0.2, "/north-babylon-2025.html": 0.1}
+
+    def respond(method, path, query, body):
+        if path == "/index.html":
+            return 200, {}, index
+        if path == "/long-beach.html":
+            return 404, {}, b"Not Found"
+        if path not in pages:
+            pages[path] = listing_page(5 + len(path), seed=len(path))
+        time.sleep(delays.get(path, 0))
+        return 200, {}, pages[path].encode()
+
+    server = stub_server(respond)
+    return server
+
+
+def crawl(server, workers: int):
+    fetcher = Fetcher(cache_dir="", retries=0, pool_size=workers)
+    maps = LocationDirectory("").crawl(f"http://127.0.0.1:{server.server_port}/index.html", fetcher, workers)
+    fetcher.close()
+    return [(name, m.name, [(b_id, b.properties) for b_id, b in m.features.items()]) for name, m in maps.items()]
+
+
+def test_concurrent_crawl_matches_serial(stub_server):
+    server = site_server(stub_server)
+    serial = crawl(server, 1)
+    assert [name for name, _, _ in serial] == ["Hicksville", "North Babylon", "Massapequa"]
+    assert serial[1][1] == "North Babylon, NY" and all(businesses for _, _, businesses in serial)
+    assert crawl(server, 4) == serial
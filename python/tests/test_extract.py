@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from bench.extract import index_page, listing_page, soup_businesses, soup_locations, stream_businesses, stream_locations
+from conftest import FIXTURES
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), "r") as f:
+        return f.read()
+
+
+def test_listing_page_parity():
+    html_content = read_fixture("listings.html")
+    soup, stream = soup_businesses(html_content), stream_businesses(html_content)
+    assert stream == soup
+    ids = [p["id"] for p in stream]
+    assert ids == ["theupsstore", "servpro-firenwaterr", "menonthemove-movingandselfstorage", "eastnewyork-taxservice", "uniqueimpressions", "empty"]
+    assert stream[0]["business"] == "Shipping & Printing"
+    assert stream[2]["instagram"] == "https://www.instagram.com/menonthemove/"
+
+
+def test_index_page_parity():
+    html_content = read_fixture("index.html")
+    soup, stream = soup_locations(html_content), stream_locations(html_content)
+    assert stream == soup
+    assert [(p["name"], p["year"], p["interactive"]) for p in stream][:3] == [
+        ("Hicksville", 2024, True), ("Hicksville", 2023, False), ("North Babylon", 2025, True),
+    ]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_generated_page_parity(seed):
+    html_content = listing_page(20, seed)
+    assert stream_businesses(html_content) == soup_businesses(html_content)
+    html_content = index_page(20, seed)
+    assert stream_locations(html_content) == soup_locations(html_content)
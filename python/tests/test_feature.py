@@ -0,0 +1,38 @@
+import json
+
+from directory import BusinessDirectory
+
+OUTPUT = {"type": "FeatureCollection", "name": "Hicksville, NY", "crs": {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}}, "features": [
+    {"type": "Feature", "properties": {"id": "theupsstore", "loc": 12, "business": "The UPS Store", "category": "Shipping & Printing", "town": "Hicksville"},
+     "geometry": {"type": "Point", "coordinates": [-73.5251, 40.7684]}},
+    {"type": "Feature", "properties": {"id": "dunkin", "business": "Dunkin", "category": "Restaurants", "town": "Hicksville", "address": "1 Main St"},
+     "geometry": None},
+]}
+CORRECTIONS = {"type": "FeatureCollection", "name": "corrections", "features": [
+    {"type": "Feature", "properties": {"id": "dunkin"}, "geometry": {"type": "Point", "coordinates": [-73.52, 40.77]}},
+    {"type": "Feature", "properties": {"id": "theupsstore", "phone": "516-555-0100"}, "geometry": None},
+]}
+
+
+def test_geojson_round_trip(tmp_path):
+    for name, data in [("output.geojson", OUTPUT), ("corrections.geojson", CORRECTIONS)]:
+        with open(tmp_path / name, "w") as f:
+            json.dump(data, f)
+
+    map_data = BusinessDirectory("")
+    map_data.load_geojson(str(tmp_path / "output.geojson"))
+    map_data.save_geojson(str(tmp_path / "saved.geojson"))
+    with open(tmp_path / "saved.geojson") as f:
+        assert json.load(f) == OUTPUT
+    assert not hasattr(map_data.features["dunkin"], "__dict__")
+
+    # corrections merge by id and keep key order, repeated values are shared between features
+    map_data.load_geojson(str(tmp_path / "corrections.geojson"), keep_name=True)
+    map_data.save_geojson(str(tmp_path / "saved.geojson"))
+    with open(tmp_path / "saved.geojson") as f:
+        saved = json.load(f)
+    assert saved["name"] == "Hicksville, NY"
+    assert saved["features"][0]["properties"] == dict(OUTPUT["features"][0]["properties"], phone="516-555-0100")
+    assert saved["features"][1]["geometry"] == CORRECTIONS["features"][0]["geometry"]
+    towns = [b.properties["town"] for b in map_data.features.values()]
+    assert towns[0] is towns[1]
@@ -0,0 +1,66 @@
+import json
+
+from directory import BusinessDirectory
+from featuredb import FeatureDatabase
+from feature import Business
+
+
+def point(lon, lat):
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+def test_upsert_merges_or_replaces(tmp_path):
+    db = FeatureDatabase(str(tmp_path / "features.sqlite"))
+    db.upsert("Hicksville, NY", [
+        ({"id": "a", "loc": 12, "category": "eat_and_drink", "town": "Hicksville", "phone": "516-555-0100"}, point(-73.52, 40.77)),
+        ({"id": "b", "category": "services", "town": "Hicksville"}, point(-73.53, 40.76)),
+        ({"category": "no id"}, None),
+    ])
+    assert len(db) == 2 and db.maps() == ["Hicksville, NY"]
+
+    # a correction with some keys and no geometry keeps the rest, as load_geojson does
+    assert db.upsert("Hicksville, NY", [({"id": "a", "category": "shopping"}, None)]) == 1
+    [a] = db.features(loc=12)
+    assert a["properties"] == {"id": "a", "loc": 12, "category": "shopping", "town": "Hicksville", "phone": "516-555-0100"}
+    assert a["geometry"] == point(-73.52, 40.77)
+    assert db.features(category="eat_and_drink") == [] and len(db.features(category="shopping")) == 1
+
+    # a replacement drops what it doesn't have, including the point and its R-tree entry
+    db.upsert("Hicksville, NY", [({"id": "a", "category": "shopping"}, None)], merge=False)
+    [a] = db.features(map_name="Hicksville, NY", category="shopping")
+    assert a == {"type": "Feature", "properties": {"id": "a", "category": "shopping"}, "geometry": None}
+    assert db.features(loc=12) == [] and [f["properties"]["id"] for f in db.features(missing="loc")] == ["a", "b"]
+    assert [f["properties"]["id"] for _, f in db.near(-73.52, 40.77, 5000)] == ["b"]
+    db.close()
+
+
+def test_near_and_directory_round_trip(tmp_path):
+    db = FeatureDatabase(str(tmp_path / "features.sqlite"))
+    map_data = BusinessDirectory("North Babylon, NY")
+    for b_id, category, geometry in [
+        ("deli", "eat_and_drink", point(-73.3186, 40.7356)),
+        ("pizza", "eat_and_drink", point(-73.3200, 40.7356)),
+        ("gym", "services", point(-73.3187, 40.7357)),
+        ("far", "eat_and_drink", point(-73.4, 40.7356)),
+        ("none", "eat_and_drink", None),
+    ]:
+        map_data.update_feature(b_id, {"id": b_id, "category": category}, geometry, Business)
+    db.save_directory(map_data)
+    db.upsert("Hicksville, NY", [({"id": "deli", "category": "eat_and_drink"}, point(-73.3186, 40.7356))])
+
+    # nearest first, within the radius, by category and map
+    near = db.near(-73.3186, 40.7356, 200)
+    assert [f["properties"]["id"] for _, f in near] == ["deli", "deli", "gym", "pizza"]
+    assert near[0][0] == 0 and 100 < near[-1][0] < 200
+    assert [f["properties"]["id"] for _, f in db.near(-73.3186, 40.7356, 200, category="eat_and_drink", map_name="North Babylon, NY")] == ["deli", "pizza"]
+
+    # a saved directory becomes the map exactly, and exports like the directory does
+    del map_data.features["far"]
+    db.save_directory(map_data)
+    map_data.save_geojson(str(tmp_path / "directory.geojson"))
+    db.save_geojson("North Babylon, NY", str(tmp_path / "db.geojson"))
+    with open(tmp_path / "directory.geojson") as f, open(tmp_path / "db.geojson") as g:
+        assert json.load(f) == json.load(g)
+    copy = db.to_directory("North Babylon, NY", BusinessDirectory())
+    assert copy.name == "North Babylon, NY" and list(copy.features) == ["deli", "pizza", "gym", "none"]
+    db.close()
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from fetch import Fetcher, OfflineMiss
+
+PAGE = b"<html><body>Hicksville</body></html>"
+LAST_MODIFIED = "Wed, 01 Oct 2025 00:00:00 GMT"
+
+
+def page_server(stub_server):
+    # a page that is only sent when the client's copy is out of date
+    def respond(method, path, query, body):
+        request = server.headers[-1]
+        if request.get("If-None-Match") == '"v1"' or request.get("If-Modified-Since") == LAST_MODIFIED:
+            return 304, {}, b""
+        return 200, {"ETag": '"v1"', "Last-Modified": LAST_MODIFIED}, PAGE
+
+    server = stub_server(respond)
+    return server
+
+
+def test_not_modified_is_a_cache_hit(stub_server, tmp_path):
+    server = page_server(stub_server)
+    url = f"http://127.0.0.1:{server.server_port}/hicksville.html"
+    fetcher = Fetcher(cache_dir=str(tmp_path), retries=0)
+    assert fetcher.get(url) == PAGE
+    assert fetcher.get(url) == PAGE
+    assert server.headers[1]["If-None-Match"] == '"v1"' and server.headers[1]["If-Modified-Since"] == LAST_MODIFIED
+    assert "If-None-Match" not in server.headers[0]
+    assert fetcher.stats == {"requests": 2, "not_modified": 1, "cached": 0}
+    fetcher.close()
+
+    # within max_age the cached page is used without asking
+    fresh = Fetcher(cache_dir=str(tmp_path), retries=0, max_age=3600)
+    assert fresh.get(url) == PAGE
+    assert fresh.stats["cached"] == 1 and len(server.requests) == 2
+    fresh.close()
+
+
+def test_offline_replays_the_cache(stub_server, tmp_path):
+    server = page_server(stub_server)
+    base = f"http://127.0.0.1:{server.server_port}"
+    Fetcher(cache_dir=str(tmp_path), retries=0).get(f"{base}/hicksville.html")
+
+    offline = Fetcher(cache_dir=str(tmp_path), offline=True)
+    assert offline.get(f"{base}/hicksville.html") == PAGE
+    with pytest.raises(OfflineMiss):
+        offline.get(f"{base}/long-beach.html")
+    assert offline.stats == {"requests": 0, "not_modified": 0, "cached": 1}
+    assert len(server.requests) == 1
+
+
+def test_rate_is_per_host(stub_server):
+    server = stub_server(lambda method, path, query, body: (200, {}, PAGE))
+    hosts = [f"http://127.0.0.1:{server.server_port}", f"http://localhost:{server.server_port}"]
+    fetcher = Fetcher(cache_dir="", retries=0, rate=5)
+    assert fetcher._bucket(f"{hosts[0]}/a.html") is fetcher._bucket(f"{hosts[0]}/b.html")
+    assert fetcher._bucket(f"{hosts[0]}/a.html") is not fetcher._bucket(f"{hosts[1]}/a.html")
+
+    # the first request to each host goes straight out, the next ones wait 1/rate each
+    start = time.monotonic()
+    for host in hosts:
+        fetcher.get(f"{host}/a.html")
+    assert time.monotonic() - start < 0.15
+    for i in range(3):
+        fetcher.get(f"{hosts[0]}/{i}.html")
+    assert time.monotonic() - start >= 0.59
+    assert fetcher.stats["requests"] == 5
+    fetcher.close()
@@ -0,0 +1,45 @@
+from geocache import GeocodeCache
+
+POINT = {"type": "Point", "coordinates": [-73.52, 40.77]}
+
+
+def test_candidates_are_cached(tmp_path):
+    calls = []
+
+    def candidate_geocoder(query):
+        calls.append(query)
+        return [("47 Elliot Drive, Hicksville, NY", POINT), ("Elliot Drive, Hicksville, NY", POINT)]
+
+    cache = GeocodeCache(str(tmp_path / "cache.sqlite"), candidate_geocoder=candidate_geocoder)
+    first = cache.candidates("47 Elliot Drive  Hicksville NY")
+    assert cache.candidates("47 elliot drive hicksville ny") == first
+    assert len(first) == 2 and calls == ["47 Elliot Drive  Hicksville NY"]
+    cache.close()
+
+    offline = GeocodeCache(str(tmp_path / "cache.sqlite"), candidate_geocoder=candidate_geocoder, offline=True)
+    assert offline.candidates("47 Elliot Drive Hicksville NY") == first
+    assert offline.candidates("7 Elliot Drive Hicksville NY") == []
+    assert len(calls) == 1
+    offline.close()
+
+
+def test_no_result_answers_expire(tmp_path):
+    answers = {"1 Nowhere Rd Hicksville NY": [("", None), ("1 Nowhere Road, Hicksville, NY", POINT)]}
+    calls = []
+
+    def geocoder(query):
+        calls.append(query)
+        return answers[query].pop(0)
+
+    cache = GeocodeCache(str(tmp_path / "cache.sqlite"), geocoder=geocoder, negative_ttl=60)
+    assert cache.geocode("1 Nowhere Rd Hicksville NY") == ("", None)
+    assert cache.geocode("1 Nowhere Rd Hicksville NY") == ("", None)
+    assert len(calls) == 1
+
+    # once negative_ttl has passed the miss is asked again, an answer is kept for good
+    cache.put("1 Nowhere Rd Hicksville NY", "", None, timestamp=0)
+    assert cache.geocode("1 Nowhere Rd Hicksville NY") == ("1 Nowhere Road, Hicksville, NY", POINT)
+    assert len(calls) == 2
+    cache.put("2 Nowhere Rd Hicksville NY", "", None, timestamp=0)
+    assert cache.expire() == 1 and len(cache) == 1
+    cache.close()
@@ -0,0 +1,87 @@
+import pytest
+import requests
+
+from directory import BusinessDirectory
+from feature import Business
+from geocoder import GeocodeEngine
+from utils import batch_geocode
+
+
+def geoapify_feature(text: str):
+    return {"properties": {"formatted": f"{text} (formatted)"}, "geometry": {"type": "Point", "coordinates": [-73.4, 40.7]}}
+
+
+def test_429_then_200_is_retried(stub_server):
+    # every query is turned away once with a 429 and Retry-After before it is answered
+    seen = set()
+
+    def respond(method, path, query, body):
+        text = query["text"][0]
+        if text not in seen:
+            seen.add(text)
+            return 429, {"Retry-After": "0"}, {"message": "Too Many Requests"}
+        return 200, {}, {"features": [geoapify_feature(text)]}
+
+    server = stub_server(respond)
+    engine = GeocodeEngine(url=f"http://127.0.0.1:{server.server_port}/v1/geocode/search", rate=0, workers=2)
+    assert engine.geocode("1 Main St Hicksville NY") == ("1 Main St Hicksville NY (formatted)", {"type": "Point", "coordinates": [-73.4, 40.7]})
+    assert engine.requests == 2
+
+    directory = BusinessDirectory("Hicksville, NY")
+    for i in range(4):
+        directory.update_feature(f"b{i}", {"id": f"b{i}", "address": f"{i + 2} Main St"}, None, Business)
+    directory.geocode(engine.geocode, workers=2)
+    assert all(b.geometry for b in directory.features.values())
+    assert len(server.requests) == 2 + 2 * 4
+    engine.close()
+
+
+def test_retries_run_out(stub_server):
+    server = stub_server(lambda method, path, query, body: (503, {}, {"message": "unavailable"}))
+    engine = GeocodeEngine(url=f"http://127.0.0.1:{server.server_port}/v1/geocode/search", rate=0, retries=2, backoff=0)
+    with pytest.raises(requests.HTTPError) as e:
+        engine.geocode("1 Main St Hicksville NY")
+    assert e.value.response.status_code == 503
+    assert len(server.requests) == 3
+    engine.close()
+
+
+def test_batch_job_is_polled_and_failed_items_retried(stub_server):
+    # the job is pending for two polls; the second address fails in the batch and is geocoded on its own
+    polls = []
+
+    def respond(method, path, query, body):
+        if path.endswith("/batch/geocode/search") and method == "POST":
+            return 202, {}, {"id": "job1"}
+        if path.endswith("/batch/geocode/search"):
+            polls.append(query["id"])
+            if len(polls) < 3:
+                return 202, {}, {"id": "job1", "status": "pending"}
+            return 200, {}, [
+                {"formatted": "1 Main Street, Hicksville, NY", "lat": 40.77, "lon": -73.52},
+                {"error": "Not found"},
+            ]
+        return 200, {}, {"features": [geoapify_feature(" ".join(query["text"][0].split()))]}
+
+    server = stub_server(respond)
+    base = f"http://127.0.0.1:{server.server_port}"
+    engine = GeocodeEngine(url=f"{base}/v1/geocode/search", batch_url=f"{base}/v1/batch/geocode/search", rate=0)
+    directory = BusinessDirectory("Hicksville, NY")
+    directory.update_feature("a", {"id": "a", "address": "1 Main St"}, None, Business)
+    directory.update_feature("b", {"id": "b", "address": "2 Nowhere Rd"}, None, Business)
+
+    results = directory.geocode_batch(lambda queries: batch_geocode(queries, session=engine.session, url=engine.batch_url, poll_interval=0), engine.geocode)
+    method, _, _, body = server.requests[0]
+    assert method == "POST" and [" ".join(text.split()) for text in body] == ["1 Main St Hicksville NY", "2 Nowhere Rd Hicksville NY"]
+    assert polls == [["job1"]] * 3
+    assert results["a"] == ("1 Main Street, Hicksville, NY", {"type": "Point", "coordinates": [-73.52, 40.77]})
+    assert results["b"] == ("2 Nowhere Rd Hicksville NY (formatted)", {"type": "Point", "coordinates": [-73.4, 40.7]})
+    assert [method for method, path, _, _ in server.requests if "batch" not in path] == ["GET"]
+    engine.close()
+
+
+def test_batch_texts_are_not_escaped(stub_server):
+    server = stub_server(lambda method, path, query, body: (200, {}, [{"formatted": text, "lat": 40.7, "lon": -73.4} for text in body]))
+    results = batch_geocode(["  Dunkin' & Co, 1 \"Main\" St  "], url=f"http://127.0.0.1:{server.server_port}/v1/batch/geocode/search")
+    assert server.requests[0][3] == ["Dunkin' & Co, 1 \"Main\" St"]
+    assert results[0][0] == "Dunkin' & Co, 1 \"Main\" St"
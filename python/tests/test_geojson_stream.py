@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from geojson_stream import FeatureReader, FeatureWriter
+
+POINT = {"type": "Point", "coordinates": [-73.52, 40.77]}
+
+
+def features():
+    yield {"type": "Feature", "properties": {"id": "a"}, "geometry": POINT}
+    raise RuntimeError("scrape failed")
+
+
+def test_error_keeps_the_old_file(tmp_path):
+    filename = str(tmp_path / "map.geojson")
+    with FeatureWriter(filename, {"type": "FeatureCollection", "name": "Hicksville, NY"}) as writer:
+        writer.write({"type": "Feature", "properties": {"id": "old"}, "geometry": POINT})
+
+    with pytest.raises(RuntimeError):
+        with FeatureWriter(filename, {"type": "FeatureCollection", "name": "Hicksville, NY"}) as writer:
+            for feature in features():
+                writer.write(feature)
+    assert [f["properties"]["id"] for f in FeatureReader(filename)] == ["old"]
+    assert [p.name for p in tmp_path.iterdir()] == ["map.geojson"]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_layout_matches_json_dump(tmp_path, compact):
+    filename = str(tmp_path / "map.geojson")
+    collection = {"type": "FeatureCollection", "name": "Café", "features": [
+        {"type": "Feature", "properties": {"id": str(i), "name": "Café"}, "geometry": POINT} for i in range(3)
+    ]}
+    with FeatureWriter(filename, {"type": "FeatureCollection", "name": "Café"}, compact) as writer:
+        for feature in collection["features"]:
+            writer.write(feature)
+    with open(filename, "r") as f:
+        text = f.read()
+    assert json.loads(text) == collection
+    if not compact:
+        assert text == json.dumps(collection, indent=4, ensure_ascii=False)
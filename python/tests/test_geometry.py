@@ -0,0 +1,58 @@
+import math
+import random
+
+import pytest
+
+from geometry import area, centroid, contains, contains_many, from_geojson, to_geojson
+
+# a 4x4 square with a 2x2 hole (clockwise, as GeoJSON holes are), next to a unit square
+SQUARE_WITH_HOLE = [[[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]], [[1, 1], [1, 3], [3, 3], [3, 1], [1, 1]]]
+UNIT_SQUARE = [[[5, 0], [6, 0], [6, 1], [5, 1], [5, 0]]]
+MULTIPOLYGON = from_geojson({"type": "MultiPolygon", "coordinates": [SQUARE_WITH_HOLE, UNIT_SQUARE]})
+
+
+def test_geojson_round_trip():
+    for geometry in [
+        {"type": "Point", "coordinates": [1, 2]},
+        {"type": "LineString", "coordinates": [[0, 0], [1, 1]]},
+        {"type": "Polygon", "coordinates": SQUARE_WITH_HOLE},
+        {"type": "MultiPolygon", "coordinates": [SQUARE_WITH_HOLE, UNIT_SQUARE]},
+    ]:
+        assert to_geojson(from_geojson(geometry)) == geometry
+
+
+def test_holes_and_parts():
+    assert contains(MULTIPOLYGON, 0.5, 0.5) and contains(MULTIPOLYGON, 5.5, 0.5)
+    assert not contains(MULTIPOLYGON, 2, 2) and not contains(MULTIPOLYGON, 4.5, 0.5)
+    assert area(MULTIPOLYGON) == 16 - 4 + 1
+    # the hole is centered, so only the unit square pulls the centroid right: (12 * 2 + 1 * 5.5) / 13
+    assert centroid(MULTIPOLYGON) == pytest.approx((29.5 / 13, 2 * 12 / 13 + 0.5 / 13))
+
+
+def test_winding_does_not_matter():
+    reversed_rings = [list(reversed(ring)) for ring in SQUARE_WITH_HOLE]
+    shape = from_geojson({"type": "Polygon", "coordinates": reversed_rings})
+    assert area(shape) == 12 and centroid(shape) == pytest.approx((2, 2))
+
+
+def test_lines_contain_nothing():
+    line = from_geojson({"type": "LineString", "coordinates": [[0, 0], [4, 4], [0, 4]]})
+    assert area(line) == 0 and not contains(line, 1, 3)
+    assert contains_many(line, [1, 2], [3, 3]) == [False, False]
+    assert centroid(line) == pytest.approx((4 / 3, 8 / 3))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_contains_many_matches_contains(seed):
+    rng = random.Random(seed)
+    # a random star-shaped polygon with a hole, plus points on its vertices' x and y lines
+    ring = []
+    for i in range(40):
+        angle, radius = 2 * math.pi * i / 40, rng.uniform(2, 5)
+        ring.append([radius * math.cos(angle), radius * math.sin(angle)])
+    ring.append(ring[0])
+    hole = [[-1, -1], [-1, 1], [1, 1], [1, -1], [-1, -1]]
+    shape = from_geojson({"type": "MultiPolygon", "coordinates": [[ring, hole], UNIT_SQUARE]})
+    xs = [rng.uniform(-6, 7) for _ in range(500)] + [x for x, _ in ring] + [0, 1, 5.5]
+    ys = [rng.uniform(-6, 6) for _ in range(500)] + [y for _, y in ring] + [0, 0, 0.5]
+    assert contains_many(shape, xs, ys) == [contains(shape, x, y) for x, y in zip(xs, ys)]
@@ -0,0 +1,63 @@
+import json
+
+from census import CensusPlaces
+from directory import BusinessDirectory
+from feature import Business
+from geovalidate import GeocodeValidator
+
+PLACES = CensusPlaces({"type": "FeatureCollection", "features": [
+    {"type": "Feature", "properties": {"NAME": "Hicksville"}, "geometry": {"type": "Polygon", "coordinates": [
+        [[-73.55, 40.75], [-73.50, 40.75], [-73.50, 40.79], [-73.55, 40.79], [-73.55, 40.75]],
+    ]}},
+]})
+
+
+def point(lon, lat):
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+# 1 Main St was placed in the next town; of its candidates the one in Hicksville with a house
+# number wins over a street centroid in town and the numbered address out of town
+CANDIDATES = {
+    "1 Main St": [
+        ("Main Street, Hicksville, NY", point(-73.52, 40.77)),
+        ("1 Main Street, Hicksville, NY", point(-73.525, 40.765)),
+        ("1 Main Street, Bethpage, NY", point(-73.48, 40.74)),
+    ],
+    "2 Far Rd": [("2 Far Road, Albany, NY", point(-73.75, 42.65))],
+}
+
+
+def test_best_candidate_in_town(tmp_path):
+    validator = GeocodeValidator(PLACES, tolerance=500)
+    assert validator.distances([(-73.52, 40.77, "Hicksville"), (-73.502, 40.77, "Hicksville"), (-73.52, 40.77, "Nowhere")]) == [0.0, 0.0, None]
+    assert 1000 < validator.distances([(-73.45, 40.77, "Hicksville")])[0] < 5000
+    assert validator.score(0, "Main Street") < validator.score(0, "1 Main Street") == 1.0
+
+    map_data = BusinessDirectory("Hicksville, NY")
+    for b_id, address, geometry in [
+        ("inside", "5 Broadway", point(-73.52, 40.77)),
+        ("moved", "1 Main St", point(-73.45, 40.77)),
+        ("stuck", "2 Far Rd", point(-73.45, 40.78)),
+        ("skipped", "3 Other Rd", point(-73.45, 40.76)),
+    ]:
+        map_data.update_feature(b_id, {"id": b_id, "address": address, "town": "Hicksville", "address_formatted": address}, geometry, Business)
+
+    queries = []
+
+    def candidate_geocoder(query):
+        queries.append(query)
+        return next(candidates for address, candidates in CANDIDATES.items() if query.startswith(address))
+
+    review_filename = str(tmp_path / "hicksville.geojson.review.geojson")
+    result = map_data.validate_geocodes(validator, candidate_geocoder, review_filename, recheck=["inside", "moved", "stuck"])
+    assert sorted(" ".join(query.split()) for query in queries) == ["1 Main St Hicksville NY", "2 Far Rd Hicksville NY"]
+    assert result["validated"] == 4 and list(result["fixed"]) == ["moved"]
+    assert map_data.features["moved"].geometry == point(-73.525, 40.765)
+    assert map_data.features["moved"].properties["address_formatted"] == "1 Main Street, Hicksville, NY"
+    assert map_data.features["stuck"].geometry == point(-73.45, 40.78)
+    assert sorted(result["review"]) == ["skipped", "stuck"]
+    with open(review_filename) as f:
+        review = json.load(f)
+    assert sorted(f["properties"]["id"] for f in review["features"]) == ["skipped", "stuck"]
+    assert all(f["properties"]["distance_m"] > 500 for f in review["features"])
@@ -0,0 +1,48 @@
+import csv
+import json
+
+from directory import BusinessDirectory
+from manifest import Manifest
+
+COLUMNS = ["LOC", "Business", "Phone", "Address", "Town", "Website", "Category", "DL Info", "Shoppers Discount", "Exp."]
+POINT = {"type": "Point", "coordinates": [-73.32, 40.73]}
+
+
+def row(loc, name, address):
+    return {"LOC": str(loc), "Business": name, "Phone": "", "Address": address, "Town": "North Babylon", "Website": "", "Category": "Deli", "DL Info": "", "Shoppers Discount": "", "Exp.": ""}
+
+
+def test_first_incremental_run_over_an_existing_output(tmp_path):
+    # an output from before manifests existed; the run is offline, so the geocoder finds nothing
+    output = str(tmp_path / "north_babylon.geojson")
+    with open(output, "w") as f:
+        json.dump({"type": "FeatureCollection", "name": "North Babylon, NY", "features": [
+            {"type": "Feature", "properties": {"id": "menonthemove", "address": "150 Crossways Park Dr", "address_formatted": "150 Crossways Park Drive"}, "geometry": POINT},
+            {"type": "Feature", "properties": {"id": "mcdonalds", "address": "1 Old Address Rd"}, "geometry": POINT},
+        ]}, f)
+    listings = str(tmp_path / "listings.csv")
+    with open(listings, "w", newline="") as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        writer.writerows([row(1, "Men on the Move", "150 Crossways Park Dr"), row(2, "McDonalds", "2 New Address Rd"), row(3, "New Deli", "3 Main St")])
+
+    map_data = BusinessDirectory("North Babylon, NY")
+    map_data.load_csv(listings)
+    manifest = Manifest(output + ".manifest.json")
+    changed = map_data.changed_since(output, manifest)
+    assert sorted(changed.features) == ["mcdonalds", "menonthemove", "newdeli"]
+    changed.geocode(lambda query: ("", None))
+
+    # the same address keeps its point, a moved or new business has none until it is geocoded
+    assert map_data.features["menonthemove"].geometry == POINT
+    assert map_data.features["menonthemove"].properties["address_formatted"] == "150 Crossways Park Drive"
+    assert map_data.features["mcdonalds"].geometry is None
+    assert map_data.features["newdeli"].geometry is None
+
+    # the next run has a manifest and reprocesses nothing
+    map_data.save_geojson(output)
+    manifest.save()
+    again = BusinessDirectory("North Babylon, NY")
+    again.load_csv(listings)
+    assert not again.changed_since(output, Manifest(output + ".manifest.json")).features
+    assert again.features["menonthemove"].geometry == POINT
@@ -0,0 +1,26 @@
+from linkage import LinkRecord, RecordLinker
+
+
+def test_address_alone_does_not_link_businesses_in_one_building():
+    linker = RecordLinker([LinkRecord(33, "The UPS Store", "516-822-8404", "17B E. Old Country Rd.")])
+    servpro = LinkRecord(None, "Servpro Fire n Water", "", "17B East Old Country Road, Suite 328, Hicksvile, New York")
+    assert linker.match(servpro)[0] is None
+    ups = LinkRecord(None, "UPS Store", "", "17B East Old Country Road, Hicksville, NY")
+    assert linker.match(ups)[0].loc == 33
+
+
+def test_different_units_are_different_businesses():
+    a = LinkRecord(1, "Smith Dental", "", "120 Bethpage Rd. Suite 301")
+    b = LinkRecord(None, "Smith Family Dentistry", "", "120 Bethpage Road, Suite 302, Hicksville")
+    c = LinkRecord(None, "Smith Family Dentistry", "", "120 Bethpage Road, Suite 301, Hicksville")
+    assert a.unit == "#301"
+    assert a.score(b) < a.score(c)
+
+
+def test_tie_is_no_match():
+    linker = RecordLinker([
+        LinkRecord(108, "Men on the Move", "516-773-6683", "150 Crossways Park Dr. W."),
+        LinkRecord(109, "Men on the Move", "516-773-6683", "150 Crossways Park Dr. W."),
+    ])
+    row, score = linker.match(LinkRecord(None, "Men on the Move", "(516) 773-6683", "150 Crossways Park Drive West, Woodbury"))
+    assert row is None and score > linker.min_score
@@ -0,0 +1,18 @@
+import json
+import os
+
+from PIL import Image
+
+from logos import build_logos
+
+
+def test_cached_sprites_serialize_like_a_build(tmp_path):
+    for i, (width, height) in enumerate([(200, 100), (80, 160), (40, 40)]):
+        Image.new("RGBA", (width, height), (255, 0, 0, 255)).save(tmp_path / f"HK-{i + 1}S.png")
+    pattern = str(tmp_path / "*.png")
+    prefix = os.path.join(tmp_path, "out", "hicksville")
+
+    built = build_logos(pattern, prefix)
+    cached = build_logos(pattern, prefix)
+    assert list(built["HK-1S"]) == ["32", "64", "128"]
+    assert json.dumps(cached) == json.dumps(built)
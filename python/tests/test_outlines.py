@@ -0,0 +1,60 @@
+import json
+import math
+
+from census import CensusPlaces
+from directory import BusinessDirectory
+from feature import Business
+from geometry import area, contains, from_geojson, quantize, simplify
+
+
+def circle(cx, cy, radius, n=200):
+    ring = [[cx + radius * math.cos(2 * math.pi * i / n), cy + radius * math.sin(2 * math.pi * i / n)] for i in range(n)]
+    return ring + [ring[0]]
+
+
+def test_simplify_keeps_the_shape():
+    ring = circle(0, 0, 1)
+    shape = from_geojson({"type": "Polygon", "coordinates": [ring, list(reversed(circle(0, 0, 0.5)))]})
+    coarse = simplify(shape, tolerance=0.01)
+    assert len(coarse) < len(shape) / 4
+    assert abs(area(coarse) - area(shape)) < 0.05 * area(shape)
+    assert contains(coarse, 0.75, 0) and not contains(coarse, 0, 0)
+
+    budget = simplify(shape, max_vertices=40)
+    assert len(budget) <= 40 and len(budget.rings) == 3
+    # every ring keeps at least three distinct vertices, closed
+    tiny = simplify(shape, tolerance=10)
+    for i in range(len(tiny.rings) - 1):
+        xs, ys = tiny.ring(i)
+        assert len(set(zip(xs, ys))) >= 3 and (xs[0], ys[0]) == (xs[-1], ys[-1])
+    assert simplify(shape) is not shape and len(simplify(shape)) == len(shape)
+
+
+def test_quantize_drops_repeated_vertices_and_collapsed_holes():
+    shape = from_geojson({"type": "Polygon", "coordinates": [
+        [[0, 0], [1.0001, 0], [1.00012, 0.00001], [1, 1], [0, 1], [0, 0]],
+        [[0.5, 0.5], [0.50001, 0.5], [0.50001, 0.50001], [0.5, 0.5]],
+    ]})
+    rounded = quantize(shape, 3)
+    assert len(rounded.rings) == 2
+    assert list(rounded.coords) == [0, 0, 1, 0, 1, 1, 0, 1, 0, 0]
+
+
+def test_save_outlines(tmp_path):
+    places = CensusPlaces({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"NAME": "North Babylon"}, "geometry": {"type": "Polygon", "coordinates": [circle(-73.32, 40.73, 0.02)]}},
+        {"type": "Feature", "properties": {"NAME": "Hicksville"}, "geometry": {"type": "Polygon", "coordinates": [circle(-73.52, 40.77, 0.02)]}},
+    ]})
+    map_data = BusinessDirectory("North Babylon, NY")
+    map_data.update_feature("a", {"id": "a", "town": "North Babylon"}, None, Business)
+    map_data.update_feature("b", {"id": "b", "town": "North Babylon"}, None, Business)
+    map_data.update_feature("c", {"id": "c"}, None, Business)
+
+    report = map_data.save_outlines(str(tmp_path / "north_babylon-towns.geojson"), places, tolerance=0.0005)
+    before, after, size, new_size = report["North Babylon"]
+    assert before == 201 and after < before and new_size < size
+    with open(tmp_path / "north_babylon-towns.geojson") as f:
+        saved = json.load(f)
+    assert saved["name"] == "North Babylon, NY"
+    assert [f["properties"]["name"] for f in saved["features"]] == ["North Babylon"]
+    assert saved["features"][0]["geometry"]["type"] == "Polygon"
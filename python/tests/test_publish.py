@@ -0,0 +1,75 @@
+import json
+import random
+
+from publish import PublishedMap, apply_delta, content_digest, diff, squash
+
+
+def feature(feature_id, **properties):
+    geometry = properties.pop("geometry", {"type": "Point", "coordinates": [-73.32, 40.73]})
+    return {"type": "Feature", "properties": {"id": feature_id, **properties}, "geometry": geometry}
+
+
+VERSIONS = [
+    [feature("a", name="Deli"), feature("b", name="Gym"), feature("c/d", name="Slash ~ Tilde")],
+    # a property changes, one is removed, a feature is added
+    [feature("a", name="Deli & Pizza"), feature("b"), feature("c/d", name="Slash ~ Tilde"), feature("e", name="New")],
+    # a point moves, a feature goes away, the new one changes again
+    [feature("a", name="Deli & Pizza", geometry={"type": "Point", "coordinates": [-73.33, 40.74]}), feature("b"), feature("e", name="Newer")],
+    # removed and added back
+    [feature("a", name="Deli & Pizza", geometry={"type": "Point", "coordinates": [-73.33, 40.74]}), feature("e", name="Newer"), feature("c/d", name="Back")],
+    [feature("a", name="Deli & Pizza", geometry=None), feature("e", name="Newer", phone="516"), feature("c/d", name="Back")],
+]
+
+
+def by_id(features):
+    return {f["properties"]["id"]: f for f in features}
+
+
+def read_delta(published, entry):
+    with open(published._path(entry["file"])) as f:
+        return json.load(f)
+
+
+def catch_up(published, features, version):
+    for entry in published.deltas_since(version):
+        features = apply_delta(features, read_delta(published, entry))
+    return features
+
+
+def test_publish_diff_squash_apply_round_trip(tmp_path):
+    published = PublishedMap(str(tmp_path / "north_babylon"))
+    for features in VERSIONS:
+        assert published.publish("North Babylon, NY", features)
+    assert published.publish("North Babylon, NY", VERSIONS[-1]) is None
+    assert published.manifest["latest"] == 5 and len(published.manifest["deltas"]) == 4
+    latest = published.latest()
+    assert content_digest(latest) == published.manifest["hash"] == content_digest(by_id(VERSIONS[-1]))
+
+    # a client at any version patches its copy to the latest one
+    for version, features in enumerate(VERSIONS, 1):
+        assert content_digest(catch_up(published, by_id(features), version)) == published.manifest["hash"]
+
+    # once squashed, old clients need one delta, those in between download latest.geojson again
+    entry = PublishedMap(str(tmp_path / "north_babylon")).compact(keep=1)
+    published = PublishedMap(str(tmp_path / "north_babylon"))
+    assert (entry["from"], entry["to"]) == (1, 4)
+    assert [e["file"] for e in published.deltas_since(1)] == ["delta-1-4.json", "delta-4-5.json"]
+    assert published.deltas_since(2) is None and published.deltas_since(3) is None
+    assert sorted(path.name for path in (tmp_path / "north_babylon").glob("delta-*")) == ["delta-1-4.json", "delta-4-5.json"]
+    for version in [1, 4, 5]:
+        assert content_digest(catch_up(published, by_id(VERSIONS[version - 1]), version)) == published.manifest["hash"]
+
+
+def test_squash_matches_applying_in_order():
+    rng = random.Random(1)
+    for _ in range(50):
+        versions = []
+        for _ in range(5):
+            ids = rng.sample("abcdef", rng.randint(0, 6))
+            versions.append({i: feature(i, name=rng.choice(["x", "y"]), **({"tag": 1} if rng.random() < 0.5 else {})) for i in ids})
+        deltas = [{"from": k, "to": k + 1, **diff(old, new)} for k, (old, new) in enumerate(zip(versions, versions[1:]))]
+        stepwise = versions[0]
+        for delta in deltas:
+            stepwise = apply_delta(stepwise, delta)
+        assert stepwise == versions[-1]
+        assert content_digest(apply_delta(versions[0], squash(deltas))) == content_digest(versions[-1])
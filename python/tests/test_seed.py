@@ -0,0 +1,36 @@
+import json
+
+from directory import load_corrected
+from geocache import GeocodeCache
+
+OLD = {"type": "Point", "coordinates": [-73.60, 40.58]}
+FIXED = {"type": "Point", "coordinates": [-73.65, 40.59]}
+
+
+def write(path, name, features):
+    with open(path, "w") as f:
+        json.dump({"type": "FeatureCollection", "name": name, "features": features}, f)
+    return str(path)
+
+
+def test_seed_layers_id_only_corrections_over_the_output(tmp_path):
+    output = write(tmp_path / "long_beach.geojson", "Long Beach, NY", [
+        {"type": "Feature", "properties": {"id": "vfw", "address": "675 W. Park Avenue", "address_formatted": "675 West Park Avenue, Long Beach, NY"}, "geometry": OLD},
+        {"type": "Feature", "properties": {"id": "deli", "address": "10 E. Park Avenue"}, "geometry": OLD},
+    ])
+    corrections = write(tmp_path / "long_beach-corrections.geojson", "Long Beach Corrections", [
+        {"type": "Feature", "properties": {"id": "vfw"}, "geometry": FIXED},
+    ])
+    other = write(tmp_path / "other.geojson", "Other Corrections", [
+        {"type": "Feature", "properties": {"id": "x", "address": "1 Main St"}, "geometry": OLD},
+    ])
+    maps = {output: ("Long Beach, NY", corrections)}
+
+    loaded = list(load_corrected([str(tmp_path / "*.geojson")], maps))
+    assert [filename for filename, _ in loaded] == [output, other]
+
+    cache = GeocodeCache(str(tmp_path / "cache.sqlite"), offline=True)
+    assert [cache.seed(map_data) for _, map_data in loaded] == [2, 0]
+    assert cache.geocode("675 W. Park Avenue Long Beach NY")[1] == FIXED
+    assert cache.geocode("10 E. Park Avenue Long Beach NY")[1] == OLD
+    cache.close()
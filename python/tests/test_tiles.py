@@ -0,0 +1,70 @@
+import json
+import os
+
+import pytest
+
+from geometry import area, clip, from_geojson
+from tiles import MAX_TILES_PER_FEATURE, feature_tiles, quadkey, save_tiles, tile_bounds, tile_xy
+
+
+def square(x, y, size):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+def test_clip_to_a_box():
+    shape = from_geojson({"type": "Polygon", "coordinates": [square(0, 0, 4), list(reversed(square(1, 1, 2)))]})
+    assert area(clip(shape, (0, 0, 2, 2))) == pytest.approx(3)
+    assert area(clip(shape, (-1, -1, 5, 5))) == pytest.approx(12)
+    assert clip(shape, (1.5, 1.5, 2.5, 2.5)) is None  # inside the hole
+    assert clip(shape, (4, 0, 5, 4)) is None  # touches an edge only
+    parts = from_geojson({"type": "MultiPolygon", "coordinates": [[square(0, 0, 1)], [square(5, 0, 1)]]})
+    clipped = clip(parts, (4, -1, 7, 2))
+    assert clipped.type == "MultiPolygon" and len(clipped.parts) == 2 and area(clipped) == pytest.approx(1)
+
+
+def test_quadkey():
+    assert quadkey(3, 5, 3) == "213"
+    x, y = tile_xy(-73.3186, 40.7356, 12)
+    x0, y0, x1, y1 = tile_bounds(x, y, 12)
+    assert x0 <= -73.3186 < x1 and y0 <= 40.7356 < y1
+
+
+def test_large_polygons_are_clipped_to_their_tiles():
+    # about 12x12 tiles at zoom 12, with a hole of a few tiles
+    outline = {"type": "Polygon", "coordinates": [square(-73.6, 40.6, 1.0), list(reversed(square(-73.2, 40.9, 0.2)))]}
+    tiles = feature_tiles(outline, 12)
+    assert len(tiles) > MAX_TILES_PER_FEATURE
+    total = 0.0
+    for x, y, geometry in tiles:
+        x0, y0, x1, y1 = tile_bounds(x, y, 12)
+        shape = from_geojson(geometry)
+        assert all(x0 - 1e-9 <= cx <= x1 + 1e-9 for cx in shape.coords[0::2])
+        assert all(y0 - 1e-9 <= cy <= y1 + 1e-9 for cy in shape.coords[1::2])
+        total += area(shape)
+    assert total == pytest.approx(1.0 - 0.04)
+    # small polygons go whole to every tile they overlap
+    small = {"type": "Polygon", "coordinates": [square(-73.32, 40.73, 0.1)]}
+    assert all(geometry is None for _, _, geometry in feature_tiles(small, 12))
+
+
+def test_save_tiles_only_rewrites_changed_tiles(tmp_path):
+    features = [
+        {"type": "Feature", "properties": {"id": "b"}, "geometry": {"type": "Point", "coordinates": [-73.3186, 40.7356]}},
+        {"type": "Feature", "properties": {"id": "a"}, "geometry": {"type": "Point", "coordinates": [-73.3187, 40.7357]}},
+        {"type": "Feature", "properties": {"id": "hk"}, "geometry": {"type": "Point", "coordinates": [-73.5250, 40.7680]}},
+        {"type": "Feature", "properties": {"id": "none"}, "geometry": None},
+    ]
+    out_dir = str(tmp_path / "north_babylon")
+    index = save_tiles("North Babylon, NY", features, out_dir, [12])
+    assert sorted(tile["count"] for tile in index["tiles"].values()) == [1, 2]
+    x, y = tile_xy(-73.3186, 40.7356, 12)
+    filename = os.path.join(out_dir, "12", str(x), f"{y}.geojson")
+    with open(filename) as f:
+        assert [f["properties"]["id"] for f in json.load(f)["features"]] == ["a", "b"]
+
+    os.utime(filename, (0, 0))
+    index = save_tiles("North Babylon, NY", features[:2], out_dir, [12])
+    assert os.stat(filename).st_mtime == 0
+    assert list(index["tiles"]) == [f"12/{quadkey(x, y, 12)}"]
+    hx, hy = tile_xy(-73.5250, 40.7680, 12)
+    assert not os.path.exists(os.path.join(out_dir, "12", str(hx), f"{hy}.geojson"))
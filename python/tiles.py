@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cluster import lat_y, lon_x, x_lon, y_lat
+from geometry import bounds, clip, from_geojson, to_geojson
+from manifest import file_digest
+from utils import make_geojson
+
+logger = logging.getLogger(__name__)
+
+TileKey = Tuple[int, int, int]
+# a polygon whose bounds cover more tiles than this is clipped to every tile, other geometries
+# that large go to the tile of their center only
+MAX_TILES_PER_FEATURE = 64
+
+
+def tile_xy(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    n = 2 ** z
+    return min(int(lon_x(lon) * n), n - 1), min(int(lat_y(lat) * n), n - 1)
+
+
+def quadkey(x: int, y: int, z: int) -> str:
+    digits = []
+    for i in range(z, 0, -1):
+        mask = 1 << (i - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return "".join(digits)
+
+
+def tile_bounds(x: int, y: int, z: int) -> Tuple[float, float, float, float]:
+    n = 2 ** z
+    return x_lon(x / n), y_lat((y + 1) / n), x_lon((x + 1) / n), y_lat(y / n)
+
+
+def feature_tiles(geometry: Dict[str, Any], z: int) -> List[Tuple[int, int, Optional[Dict[str, Any]]]]:
+    # (x, y, geometry to write there or None for the feature's own): points by position,
+    # everything else by the tiles its bounding box overlaps
+    if not geometry or not geometry.get("coordinates"):
+        return []
+    if geometry.get("type") == "Point":
+        return [tile_xy(*geometry["coordinates"][:2], z) + (None,)]
+    shape = from_geojson(geometry)
+    x0, y0, x1, y1 = bounds(shape)
+    (tx0, ty0), (tx1, ty1) = tile_xy(x0, y1, z), tile_xy(x1, y0, z)
+    if (tx1 - tx0 + 1) * (ty1 - ty0 + 1) <= MAX_TILES_PER_FEATURE:
+        return [(x, y, None) for x in range(tx0, tx1 + 1) for y in range(ty0, ty1 + 1)]
+    if shape.type not in ["Polygon", "MultiPolygon"]:
+        return [tile_xy((x0 + x1) / 2, (y0 + y1) / 2, z) + (None,)]
+    tiles = []
+    for x in range(tx0, tx1 + 1):
+        for y in range(ty0, ty1 + 1):
+            clipped = clip(shape, tile_bounds(x, y, z))
+            if clipped:
+                tiles.append((x, y, to_geojson(clipped)))
+    return tiles
+
+
+def save_tiles(name: str, features: Iterable[Dict[str, Any]], out_dir: str, zooms: List[int] = [12], precision: int = 6) -> Dict[str, Any]:
+    # Splits features into <out_dir>/<z>/<x>/<y>.geojson in one pass and writes a tiles.json index
+    # of quadkey -> tile, feature count and content hash. Tiles are written in a fixed order with
+    # features sorted by id, so an unchanged tile keeps its bytes, hash and mtime.
+    tiles: Dict[TileKey, List[Dict[str, Any]]] = {}
+    for feature in features:
+        for z in zooms:
+            for x, y, geometry in feature_tiles(feature.get("geometry"), z):
+                tiles.setdefault((z, x, y), []).append(feature if geometry is None else dict(feature, geometry=geometry))
+
+    index_filename = os.path.join(out_dir, "tiles.json")
+    old_tiles = {}
+    if os.path.isfile(index_filename):
+        with open(index_filename, "r") as f:
+            old_tiles = json.load(f).get("tiles", {})
+
+    index: Dict[str, Any] = {"name": name, "zooms": zooms, "tiles": {}}
+    written = 0
+    for (z, x, y), members in sorted(tiles.items()):
+        key = f"{z}/{quadkey(x, y, z)}"
+        filename = os.path.join(out_dir, str(z), str(x), f"{y}.geojson")
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        members.sort(key=lambda feature: str(feature.get("properties", {}).get("id", "")))
+        make_geojson(f"{name} {z}/{x}/{y}", members, filename + ".tmp", compact=True, precision=precision)
+        content = file_digest(filename + ".tmp")
+        if old_tiles.get(key, {}).get("hash") == content and os.path.isfile(filename):
+            os.remove(filename + ".tmp")
+        else:
+            os.replace(filename + ".tmp", filename)
+            written += 1
+        index["tiles"][key] = {"z": z, "x": x, "y": y, "count": len(members), "hash": content, "bounds": tile_bounds(x, y, z)}
+
+    # tiles that no longer have any features
+    for key, tile in old_tiles.items():
+        if key not in index["tiles"]:
+            filename = os.path.join(out_dir, str(tile["z"]), str(tile["x"]), f"{tile['y']}.geojson")
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    with open(index_filename, "w") as f:
+        json.dump(index, f, indent=4)
+    logger.info("Tiles: %d tiles, %d written, %d unchanged", len(index["tiles"]), written, len(index["tiles"]) - written)
+    return index
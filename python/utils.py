@@ -1,12 +1,18 @@
 import html
 import json
 import os
-from typing import Any, Dict, List
+import time
+from typing import Any, Dict, Iterable, List, Tuple
 
 import requests
 from bs4 import BeautifulSoup
 
+from geojson_stream import FeatureWriter
+from geometry import bounds, from_geojson
+
 WINDOWS_CHROME = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.3"
+GEOAPIFY_URL = "https://api.geoapify.com/v1/geocode/search"
+GEOAPIFY_BATCH_URL = "https://api.geoapify.com/v1/batch/geocode/search"
 STREET_TYPES = [" Ave", " Rd", " St", " Pl", " Blvd", " Dr", " Pkwy", " Ln"]
 
 
@@ -16,76 +22,97 @@ def load_json(filename: str) -> Any:
     return json_data
 
 
-def make_geojson(name: str, features: dict, output_filename: str):
-    geojson = {
+def make_geojson(name: str, features: Iterable[Dict[str, Any]], output_filename: str, compact: bool = False, precision: int = None):
+    members = {
         "type": "FeatureCollection",
         "name": name,
         "crs": {
             "type": "name",
             "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"},
         },
-        "features": features,
     }
-    with open(output_filename, "w") as f:
-        json.dump(geojson, f, indent=4, ensure_ascii=False)
+    with FeatureWriter(output_filename, members, compact, precision) as writer:
+        for feature in features:
+            writer.write(feature)
 
 
-def scrape(url: str, user_agent: str = WINDOWS_CHROME) -> Any:
+def scrape(url: str, user_agent: str = WINDOWS_CHROME, fetcher=None, timeout: float = 30) -> Any:
+    if fetcher:
+        return fetcher.get(url)
     headers = {"User-Agent": user_agent}
-    r = requests.get(url, headers)
+    r = requests.get(url, headers=headers, timeout=timeout)
     r.raise_for_status()
     return r.content
 
 
-def scrape_html(url: str, root_tag: list[str], user_agent: str = WINDOWS_CHROME) -> BeautifulSoup:
-    html_content = scrape(url, user_agent)
+def scrape_html(url: str, root_tag: list[str], user_agent: str = WINDOWS_CHROME, fetcher=None) -> BeautifulSoup:
+    html_content = scrape(url, user_agent, fetcher)
     return BeautifulSoup(html_content, features="html.parser").find(*root_tag)
 
 
-# TODO: When the geocoder is confused, it returns multiple matches
-def geocode(address: str, api_key_env: str = "GEOAPIFY_API_KEY"):
+def geocode_candidates(address: str, api_key_env: str = "GEOAPIFY_API_KEY", session=requests, url: str = GEOAPIFY_URL, timeout: float = None) -> List[Tuple[str, Dict[str, Any]]]:
+    # every match the geocoder returns, best ranked first; it returns several when it is confused
     api_key = os.getenv(api_key_env)
     address = html.escape(address.strip())
     headers = {"Accept": "application/json"}
-    url = f"https://api.geoapify.com/v1/geocode/search?text={address}&apiKey={api_key}"
-    r = requests.get(url, headers)
+    r = session.get(url, params={"text": address, "apiKey": api_key}, headers=headers, timeout=timeout)
     r.raise_for_status()
     r_json = r.json()
-    features = r_json.get("features")
-    if features:
-        f = features[0]
-        props = f.get("properties", None)
-        geo = f.get("geometry", None)
-        formatted = props.get("formatted", "")
-        return formatted, geo
+    candidates = []
+    for f in r_json.get("features") or []:
+        props = f.get("properties", None) or {}
+        candidates.append((props.get("formatted", ""), f.get("geometry", None)))
+    return candidates
+
+
+def geocode(address: str, api_key_env: str = "GEOAPIFY_API_KEY", session=requests, url: str = GEOAPIFY_URL, timeout: float = None):
+    candidates = geocode_candidates(address, api_key_env, session, url, timeout)
+    if candidates:
+        return candidates[0]
     return "", None
 
 
+def batch_geocode(
+    addresses: List[str],
+    api_key_env: str = "GEOAPIFY_API_KEY",
+    session=requests,
+    url: str = GEOAPIFY_BATCH_URL,
+    poll_interval: float = 1,
+    max_wait: float = 600,
+    timeout: float = None,
+) -> List[Tuple[str, Dict[str, Any]]]:
+    api_key = os.getenv(api_key_env)
+    # a JSON body, not a URL or HTML, so the addresses go as they are
+    texts = [address.strip() for address in addresses]
+    headers = {"Accept": "application/json"}
+    r = session.post(url, params={"apiKey": api_key}, json=texts, headers=headers, timeout=timeout)
+    r.raise_for_status()
+    if r.status_code == 202:
+        job = r.json()
+        job_url = job.get("url") or f"{url}?id={job['id']}&apiKey={api_key}"
+        deadline = time.monotonic() + max_wait
+    while r.status_code == 202:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Batch geocode job {job.get('id')} still pending after {max_wait}s")
+        time.sleep(poll_interval)
+        r = session.get(job_url, headers=headers, timeout=timeout)
+        r.raise_for_status()
+
+    # failed items come back without lat/lon; callers retry those one at a time
+    results = [("", None)] * len(texts)
+    for i, item in enumerate(r.json()):
+        if i >= len(texts) or "lat" not in item or "lon" not in item:
+            continue
+        geo = {"type": "Point", "coordinates": [item["lon"], item["lat"]]}
+        results[i] = item.get("formatted", ""), geo
+    return results
+
+
 def bounding_box(geometry: Dict[str,Any]) -> Dict[str,Any]:
-    geo_type = geometry.get("type")
-    if geo_type not in ["MultiPolygon"]:
-        raise NotImplementedError(geo_type)
-
-    min_pt, max_pt = [], []
-
-    polygons = geometry.get("coordinates", [])
-    for poly in polygons:
-        outer = poly[0]
-        for pt in outer:
-            if not min_pt:
-                min_pt = pt
-                max_pt = pt
-                continue
-
-            lon, lat = pt
-            min_lon, min_lat = min_pt
-            max_lon, max_lat = max_pt
-            min_pt = [min(lon, min_lon), min(lat, min_lat)]
-            max_pt = [max(lon, max_lon), max(lat, max_lat)]
-    
+    min_x, min_y, max_x, max_y = bounds(from_geojson(geometry))
     return {
         "type": "MultiPoint",
-        "coordinates": [min_pt, max_pt],
+        "coordinates": [[min_x, min_y], [max_x, max_y]],
     }
 
 def address_suffix(address: str, street_types: List[str] = STREET_TYPES):